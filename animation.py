@@ -0,0 +1,55 @@
+import math
+
+class AnimationQueue:
+	"""
+	Collects the projectiles and blasts shown during a turn, and plays them back together
+	Every animation queued between two calls to play() runs at the same time, at fps frames per second, so several
+	monsters shooting on the same turn only cost as long as the longest shot. With skip set, nothing is shown at all.
+	"""
+	
+	def __init__(self, g, fps=30):
+		self.g = g
+		self.fps = fps
+		self.skip = False
+		self.queue = [] #Each animation is a list of frames; each frame is a (projectile cells, blast cells) pair
+		
+	def num_frames(self, secs):
+		return max(1, math.ceil(secs * self.fps))
+		
+	def add_projectile(self, path):
+		"A projectile moving along the path, one cell per frame"
+		self.queue.append([((pos,), ()) for pos in path])
+		
+	def add_blast(self, cells, secs=0.2):
+		"An area that lights up all at once for the given number of seconds"
+		frame = ((), tuple(cells))
+		self.queue.append([frame] * self.num_frames(secs))
+		
+	def clear(self):
+		self.queue.clear()
+		
+	def play(self):
+		"Plays all the queued animations, then redraws the board without them"
+		queue = self.queue
+		if not queue:
+			return
+		self.queue = []
+		g = self.g
+		if self.skip or not g.renderer.active:
+			return
+		secs = 1 / self.fps
+		for i in range(max(map(len, queue))):
+			projectiles = set()
+			blast = set()
+			for frames in queue:
+				if i < len(frames):
+					proj_cells, blast_cells = frames[i]
+					projectiles.update(proj_cells)
+					blast.update(blast_cells)
+			g.projectiles = projectiles
+			g.blast = blast
+			g.draw_board()
+			g.delay(secs)
+		g.projectiles = set()
+		g.blast = set()
+		g.draw_board()
@@ -0,0 +1,107 @@
+#Benchmark for field of view calculation
+#Compares the shadowcasting FOV against the old raycasting FOV on the normal 40x16 board and on larger boards
+#Run from the repository root: python3 bench/bench_fov.py
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gameobj import Game
+from board import Board
+from fov import compute_fov
+
+SIZES = [(40, 16), (80, 32), (160, 64), (320, 128)]
+SEED = 1
+
+def raycast_fov(board, x0, y0):
+	"The raycasting FOV that Entity.calc_fov used before shadowcasting, kept here as the baseline"
+	fov = set()
+	fov.add((x0, y0))
+	for x in range(board.cols):
+		for point in board.line_between((x0, y0), (x, 0), skipfirst=True):
+			fov.add(point)
+			if board.blocks_sight(*point):
+				break
+		for point in board.line_between((x0, y0), (x, board.rows - 1), skipfirst=True):
+			fov.add(point)
+			if board.blocks_sight(*point):
+				break
+	for y in range(1, board.rows - 1):
+		for point in board.line_between((x0, y0), (0, y), skipfirst=True):
+			fov.add(point)
+			if board.blocks_sight(*point):
+				break
+		for point in board.line_between((x0, y0), (board.cols - 1, y), skipfirst=True):
+			fov.add(point)
+			if board.blocks_sight(*point):
+				break
+	seen = set()
+	for cell in fov.copy():
+		if board.blocks_sight(*cell):
+			continue
+		x, y = cell
+		dx = x - x0
+		dy = y - y0
+		neighbors = {(x-1, y), (x+1, y), (x, y-1), (x, y+1)}
+		neighbors -= seen
+		neighbors -= fov
+		for xp, yp in neighbors:
+			seen.add((xp, yp))
+			if not (0 <= xp < board.cols):
+				continue
+			if not (0 <= yp < board.rows):
+				continue
+			if board.blocks_sight(xp, yp):
+				visible = False
+				dxp = xp - x
+				dyp = yp - y
+				if dx <= 0 and dy <= 0:
+					visible = dxp <= 0 or dyp <= 0
+				if dx >= 0 and dy <= 0:
+					visible = dxp >= 0 or dyp <= 0
+				if dx <= 0 and dy >= 0:
+					visible = dxp <= 0 or dyp >= 0
+				if dx >= 0 and dy >= 0:
+					visible = dxp >= 0 or dyp >= 0
+				if visible:
+					fov.add((xp, yp))
+	return fov
+
+def shadowcast_fov(board, x0, y0):
+	passable = board.passable
+	cols = board.cols
+	return compute_fov((x0, y0), cols, board.rows, lambda x, y: not passable[y*cols + x])
+
+def make_board(cols, rows):
+	g = Game.headless(seed=SEED)
+	g.board = Board(g, cols, rows)
+	g.board.generate()
+	g.player.rand_place()
+	return g.board
+
+def floor_cells(board, num):
+	cells = [(x, y) for y in range(board.rows) for x in range(board.cols) if board.get(x, y).passable]
+	step = max(1, len(cells) // num)
+	return cells[::step][:num]
+
+def time_per_call(func, board, cells, min_time=0.2):
+	calls = 0
+	start = time.perf_counter()
+	while True:
+		for x, y in cells:
+			func(board, x, y)
+		calls += len(cells)
+		elapsed = time.perf_counter() - start
+		if elapsed >= min_time:
+			return elapsed / calls
+
+def main():
+	print(f"{'board':>9} {'raycast':>12} {'shadowcast':>12} {'speedup':>8} {'avg cells':>10}")
+	for cols, rows in SIZES:
+		board = make_board(cols, rows)
+		cells = floor_cells(board, 50)
+		old = time_per_call(raycast_fov, board, cells)
+		new = time_per_call(shadowcast_fov, board, cells)
+		avg = sum(len(shadowcast_fov(board, x, y)) for x, y in cells) / len(cells)
+		print(f"{cols:>4}x{rows:<4} {old*1e6:>9.1f} us {new*1e6:>9.1f} us {old/new:>7.1f}x {avg:>10.1f}")
+
+if __name__ == "__main__":
+	main()
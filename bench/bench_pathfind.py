@@ -0,0 +1,152 @@
+#Benchmark for A* pathfinding
+#Compares board.pathfind against the old tuple-keyed implementation, pathing from random floor cells to the player
+#Run from the repository root: python3 bench/bench_pathfind.py
+import os, sys, time, random
+from collections import defaultdict
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gameobj import Game
+from board import Board, pathfind
+
+SIZES = [(40, 16), (80, 32), (160, 64)]
+SEED = 1
+
+class OpenSet:
+	"The binary heap the old pathfind used, kept here as the baseline"
+
+	def __init__(self, key=None):
+		self._data = []
+		self._dup = set()
+		self.key = key or (lambda v: v)
+
+	def add(self, value):
+		if value in self._dup:
+			return
+		self._dup.add(value)
+		a = self._data
+		key = self.key
+		i = len(a)
+		a.append(value)
+		while i > 0:
+			parent = i // 2
+			if key(a[parent]) < key(a[i]):
+				break
+			a[parent], a[i] = a[i], a[parent]
+			i = parent
+
+	def pop(self):
+		if len(self._data) == 0:
+			raise IndexError("pop from an empty heap")
+		a = self._data
+		val = a[0]
+		a[0] = a[-1]
+		a.pop()
+		key = self.key
+		i = 0
+		while True:
+			left = 2 * i + 1
+			right = 2 * i + 2
+			if left >= len(a):
+				break
+			node = left
+			if right < len(a) and key(a[right]) < key(a[left]):
+				node = right
+			if key(a[i]) > key(a[node]):
+				a[i], a[node] = a[node], a[i]
+				i = node
+			else:
+				break
+		self._dup.remove(val)
+		return val
+
+	def __contains__(self, value):
+		return value in self._dup
+
+	def __bool__(self):
+		return len(self._data) > 0
+
+def old_pathfind(board, start, end, *, rand=False):
+	"The old A* search, kept here as the baseline"
+	def h(a, b):
+		return abs(a[0] - b[0]) + abs(a[1] - b[1])
+	gScore = defaultdict(lambda: float("inf"))
+	gScore[start] = 0
+	fScore = defaultdict(lambda: float("inf"))
+	fScore[start] = h(start, end)
+	open_set = OpenSet(fScore.__getitem__)
+	open_set.add(start)
+	came_from = {}
+	rows = board.rows
+	cols = board.cols
+	def can_pass(x, y):
+		if (x, y) == end:
+			return not board.blocks_sight(x, y)
+		return board.is_passable(x, y)
+	while open_set:
+		curr = open_set.pop()
+		if curr == end:
+			path = [curr]
+			while curr in came_from:
+				curr = came_from[curr]
+				path.append(curr)
+			path.reverse()
+			return path
+		neighbors = []
+		x, y = curr
+		if x + 1 < cols and can_pass(x + 1, y):
+			neighbors.append((x + 1, y))
+		if x - 1 >= 0 and can_pass(x - 1, y):
+			neighbors.append((x - 1, y))
+		if y + 1 < rows and can_pass(x, y + 1):
+			neighbors.append((x, y + 1))
+		if y - 1 >= 0 and can_pass(x, y - 1):
+			neighbors.append((x, y - 1))
+		if rand:
+			board.g.rng.shuffle(neighbors)
+		for n in neighbors:
+			t = gScore[curr] + 1
+			if t < gScore[n]:
+				came_from[n] = curr
+				gScore[n] = t
+				fScore[n] = t + h(n, end)
+				if n not in open_set:
+					open_set.add(n)
+	return []
+
+def make_game(cols, rows):
+	g = Game.headless(seed=SEED)
+	g.board = Board(g, cols, rows)
+	g.board.generate()
+	g.player.rand_place()
+	g.board.set_cache(g.player.x, g.player.y, g.player)
+	return g
+
+def time_per_call(func, board, pairs, min_time=0.3):
+	calls = 0
+	start = time.perf_counter()
+	while True:
+		for a, b in pairs:
+			func(board, a, b, rand=True)
+		calls += len(pairs)
+		elapsed = time.perf_counter() - start
+		if elapsed >= min_time:
+			return elapsed / calls
+
+def main():
+	print(f"{'board':>9} {'old':>12} {'new':>12} {'speedup':>8} {'avg len':>8}")
+	for cols, rows in SIZES:
+		g = make_game(cols, rows)
+		board = g.board
+		goal = (g.player.x, g.player.y)
+		cells = [(x, y) for y in range(rows) for x in range(cols) if board.is_passable(x, y)]
+		pairs = [(start, goal) for start in random.Random(SEED).sample(cells, min(30, len(cells)))]
+		for a, b in pairs:
+			if len(pathfind(board, a, b)) != len(old_pathfind(board, a, b)):
+				print(f"Warning: path lengths differ from {a} to {b}")
+		old = time_per_call(old_pathfind, board, pairs)
+		new = time_per_call(pathfind, board, pairs)
+		avg = sum(len(pathfind(board, a, b)) - 1 for a, b in pairs) / len(pairs)
+		print(f"{cols:>4}x{rows:<4} {old*1e6:>9.1f} us {new*1e6:>9.1f} us {old/new:>7.1f}x {avg:>8.1f}")
+
+if __name__ == "__main__":
+	main()
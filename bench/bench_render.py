@@ -0,0 +1,92 @@
+#Benchmark for drawing the board
+#Plays a game headlessly and draws every turn, counting the screen writes made by the old renderer (clear the screen and
+#write everything on each frame) and by the frame buffer (write only what changed)
+#Run from the repository root: python3 bench/bench_render.py
+import os, sys, time, random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gameobj import Game
+from display import CursesRenderer, NullRenderer, FrameBuffer
+
+SEED = 1
+STEPS = 500
+COLUMNS = 80
+LINES = 24
+
+class CountingScreen:
+	"Stands in for the curses window, counting calls and characters written"
+
+	def __init__(self):
+		self.calls = 0
+		self.chars = 0
+		self.clears = 0
+
+	def addstr(self, y, x, string, attr=0):
+		self.calls += 1
+		self.chars += len(string)
+
+	def clear(self):
+		self.clears += 1
+		self.chars += COLUMNS * LINES #A cleared screen is sent to the terminal in full on the next refresh
+
+	def move(self, y, x):
+		pass
+
+	def refresh(self):
+		pass
+
+class DirectRenderer(NullRenderer):
+	"The old renderer: clears the screen every frame and writes straight to it"
+	active = True
+
+	def __init__(self, screen):
+		super().__init__(COLUMNS, LINES)
+		self.screen = screen
+
+	def clear(self):
+		self.screen.clear()
+
+	def addstr(self, y, x, string, attr=0):
+		self.screen.addstr(y, x, string, attr)
+
+class BufferedRenderer(CursesRenderer):
+	"CursesRenderer with the counting screen in place of curses"
+
+	def __init__(self, screen):
+		self.screen = screen
+		self.buffer = FrameBuffer(COLUMNS, LINES)
+		self.cursor = (0, 0)
+
+	def get_size(self):
+		return COLUMNS, LINES
+
+	def color_pair(self, num):
+		return num << 8
+
+def play(renderer):
+	g = Game(renderer, NullRenderer().make_input(), SEED)
+	g.input_source.responder = lambda prompt: "y"
+	g.generate_level()
+	g.refresh_cache()
+	p = g.player
+	r = random.Random(SEED)
+	start = time.perf_counter()
+	for _ in range(STEPS):
+		if p.dead:
+			break
+		last = p.energy
+		p.move(*r.choice([(0, 1), (0, -1), (1, 0), (-1, 0)]))
+		if p.energy < last:
+			g.do_turn()
+		g.draw_board()
+	return time.perf_counter() - start
+
+def main():
+	print(f"{'renderer':>10} {'calls':>9} {'chars':>10} {'time':>9}")
+	for name, cls in (("direct", DirectRenderer), ("buffered", BufferedRenderer)):
+		screen = CountingScreen()
+		elapsed = play(cls(screen))
+		print(f"{name:>10} {screen.calls:>9} {screen.chars:>10} {elapsed:>8.2f}s")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,87 @@
+#Benchmark for the save format
+#Compares the size of a saved game and the time it takes to save and load it using pickle (the old format) and the
+#save codec, with and without compression, on a new level and after playing for a while
+#pickle is faster at both: the codec is plain Python. The codec's output is only a little smaller until it's compressed.
+#Run from the repository root: python3 bench/bench_save.py
+import os, sys, io, time, random, pickle
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gameobj import Game
+from saving import dump_game_obj, load_game_obj, pack_checkpoint, unpack_checkpoint
+
+SEED = 1
+STEPS = 1000
+REPEAT = 20
+
+class GamePickler(pickle.Pickler):
+	"How saves used to be written"
+
+	def __init__(self, file, g):
+		super().__init__(file, pickle.HIGHEST_PROTOCOL)
+		self.g = g
+
+	def persistent_id(self, obj):
+		return "game" if obj is self.g else None
+
+class GameUnpickler(pickle.Unpickler):
+
+	def __init__(self, file, g):
+		super().__init__(file)
+		self.g = g
+
+	def persistent_load(self, pid):
+		return self.g
+
+def pickle_dump(g):
+	f = io.BytesIO()
+	GamePickler(f, g).dump(g.__getstate__())
+	return f.getvalue()
+
+def pickle_load(data, g):
+	return GameUnpickler(io.BytesIO(data), g).load()
+
+FORMATS = (
+	("pickle", pickle_dump, pickle_load),
+	("codec", lambda g: dump_game_obj(g.__getstate__(), g), lambda data, g: load_game_obj(data, g)),
+	("codec+zlib", lambda g: pack_checkpoint(dump_game_obj(g.__getstate__(), g)), lambda data, g: load_game_obj(unpack_checkpoint(data), g))
+)
+
+def new_game():
+	g = Game.headless(responder=lambda prompt: "y", seed=SEED)
+	g.generate_level()
+	g.refresh_cache()
+	return g
+
+def play(g, steps):
+	p = g.player
+	r = random.Random(SEED)
+	for _ in range(steps):
+		if p.dead:
+			break
+		last = p.energy
+		p.move(*r.choice([(0, 1), (0, -1), (1, 0), (-1, 0)]))
+		items = g.board.get_items(p.x, p.y)
+		if items and r.random() < 0.5:
+			p.add_item(g.board.pop_item(p.x, p.y))
+		if p.energy < last:
+			g.do_turn()
+
+def timed(func, *args):
+	start = time.perf_counter()
+	for _ in range(REPEAT):
+		result = func(*args)
+	return result, (time.perf_counter() - start) / REPEAT * 1000
+
+def main():
+	fresh = new_game()
+	played = new_game()
+	play(played, STEPS)
+	print(f"{'game':>10} {'format':>11} {'bytes':>8} {'save':>9} {'load':>9}")
+	for name, g in (("new", fresh), (f"{STEPS} turns", played)):
+		for fmt, dump, load in FORMATS:
+			data, save_ms = timed(dump, g)
+			_, load_ms = timed(load, data, Game.headless(seed=SEED))
+			print(f"{name:>10} {fmt:>11} {len(data):>8} {save_ms:>7.2f}ms {load_ms:>7.2f}ms")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,248 @@
+#Benchmark suite for the engine's hot paths
+#Every case starts from the same seeded game on every round, so results only change when the code does.
+#Run from the repository root:
+#	python3 bench/suite.py                                   Run every case and print a table
+#	python3 bench/suite.py --json out.json                   Also save the results
+#	python3 bench/suite.py --compare base.json               Compare against saved results, failing if any case got slower
+#	python3 bench/suite.py --compare base.json --results new.json    Compare two saved results without running anything
+import os, sys, time, json, random, platform, argparse, tempfile, shutil, atexit, statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gameobj import Game
+from board import pathfind
+from bench_render import BufferedRenderer, CountingScreen
+
+SEED = 1
+ROUNDS = 7
+THRESHOLD = 10 #Percent slower than the baseline that counts as a regression
+
+CASES = {}
+
+def case(name):
+	"""
+	Registers a benchmark case
+	The case is a function that sets up a fresh game from SEED and returns a function to time, which runs one round.
+	"""
+	def register(func):
+		CASES[name] = func
+		return func
+	return register
+
+def new_game(renderer=None):
+	g = Game.headless(responder=lambda prompt: "y", seed=SEED)
+	if renderer is not None:
+		g.renderer = renderer
+	g.generate_level()
+	g.refresh_cache()
+	return g
+
+def floor_cells(g, num):
+	board = g.board
+	r = random.Random(SEED)
+	cells = [(x, y) for y in range(board.rows) for x in range(board.cols) if board.passable[y*board.cols + x]]
+	return [r.choice(cells) for _ in range(num)]
+
+@case("generate")
+def bench_generate():
+	g = new_game()
+	def run():
+		for _ in range(20):
+			g.board.generate()
+	return run
+
+@case("calc_fov")
+def bench_calc_fov():
+	g = new_game()
+	board = g.board
+	cells = floor_cells(g, 200)
+	def run():
+		board.fov_cache.clear() #Time calculating it, not looking it up
+		for x, y in cells:
+			board.get_fov(x, y)
+	return run
+
+@case("pathfind")
+def bench_pathfind():
+	g = new_game()
+	cells = floor_cells(g, 100)
+	board = g.board
+	def run():
+		for i in range(0, len(cells), 2):
+			pathfind(board, cells[i], cells[i + 1], rand=True)
+	return run
+
+@case("line_between")
+def bench_line_between():
+	g = new_game()
+	cells = floor_cells(g, 1000)
+	board = g.board
+	def run():
+		board.line_cache.clear()
+		for i in range(0, len(cells), 2):
+			board.line_between(cells[i], cells[i + 1])
+	return run
+
+@case("line_of_sight")
+def bench_line_of_sight():
+	g = new_game()
+	cells = floor_cells(g, 1000)
+	board = g.board
+	def run():
+		board.los_cache.clear()
+		for i in range(0, len(cells), 2):
+			board.line_of_sight(cells[i], cells[i + 1])
+	return run
+
+def bench_do_turn(num_monsters, turns=100):
+	g = new_game()
+	pool = [t for t in g.mon_types if t.min_level <= 3]
+	while len(g.monsters) < num_monsters:
+		if g.place_monster(g.rng.choice(pool)) is None:
+			break
+	for m in g.monsters:
+		m.is_aware = True
+		m.effects.pop("Asleep", None)
+	p = g.player
+	p.HP = 10**6 #Keep the player alive so every round runs the same number of turns
+	def run():
+		for _ in range(turns):
+			p.energy = 0 #Wait a turn
+			g.do_turn()
+	return run
+
+for _num in (10, 40):
+	case(f"do_turn ({_num} monsters)")(lambda num=_num: bench_do_turn(num))
+
+@case("draw_board")
+def bench_draw_board():
+	g = new_game(BufferedRenderer(CountingScreen()))
+	r = random.Random(SEED)
+	p = g.player
+	moves = [r.choice([(0, 1), (0, -1), (1, 0), (-1, 0)]) for _ in range(100)]
+	def run():
+		for dx, dy in moves:
+			p.move(dx, dy) #No turns pass, so only the drawing is timed
+			p.energy = p.get_speed()
+			g.draw_board()
+	return run
+
+def saved_game():
+	"Returns a new game that saves into a temporary folder, after it's been played for a while and saved once"
+	g = new_game()
+	folder = tempfile.mkdtemp()
+	atexit.register(shutil.rmtree, folder, True)
+	g.journal.path = os.path.join(folder, "save.dat")
+	g.journal.journal_path = os.path.join(folder, "save.journal")
+	r = random.Random(SEED)
+	p = g.player
+	for _ in range(50):
+		last = p.energy
+		p.move(*r.choice([(0, 1), (0, -1), (1, 0), (-1, 0)]))
+		if p.energy < last:
+			g.do_turn()
+	g.save_game()
+	g.flush_saves()
+	return g
+
+@case("save_game")
+def bench_save_game():
+	#What the game does after a turn: usually a journal record with what changed since the last save
+	g = saved_game()
+	r = random.Random(SEED)
+	p = g.player
+	moves = [r.choice([(0, 1), (0, -1), (1, 0), (-1, 0)]) for _ in range(20)]
+	def run():
+		for dx, dy in moves:
+			p.move(dx, dy) #Something to save, without timing a turn
+			p.energy = p.get_speed()
+			g.save_game()
+			g.flush_saves()
+	return run
+
+@case("checkpoint")
+def bench_checkpoint():
+	#A full save, as on a new level or once the journal gets long
+	g = saved_game()
+	def run():
+		for _ in range(20):
+			g.journal.checkpoint()
+			g.flush_saves()
+	return run
+
+@case("load_game")
+def bench_load_game():
+	g = saved_game()
+	def run():
+		for _ in range(20):
+			g.journal.load()
+	return run
+
+def run_cases(names, rounds):
+	results = {}
+	for name in names:
+		times = []
+		for _ in range(rounds):
+			func = CASES[name]()
+			start = time.perf_counter()
+			func()
+			times.append((time.perf_counter() - start) * 1000)
+		results[name] = {"median_ms": statistics.median(times), "min_ms": min(times), "rounds": rounds}
+		print(f"{name:<24} {results[name]['median_ms']:>9.2f}ms {results[name]['min_ms']:>9.2f}ms", flush=True)
+	return results
+
+def compare(base, new, threshold):
+	"Prints the change in each case's median time, and returns the names of the cases that got slower than the threshold"
+	regressions = []
+	print(f"{'case':<24} {'base':>10} {'new':>10} {'change':>8}")
+	for name, result in new.items():
+		if name not in base:
+			continue
+		old_ms = base[name]["median_ms"]
+		new_ms = result["median_ms"]
+		change = (new_ms / old_ms - 1) * 100 if old_ms else 0.0
+		flag = ""
+		if change > threshold:
+			regressions.append(name)
+			flag = " REGRESSION"
+		print(f"{name:<24} {old_ms:>8.2f}ms {new_ms:>8.2f}ms {change:>+7.1f}%{flag}")
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmarks for the engine's hot paths")
+	parser.add_argument("cases", nargs="*", help="Cases to run (default: all)")
+	parser.add_argument("--rounds", type=int, default=ROUNDS, help="Rounds per case; the median is reported")
+	parser.add_argument("--json", help="Save the results to this file")
+	parser.add_argument("--compare", help="Compare against results saved with --json")
+	parser.add_argument("--results", help="With --compare, compare these saved results instead of running the cases")
+	parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Percent slower than the baseline that counts as a regression")
+	args = parser.parse_args()
+	for name in args.cases:
+		if name not in CASES:
+			parser.error(f"unknown case {name!r}; the cases are: {', '.join(CASES)}")
+	if args.results:
+		if not args.compare:
+			parser.error("--results needs --compare")
+		with open(args.results) as f:
+			report = json.load(f)
+	else:
+		print(f"{'case':<24} {'median':>11} {'min':>11}")
+		report = {
+			"seed": SEED,
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"results": run_cases(args.cases or list(CASES), args.rounds)
+		}
+		if args.json:
+			with open(args.json, "w") as f:
+				json.dump(report, f, indent=2)
+	if args.compare:
+		with open(args.compare) as f:
+			base = json.load(f)
+		print()
+		regressions = compare(base["results"], report["results"], args.threshold)
+		if regressions:
+			print(f"{len(regressions)} case(s) got more than {args.threshold:g}% slower: {', '.join(regressions)}")
+			sys.exit(1)
+
+if __name__ == "__main__":
+	main()
@@ -1,69 +1,329 @@
-import random, math
+import math
+from heapq import heappush, heappop
 from utils import *
+from fov import compute_fov
+from spatial import SpatialHash
+from zobrist import key, floor_keys, entity_key, item_key, STAIRS
+
+#Tile flags, stored as bits in Board.flags
+REVEALED = 1
+WALKED = 2
+STAIR = 4
 
 class Tile:
+	"""
+	A lightweight view of a single cell on the board
+	The cell's data lives in the board's arrays; reading or setting an attribute here reads or writes those arrays.
+	"""
+	__slots__ = ("board", "idx")
 	
-	def __init__(self, passable, symbol, stair=False):
-		self.passable = passable
+	def __init__(self, board, idx):
+		self.board = board
+		self.idx = idx
+		
+	def _get_flag(self, flag):
+		return bool(self.board.flags[self.idx] & flag)
+		
+	def _set_flag(self, flag, value):
+		if value:
+			self.board.flags[self.idx] |= flag
+		else:
+			self.board.flags[self.idx] &= ~flag
+		
+	@property
+	def passable(self):
+		return bool(self.board.passable[self.idx])
+		
+	@passable.setter
+	def passable(self, value):
+		board = self.board
+		if board.passable[self.idx] != bool(value):
+			board.terrain_hash ^= board.floor_keys[self.idx]
+		board.passable[self.idx] = bool(value)
+		board.version += 1
+		
+	@property
+	def symbol(self):
+		return chr(self.board.symbols[self.idx])
+		
+	@symbol.setter
+	def symbol(self, symbol):
 		assert len(symbol) == 1, "Symbol must be exactly one character"
-		self.symbol = symbol
-		self.revealed = False
-		self.walked = False
-		self.stair = stair
-		self.items = []
+		self.board.symbols[self.idx] = ord(symbol)
+		
+	@property
+	def revealed(self):
+		return self._get_flag(REVEALED)
+		
+	@revealed.setter
+	def revealed(self, value):
+		self._set_flag(REVEALED, value)
+		
+	@property
+	def walked(self):
+		return self._get_flag(WALKED)
+		
+	@walked.setter
+	def walked(self, value):
+		self._set_flag(WALKED, value)
+		
+	@property
+	def stair(self):
+		return self._get_flag(STAIR)
+		
+	@stair.setter
+	def stair(self, value):
+		if self.stair != bool(value):
+			self.board.terrain_hash ^= key(STAIRS, self.idx)
+		self._set_flag(STAIR, value)
+		
+	@property
+	def items(self):
+		"The items on this tile, top item last. Use Board.add_item() and Board.pop_item() to change them"
+		return tuple(self.board.items.get(self.idx, ()))
+
+#Offsets of the cells in a circle of each radius, and their directions for cones, worked out once per radius
+_circle_offsets = {}
+_cone_tables = {}
+
+def circle_offsets(radius):
+	"Returns the (dx, dy) offsets within radius of the center (rounding the distance), not including the center"
+	offsets = _circle_offsets.get(radius)
+	if offsets is None:
+		offsets = []
+		for dx in range(-radius, radius+1):
+			for dy in range(-radius, radius+1):
+				if (dx, dy) != (0, 0) and round(math.sqrt(dx**2 + dy**2)) <= radius:
+					offsets.append((dx, dy))
+		_circle_offsets[radius] = offsets = tuple(offsets)
+	return offsets
+	
+def cone_table(radius):
+	"""
+	Returns (offsets, dirs, by_degree) for cones of the given radius
+	dirs - The direction of each offset in degrees, from 0 up to 360
+	by_degree - For each whole degree, the indices of the offsets whose direction rounds down to it
+	"""
+	table = _cone_tables.get(radius)
+	if table is None:
+		offsets = circle_offsets(radius)
+		dirs = []
+		by_degree = [[] for _ in range(360)]
+		for i, (dx, dy) in enumerate(offsets):
+			dir = math.degrees(math.atan2(dy, dx))
+			if dir < 0:
+				dir += 360
+			dirs.append(dir)
+			by_degree[int(dir) % 360].append(i)
+		_cone_tables[radius] = table = (offsets, tuple(dirs), tuple(map(tuple, by_degree)))
+	return table
+
+def bresenham(dx, dy):
+	"Returns the points on the line from (0, 0) to (dx, dy) as a tuple, including both ends"
+	x = y = 0
+	adx = abs(dx)
+	sx = 1 if dx > 0 else -1
+	ady = -abs(dy)
+	sy = 1 if dy > 0 else -1
+	error = adx + ady
+	points = [(0, 0)]
+	while (x, y) != (dx, dy):
+		e2 = 2 * error
+		if e2 >= ady:
+			error += ady
+			x += sx
+		if e2 <= adx:
+			error += adx
+			y += sy
+		points.append((x, y))
+	return tuple(points)
 
 class Board:
 	
+	#The board is stored as flat arrays indexed by row*cols + col:
+	#passable - 1 for floor, 0 for wall
+	#symbols - The character code of each cell's symbol
+	#flags - Bitwise OR of the tile flags above
+	#items - Maps cell index to the pile of items there; only cells with items are stored
+	#The board also keeps the parts of the game's state hash (see zobrist.py) for the terrain, the items on the floor, and the
+	#entities standing on it. The entities' part follows the monster collision cache, keeping each occupied cell's key.
+	
 	def __init__(self, g, cols, rows):
 		self.g = g
 		self.cols = cols
 		self.rows = rows
-		self.data = [[Tile(True, " ") for x in range(cols)] for y in range(rows)]
+		self.version = 0 #Bumped whenever the terrain changes, so that results cached from the old terrain are never reused
+		self.occupancy = 0 #Bumped whenever a monster is added, removed or moves
+		self.init_caches()
+		self.search_gen = 0
+		self.fill(True, " ")
+		
+	def fill(self, passable, symbol):
+		"Resets every cell on the board to the same terrain, with no items or flags"
+		size = self.cols * self.rows
+		self.passable = bytearray([passable]) * size
+		self.symbols = bytearray(symbol, "ascii") * size
+		self.flags = bytearray(size)
+		self.items = {}
+		self.version += 1
+		self.terrain_hash = 0
+		if passable:
+			for k in self.floor_keys:
+				self.terrain_hash ^= k
+		self.items_hash = 0
 		self.clear_cache()
+		self.alloc_search_buffers()
+		
+	def alloc_search_buffers(self):
+		#Preallocated per-cell arrays for pathfind. A cell's entry is only valid if its mark equals the current search generation,
+		#so they never need to be cleared between searches
+		size = self.cols * self.rows
+		self.path_cost = [0] * size
+		self.path_from = [0] * size
+		self.path_seen = [0] * size
+		self.path_closed = [0] * size
+		
+	def search_buffers(self):
+		"Starts a new search and returns (cost, came_from, seen, closed, generation)"
+		self.search_gen += 1
+		return self.path_cost, self.path_from, self.path_seen, self.path_closed, self.search_gen
+		
+	def init_caches(self):
+		self.floor_keys = floor_keys(self.cols * self.rows)
+		#Results cached by position and terrain version
+		self.fov_cache = LRUCache(256)
+		self.dist_cache = LRUCache(8)
+		self.fov_bounds = LRUCache(256) #Bounding box of each FOV set, keyed by the set itself
+		#Lines by offset; these don't depend on the terrain, only on the board's width
+		self.line_cache = LRUCache(4096)
+		#Line of sight results by terrain version, and clear path results by terrain version and occupancy
+		self.los_cache = LRUCache(4096)
+		self.clear_path_cache = LRUCache(1024)
+		
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		#Caches and search buffers are cheap to rebuild, no need to save them
+		for name in ("fov_cache", "dist_cache", "fov_bounds", "line_cache", "los_cache", "clear_path_cache",
+				"path_cost", "path_from", "path_seen", "path_closed", "mons_cache", "mons_index", "cell_hashes",
+				"entities_hash", "terrain_hash", "items_hash", "floor_keys"):
+			del state[name]
+		return state
+		
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.init_caches()
+		self.alloc_search_buffers()
+		self.clear_cache() #The game refills the monster collision cache after loading
+		self.rehash()
 		
 	def clear_cache(self):
-		self.mons_cache = [[None for x in range(self.cols)] for y in range(self.cols)]
+		self.mons_cache = [None] * (self.cols * self.rows)
+		self.mons_index = SpatialHash(self.cols, self.rows)
+		self.cell_hashes = [0] * (self.cols * self.rows)
+		self.entities_hash = 0
+		self.occupancy += 1
+		
+	def rehash(self):
+		"Recalculates the board's parts of the state hash from scratch"
+		terrain_hash = 0
+		passable = self.passable
+		flags = self.flags
+		keys = self.floor_keys
+		for i in range(len(passable)):
+			if passable[i]:
+				terrain_hash ^= keys[i]
+			if flags[i] & STAIR:
+				terrain_hash ^= key(STAIRS, i)
+		self.terrain_hash = terrain_hash
+		items_hash = 0
+		for i, pile in self.items.items():
+			for pos, item in enumerate(pile):
+				items_hash ^= item_key(item, i, pos)
+		self.items_hash = items_hash
+		entities_hash = 0
+		hashes = self.cell_hashes
+		for i, e in enumerate(self.mons_cache):
+			hashes[i] = entity_key(e, i) if e is not None else 0
+			entities_hash ^= hashes[i]
+		self.entities_hash = entities_hash
 
+	def line_offsets(self, dx, dy):
+		"""
+		Returns (offsets, deltas) for the line from (0, 0) to (dx, dy), including both ends
+		offsets - The (x, y) offset of each point
+		deltas - The same offsets as flat cell index differences
+		"""
+		key = (dx, dy)
+		line = self.line_cache.get(key)
+		if line is None:
+			line = bresenham(dx, dy)
+			cols = self.cols
+			line = (line, tuple(y*cols + x for x, y in line))
+			self.line_cache.put(key, line)
+		return line
+		
 	def line_between(self, pos1, pos2, skipfirst=False, skiplast=False):
+		"Returns the points on the line from pos1 to pos2 as a list"
 		x1, y1 = pos1
-		x2, y2 = pos2
-		dx = abs(x2 - x1)
-		sx = 1 if x1 < x2 else -1
-		dy = -abs(y2 - y1)
-		sy = 1 if y1 < y2 else -1
-		error = dx + dy
-		while True:
-			doyield = True
-			if (skipfirst and (x1, y1) == pos1) or (skiplast and (x1, y1) == pos2):
-				doyield = False
-			if doyield:
-				yield (x1, y1)
-			if (x1, y1) == (x2, y2):
-				return
-			e2 = 2 * error
-			if e2 >= dy:
-				if x1 == x2:
-					return
-				error += dy
-				x1 += sx
-			if e2 <= dx:
-				if y1 == y2:
-					return 
-				error += dx
-				y1 += sy
+		offsets = self.line_offsets(pos2[0] - x1, pos2[1] - y1)[0]
+		#The line always starts at pos1 and ends at pos2, and never visits the same point twice
+		end = len(offsets) - 1 if skiplast else len(offsets)
+		start = 1 if skipfirst else 0
+		if skipfirst and skiplast and len(offsets) == 1:
+			return []
+		return [(x1 + ox, y1 + oy) for ox, oy in offsets[start:end]]
 	
 	def in_bounds(self, x, y):
 		return 0 <= x < self.cols and 0 <= y < self.rows
-				
+		
+	def cache_stats(self):
+		"Returns {name: (hits, misses)} for each of the board's caches"
+		caches = (("fov", self.fov_cache), ("distance map", self.dist_cache), ("line", self.line_cache),
+			("line of sight", self.los_cache), ("clear path", self.clear_path_cache))
+		return {name: (cache.hits, cache.misses) for name, cache in caches}
+		
 	def line_of_sight(self, pos1, pos2):
-		for point in self.line_between(pos1, pos2, skiplast=True):
-			if self.blocks_sight(*point):
+		key = (pos1, pos2, self.version)
+		result = self.los_cache.get(key)
+		if result is None:
+			result = self.walk_line_of_sight(pos1, pos2)
+			self.los_cache.put(key, result)
+		return result
+		
+	def is_clear_path(self, pos1, pos2):
+		key = (pos1, pos2, self.version, self.occupancy)
+		result = self.clear_path_cache.get(key)
+		if result is None:
+			result = self.walk_clear_path(pos1, pos2)
+			self.clear_path_cache.put(key, result)
+		return result
+		
+	def walk_line_of_sight(self, pos1, pos2):
+		x1, y1 = pos1
+		deltas = self.line_offsets(pos2[0] - x1, pos2[1] - y1)[1]
+		cols = self.cols
+		base = y1*cols + x1
+		player = self.g.player
+		player_idx = player.y*cols + player.x
+		passable = self.passable
+		for i in range(len(deltas) - 1): #Every point except pos2
+			idx = base + deltas[i]
+			if not passable[idx] and idx != player_idx:
 				return False
 		return True
 		
-	def is_clear_path(self, pos1, pos2):
-		for point in self.line_between(pos1, pos2, skipfirst=True, skiplast=True):
-			if not self.is_passable(*point):
+	def walk_clear_path(self, pos1, pos2):
+		x1, y1 = pos1
+		deltas = self.line_offsets(pos2[0] - x1, pos2[1] - y1)[1]
+		cols = self.cols
+		base = y1*cols + x1
+		player = self.g.player
+		player_idx = player.y*cols + player.x
+		passable = self.passable
+		mons = self.mons_cache
+		for i in range(1, len(deltas) - 1): #Every point except the ends
+			idx = base + deltas[i]
+			if (not passable[idx] and idx != player_idx) or mons[idx]:
 				return False
 		return True
 	
@@ -76,28 +336,36 @@ class Board:
 					
 	def get_in_circle(self, pos, radius):
 		cx, cy = pos
-		for x, y in self.get_in_radius(pos, radius):
-			dx = x - cx
-			dy = y - cy
-			dist = math.sqrt(dx**2 + dy**2)
-			if round(dist) > radius or not self.in_bounds(x, y):
-				continue	
-			yield x, y
+		cols = self.cols
+		rows = self.rows
+		for dx, dy in circle_offsets(radius):
+			x = cx + dx
+			y = cy + dy
+			if 0 <= x < cols and 0 <= y < rows:
+				yield x, y
 	
 	def get_in_cone(self, pos, radius, angle, widthdeg=45):
 		cx, cy = pos 
 		angle %= 360
-		for x, y in self.get_in_radius(pos, radius):
-			dx = x - cx
-			dy = y - cy
-			dist = math.sqrt(dx**2 + dy**2)
-			if round(dist) > radius or not self.in_bounds(x, y):
+		half = widthdeg/2
+		offsets, dirs, by_degree = cone_table(radius)
+		if widthdeg >= 359:
+			candidates = range(len(offsets))
+		else:
+			#Only the offsets in the degree buckets the cone overlaps can be in it; they're checked exactly below
+			candidates = []
+			for deg in range(math.floor(angle - half), math.floor(angle + half) + 1):
+				candidates.extend(by_degree[deg % 360])
+			candidates.sort() #Keep the same order as scanning the square
+		cols = self.cols
+		rows = self.rows
+		for i in candidates:
+			dx, dy = offsets[i]
+			x = cx + dx
+			y = cy + dy
+			if not (0 <= x < cols and 0 <= y < rows):
 				continue
-			dir = math.degrees(math.atan2(dy, dx))
-			half = widthdeg/2
-			if dir < 0:
-				dir += 360
-			
+			dir = dirs[i]
 			if abs(angle - dir) <= half:
 				yield x, y
 			elif angle + half >= 360 and dir <= (angle + half) % 360:
@@ -107,52 +375,118 @@ class Board:
 		
 	#A monster collision cache is used to improve the performance of detecting collisions with monsters
 	#This way, checking if there's a monster at a position can be O(1) instead of O(m)
+	#The spatial index mirrors it by area, so finding the monsters near a position doesn't have to check every monster
 	
 	def set_cache(self, x, y, mon):
-		self.mons_cache[y][x] = mon
+		i = y*self.cols + x
+		old = self.mons_cache[i]
+		if old is not None:
+			self.mons_index.remove(old, x, y)
+		self.mons_cache[i] = mon
+		self.mons_index.add(mon, x, y)
+		self.occupancy += 1
+		h = entity_key(mon, i)
+		self.entities_hash ^= self.cell_hashes[i] ^ h
+		self.cell_hashes[i] = h
 		
 	def unset_cache(self, x, y):
-		self.mons_cache[y][x] = None
+		i = y*self.cols + x
+		old = self.mons_cache[i]
+		if old is not None:
+			self.mons_index.remove(old, x, y)
+		self.mons_cache[i] = None
+		self.occupancy += 1
+		self.entities_hash ^= self.cell_hashes[i]
+		self.cell_hashes[i] = 0
+		
+	def update_entity(self, e):
+		"Updates the state hash for an entity whose HP or effects changed"
+		i = e.y*self.cols + e.x
+		if self.mons_cache[i] is e:
+			h = entity_key(e, i)
+			self.entities_hash ^= self.cell_hashes[i] ^ h
+			self.cell_hashes[i] = h
 		
 	def get_mon_cache(self, x, y):
-		return self.mons_cache[y][x]
+		if not (0 <= x < self.cols and 0 <= y < self.rows):
+			return None
+		return self.mons_cache[y*self.cols + x]
 		
 	def swap_cache(self, pos1, pos2):
 		if pos1 == pos2:
 			return
 		x1, y1 = pos1
 		x2, y2 = pos2
-		tmp = self.mons_cache[y1][x1]
-		self.mons_cache[y1][x1] = self.mons_cache[y2][x2]
-		self.mons_cache[y2][x2] = tmp
+		i1 = y1*self.cols + x1
+		i2 = y2*self.cols + x2
+		cache = self.mons_cache
+		cache[i1], cache[i2] = cache[i2], cache[i1]
+		self.occupancy += 1
+		if cache[i1] is not None:
+			self.mons_index.move(cache[i1], pos2, pos1)
+		if cache[i2] is not None:
+			self.mons_index.move(cache[i2], pos1, pos2)
+		hashes = self.cell_hashes
+		h1 = entity_key(cache[i1], i1) if cache[i1] is not None else 0
+		h2 = entity_key(cache[i2], i2) if cache[i2] is not None else 0
+		self.entities_hash ^= hashes[i1] ^ hashes[i2] ^ h1 ^ h2
+		hashes[i1] = h1
+		hashes[i2] = h2
+		
+	def monsters_in_fov(self, fov):
+		"Yields the monsters (not including the player) standing on cells in the given FOV set"
+		if not fov:
+			return
+		bounds = self.fov_bounds.get(fov)
+		if bounds is None:
+			xs = [x for x, _ in fov]
+			ys = [y for _, y in fov]
+			bounds = (min(xs), min(ys), max(xs), max(ys))
+			self.fov_bounds.put(fov, bounds)
+		player = self.g.player
+		for m in self.mons_index.in_rect(*bounds):
+			if m is not player and (m.x, m.y) in fov:
+				yield m
+				
+	def monsters_in_radius(self, x, y, radius):
+		"Yields the monsters (not including the player) whose distance from (x, y) rounds to at most radius"
+		player = self.g.player
+		for m in self.mons_index.in_radius(x, y, radius):
+			if m is not player:
+				yield m
+				
+	def nearest_monster(self, x, y, pred=None, maxdist=None):
+		"Returns the closest monster to (x, y) by Manhattan distance that satisfies pred, or None"
+		player = self.g.player
+		return self.mons_index.nearest(x, y, lambda m: m is not player and (pred is None or pred(m)), maxdist)
 		
 	def blocks_sight(self, col, row):
 		if (col, row) == (self.g.player.x, self.g.player.y):
 			return False
-		return not self.get(col, row).passable
+		return not self.passable[row*self.cols + col]
 	
 	def is_passable(self, col, row):
 		if self.blocks_sight(col, row):
 			return False
-		return not self.mons_cache[row][col]
+		return not self.mons_cache[row*self.cols + col]
 		
 	def generate(self):
-		self.data = [[Tile(False, "#") for x in range(self.cols)] for y in range(self.rows)]
-		self.clear_cache()
+		self.fill(False, "#")
+		rng = self.g.rng
 		WIDTH_RANGE = (5, 10)
 		HEIGHT_RANGE = (3, 5)
 		ATTEMPTS = 100
-		NUM = random.randint(5, 8)
+		NUM = rng.randint(5, 8)
 		rooms = []
-		randchance = dice(2, 10)
-		if one_in(7):
+		randchance = rng.dice(2, 10)
+		if rng.one_in(7):
 			randchance = 100
 		for i in range(NUM):
 			for _ in range(ATTEMPTS):
-				width = random.randint(*WIDTH_RANGE)
-				height = random.randint(*HEIGHT_RANGE)
-				xpos = random.randint(1, self.cols - width - 1)
-				ypos = random.randint(1, self.rows - height - 1)
+				width = rng.randint(*WIDTH_RANGE)
+				height = rng.randint(*HEIGHT_RANGE)
+				xpos = rng.randint(1, self.cols - width - 1)
+				ypos = rng.randint(1, self.rows - height - 1)
 				for x, y, w, h in rooms:
 					flag = True
 					if x + w < xpos or xpos + width < x:
@@ -167,16 +501,16 @@ class Board:
 							self.carve_at(xpos + x, ypos + y)
 					if i > 0:
 						prev = rooms[-1]
-						if random.randint(1, randchance) == 1:
-							prev = random.choice(rooms)
+						if rng.randint(1, randchance) == 1:
+							prev = rng.choice(rooms)
 						x, y, w, h = prev
-						pos1_x = x + random.randint(1, w - 2)
-						pos1_y = y + random.randint(1, h - 2)
-						pos2_x = xpos + random.randint(1, width - 2)
-						pos2_y = ypos + random.randint(1, height - 2)
+						pos1_x = x + rng.randint(1, w - 2)
+						pos1_y = y + rng.randint(1, h - 2)
+						pos2_x = xpos + rng.randint(1, width - 2)
+						pos2_y = ypos + rng.randint(1, height - 2)
 						dx = 1 if pos1_x < pos2_x else -1
 						dy = 1 if pos1_y < pos2_y else -1
-						if one_in(2):
+						if rng.one_in(2):
 							x = pos1_x
 							while x != pos2_x:
 								self.carve_at(x, pos1_y)
@@ -201,119 +535,152 @@ class Board:
 	def carve_at(self, col, row):
 		if not (0 <= col < self.cols and 0 <= row < self.rows):
 			raise ValueError(f"carve_at coordinate out of range: ({col}, {row})")
-		self.data[row][col] = Tile(True, " ")
+		i = row*self.cols + col
+		if not self.passable[i]:
+			self.terrain_hash ^= self.floor_keys[i]
+		self.passable[i] = 1
+		self.symbols[i] = 32 #Space
+		self.version += 1
 		
 	def get(self, col, row):
-		return self.data[row][col]
+		return Tile(self, row*self.cols + col)
+		
+	def get_items(self, col, row):
+		"Returns the pile of items at the given position (top item last), or an empty tuple if there are none"
+		return self.items.get(row*self.cols + col, ())
+		
+	def add_item(self, col, row, item):
+		i = row*self.cols + col
+		if i in self.items:
+			pile = self.items[i]
+		else:
+			pile = self.items[i] = []
+		self.items_hash ^= item_key(item, i, len(pile))
+		pile.append(item)
+			
+	def pop_item(self, col, row):
+		"Removes and returns the top item at the given position, or None if there are none"
+		i = row*self.cols + col
+		pile = self.items.get(i)
+		if not pile:
+			return None
+		item = pile.pop()
+		self.items_hash ^= item_key(item, i, len(pile))
+		if not pile:
+			del self.items[i]
+		return item
+		
+	def get_fov(self, col, row):
+		"Returns a frozenset of all cells visible from the given position"
+		key = (col, row, self.version)
+		fov = self.fov_cache.get(key)
+		if fov is None:
+			passable = self.passable
+			cols = self.cols
+			fov = frozenset(compute_fov((col, row), cols, self.rows, lambda x, y: not passable[y*cols + x]))
+			self.fov_cache.put(key, fov)
+		return fov
+		
+	def get_distance_map(self, col, row):
+		"Returns the distance map toward the given position (see distance_map), shared by everything heading there until the terrain changes"
+		key = (col, row, self.version)
+		dist = self.dist_cache.get(key)
+		if dist is None:
+			with self.g.profiler.span("pathfind"):
+				dist = distance_map(self, (col, row))
+			self.dist_cache.put(key, dist)
+		return dist
 		
 ###############
 #Pathfinding
-#Algorithm used is A* Search
-from collections import defaultdict
-
-class OpenSet:
-	
-	def __init__(self, key=None):
-		self._data = []
-		self._dup = set()
-		self.key = key or (lambda v: v)
+#Algorithm used is A* Search, on flat cell indices
 		
-	def add(self, value):
-		if value in self._dup:
-			return
-		self._dup.add(value)
-		a = self._data
-		key = self.key
-		i = len(a)
-		a.append(value)
-		while i > 0:
-			parent = i // 2
-			if key(a[parent]) < key(a[i]):
-				break
-			a[parent], a[i] = a[i], a[parent]
-			i = parent
-			
-	def pop(self):
-		if len(self._data) == 0:
-			raise IndexError("pop from an empty heap")
-		a = self._data
-		val = a[0]
-		a[0] = a[-1]
-		a.pop()
-		key = self.key
-		i = 0
-		while True:
-			left = 2 * i + 1
-			right = 2 * i + 2
-			if left >= len(a):
-				break
-			node = left
-			if right < len(a) and key(a[right]) < key(a[left]):
-				node = right
-			if key(a[i]) > key(a[node]):
-				a[i], a[node] = a[node], a[i]
-				i = node
-			else:
-				break
-		self._dup.remove(val)
-		return val
-		
-	def __contains__(self, value):
-		return value in self._dup
-		
-	def __bool__(self):
-		return len(self._data) > 0
-		
-def pathfind(board, start, end, *, rand=False):
-	#Actual A* Search algorithm
-	def h(a, b):
-		return abs(a[0] - b[0]) + abs(a[1] - b[1])
-	gScore = defaultdict(lambda: float("inf"))
-	gScore[start] = 0
-	fScore = defaultdict(lambda: float("inf"))
-	fScore[start] = h(start, end)
-	open_set = OpenSet(fScore.__getitem__)
-	open_set.add(start)
-	came_from = {}
-	rows = board.rows
+def pathfind(board, start, end, *, rand=False, maxlen=None):
+	"""
+	Returns the shortest path from start to end as a list of positions (including both ends), or an empty list if there is none
+	rand - If true, ties between equally good paths are broken randomly
+	maxlen - If given, gives up on paths longer than this many steps
+	"""
 	cols = board.cols
-	def can_pass(x, y):
-		if (x, y) == end:
-			return not board.blocks_sight(x, y)
-		return board.is_passable(x, y)
+	size = cols * board.rows
+	passable = board.passable
+	mons = board.mons_cache
+	ex, ey = end
+	start_idx = start[1]*cols + start[0]
+	end_idx = ey*cols + ex
+	cost, came_from, seen, closed, gen = board.search_buffers()
+	random = board.g.rng.random if rand else None
+	cost[start_idx] = 0
+	came_from[start_idx] = -1
+	seen[start_idx] = gen
+	h = abs(start[0] - ex) + abs(start[1] - ey)
+	#Entries are (f, tie, idx); ties prefer cells closer to the end, then are broken randomly if rand is set
+	open_set = [(h, h, start_idx)]
 	while open_set:
-		curr = open_set.pop()
-		if curr == end:
-			path = [curr]
-			while curr in came_from:
+		curr = heappop(open_set)[2]
+		if curr == end_idx:
+			path = []
+			while curr != -1:
+				y, x = divmod(curr, cols)
+				path.append((x, y))
 				curr = came_from[curr]
-				path.append(curr)
 			path.reverse()
 			return path
-		neighbors = []
-		x, y = curr
-		if x + 1 < cols and can_pass(x + 1, y): 
-			neighbors.append((x + 1, y))
-		if x - 1 >= 0 and can_pass(x - 1, y): 
-			neighbors.append((x - 1, y))
-		if y + 1 < rows and can_pass(x, y + 1): 
-			neighbors.append((x, y + 1))
-		if y - 1 >= 0 and can_pass(x, y - 1):
-			neighbors.append((x, y - 1))
-		if rand:
-			random.shuffle(neighbors)
-		
-		for n in neighbors:
-			cost = 1
-			t = gScore[curr] + cost
-			if t < gScore[n]:
-				came_from[n] = curr
-				gScore[n] = t
-				fScore[n] = t + h(n, end)
-				
-				if n not in open_set:
-					open_set.add(n)
+		if closed[curr] == gen: #Already expanded through a shorter path
+			continue
+		closed[curr] = gen
+		t = cost[curr] + 1
+		y, x = divmod(curr, cols)
+		for n in (
+			curr + 1 if x + 1 < cols else -1,
+			curr - 1 if x > 0 else -1,
+			curr + cols if curr + cols < size else -1,
+			curr - cols
+		):
+			if n < 0 or closed[n] == gen or (seen[n] == gen and cost[n] <= t):
+				continue
+			if not passable[n] or (mons[n] and n != end_idx):
+				continue
+			ny, nx = divmod(n, cols)
+			h = abs(nx - ex) + abs(ny - ey)
+			if maxlen is not None and t + h > maxlen:
+				continue
+			cost[n] = t
+			came_from[n] = curr
+			seen[n] = gen
+			heappush(open_set, (t + h, h + random() if random else h, n))
 	return []
+	
+def distance_map(board, goal):
+	"""
+	Returns a flat list with the number of steps from each cell to goal, or -1 if the goal can't be reached from there
+	Only terrain is taken into account, not monsters, so it stays valid until the terrain changes or the goal moves.
+	Anything heading for the goal can follow it by stepping to any neighbor that is one step closer.
+	"""
+	cols = board.cols
+	size = cols * board.rows
+	passable = board.passable
+	dist = [-1] * size
+	start = goal[1]*cols + goal[0]
+	dist[start] = 0
+	frontier = [start]
+	d = 0
+	while frontier:
+		d += 1
+		next_frontier = []
+		for curr in frontier:
+			x = curr % cols
+			for n in (
+				curr + 1 if x + 1 < cols else -1,
+				curr - 1 if x > 0 else -1,
+				curr + cols if curr + cols < size else -1,
+				curr - cols
+			):
+				if n >= 0 and dist[n] < 0 and passable[n]:
+					dist[n] = d
+					next_frontier.append(n)
+		frontier = next_frontier
+	return dist
 
 #End pathfinding
 ###############	
\ No newline at end of file
@@ -0,0 +1,264 @@
+import time
+from os import get_terminal_size
+
+try:
+	import curses
+except ImportError: #Headless games don't need curses at all
+	curses = None
+
+#Attribute values match the ones curses uses, so game code can combine them the same way with either renderer
+A_BOLD = curses.A_BOLD if curses else 1 << 21
+A_REVERSE = curses.A_REVERSE if curses else 1 << 18
+
+class OutOfInput(Exception):
+	"Raised when a scripted input source runs out of keys while the game is waiting for one"
+
+class NullRenderer:
+	"A renderer that discards all output. Used for headless games (simulations, bots, benchmarks)"
+	active = False #Whether anything is actually displayed
+
+	def __init__(self, columns=80, lines=24):
+		self.columns = columns
+		self.lines = lines
+
+	def make_input(self):
+		return ScriptedInput()
+
+	def color_pair(self, num):
+		return num << 8
+
+	def get_size(self):
+		return self.columns, self.lines
+
+	def clear(self):
+		pass
+
+	def addstr(self, y, x, string, attr=0):
+		pass
+
+	def move(self, y, x):
+		pass
+
+	def refresh(self):
+		pass
+
+	def delay(self, secs):
+		pass
+
+	def close(self):
+		pass
+
+class FrameBuffer:
+	"""
+	An off-screen copy of the terminal that keeps the last frame drawn, so only the cells that changed need to be written
+	Rows are stored as lists of characters and attributes. Text drawn out of bounds is clipped.
+	"""
+
+	def __init__(self, columns, lines):
+		self.resize(columns, lines)
+
+	def resize(self, columns, lines):
+		self.columns = columns
+		self.lines = lines
+		self.blank_chars = [" "] * columns
+		self.blank_attrs = [0] * columns
+		self.chars = [self.blank_chars[:] for _ in range(lines)]
+		self.attrs = [self.blank_attrs[:] for _ in range(lines)]
+		self.invalidate()
+
+	def invalidate(self):
+		"Forgets the last frame, so the next one is written in full"
+		self.last_chars = [None] * self.lines
+		self.last_attrs = [None] * self.lines
+
+	def clear(self):
+		blank_chars = self.blank_chars
+		blank_attrs = self.blank_attrs
+		for row in self.chars:
+			row[:] = blank_chars
+		for row in self.attrs:
+			row[:] = blank_attrs
+
+	def addstr(self, y, x, string, attr=0):
+		if not 0 <= y < self.lines:
+			return
+		if len(string) == 1 and 0 <= x < self.columns: #Most writes are a single tile
+			self.chars[y][x] = string
+			self.attrs[y][x] = attr
+			return
+		if x < 0:
+			string = string[-x:]
+			x = 0
+		end = min(x + len(string), self.columns)
+		if end <= x:
+			return
+		self.chars[y][x:end] = string[:end - x]
+		self.attrs[y][x:end] = [attr] * (end - x)
+
+	def changes(self):
+		"""
+		Yields (y, x, string, attr) for each run of cells that differ from the last frame, then makes this frame the last one
+		Each run has a single attribute. Unchanged cells are only included when they're in between changed cells.
+		"""
+		columns = self.columns
+		for y in range(self.lines):
+			chars = self.chars[y]
+			attrs = self.attrs[y]
+			last_chars = self.last_chars[y]
+			last_attrs = self.last_attrs[y]
+			if chars == last_chars and attrs == last_attrs:
+				continue
+			if last_chars is None:
+				changed = [True] * columns
+			else:
+				changed = [c != lc or a != la for c, lc, a, la in zip(chars, last_chars, attrs, last_attrs)]
+			x = 0
+			while x < columns:
+				if not changed[x]:
+					x += 1
+					continue
+				attr = attrs[x]
+				end = x + 1
+				last = x
+				while end < columns and attrs[end] == attr:
+					if changed[end]:
+						last = end
+					end += 1
+				yield y, x, "".join(chars[x:last + 1]), attr
+				x = end
+			self.last_chars[y] = chars[:]
+			self.last_attrs[y] = attrs[:]
+
+class CursesRenderer:
+	active = True
+
+	def __init__(self):
+		self.screen = curses.initscr()
+		curses.start_color()
+		curses.init_pair(1, curses.COLOR_RED, 0)
+		curses.init_pair(2, curses.COLOR_GREEN, 0)
+		curses.init_pair(3, curses.COLOR_YELLOW, 0)
+		curses.init_pair(4, curses.COLOR_BLUE, 0)
+		curses.init_pair(5, curses.COLOR_MAGENTA, 0)
+		curses.init_pair(6, curses.COLOR_CYAN, 0)
+		self.screen.clear()
+		curses.noecho()
+		self.buffer = FrameBuffer(*self.get_size())
+		self.cursor = (0, 0)
+
+	def make_input(self):
+		return CursesInput(self)
+
+	def color_pair(self, num):
+		return curses.color_pair(num)
+
+	def get_size(self):
+		size = get_terminal_size()
+		return size.columns, size.lines
+
+	def clear(self):
+		buffer = self.buffer
+		size = self.get_size()
+		if size != (buffer.columns, buffer.lines):
+			buffer.resize(*size)
+			self.screen.clear()
+		else:
+			buffer.clear()
+
+	def invalidate(self):
+		"Makes the next refresh redraw everything, for when something else has written to the screen"
+		self.buffer.invalidate()
+
+	#Drawing goes to the frame buffer; refresh() writes only what changed since the last frame
+	def addstr(self, y, x, string, attr=0):
+		self.buffer.addstr(y, x, string, attr)
+
+	def move(self, y, x):
+		self.cursor = (y, x)
+
+	def refresh(self):
+		screen = self.screen
+		for y, x, string, attr in self.buffer.changes():
+			try:
+				screen.addstr(y, x, string, attr)
+			except curses.error: #Writing to the bottom right corner raises an error even though it works
+				pass
+		try:
+			screen.move(*self.cursor)
+		except curses.error:
+			pass
+		screen.refresh()
+
+	def delay(self, secs):
+		time.sleep(secs)
+
+	def close(self):
+		curses.nocbreak()
+		curses.echo()
+		curses.endwin()
+
+class CursesInput:
+
+	def __init__(self, renderer):
+		self.renderer = renderer
+		self.screen = renderer.screen
+
+	def getch(self):
+		return self.screen.getch()
+
+	def getstr(self, prompt=None):
+		curses.echo()
+		string = self.screen.getstr()
+		curses.noecho()
+		self.renderer.invalidate() #The echoed text isn't in the frame buffer
+		return string.decode()
+
+	def nodelay(self, flag):
+		self.screen.nodelay(flag)
+
+	def flushinp(self):
+		curses.flushinp()
+
+class ScriptedInput:
+	"""
+	An input source that reads from a queue of keys instead of the keyboard
+	keys - A string or iterable of keys (characters or key codes)
+	responder - If given, called with the prompt whenever getstr() is called and no keys are queued, and should return the answer string
+	"""
+
+	def __init__(self, keys="", responder=None):
+		self.keys = []
+		self.pos = 0
+		self.responder = responder
+		self._nodelay = False
+		self.push(keys)
+
+	def push(self, keys):
+		for k in keys:
+			self.keys.append(ord(k) if isinstance(k, str) else k)
+
+	def pending(self):
+		return len(self.keys) - self.pos
+
+	def getch(self):
+		if self.pos >= len(self.keys):
+			if self._nodelay:
+				return -1
+			raise OutOfInput("No more scripted keys")
+		key = self.keys[self.pos]
+		self.pos += 1
+		return key
+
+	def getstr(self, prompt=None):
+		if self.pos >= len(self.keys) and self.responder:
+			return self.responder(prompt)
+		chars = []
+		while (key := self.getch()) not in (10, 13):
+			chars.append(chr(key))
+		return "".join(chars)
+
+	def nodelay(self, flag):
+		self._nodelay = flag
+
+	def flushinp(self):
+		pass
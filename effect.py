@@ -1,5 +1,3 @@
-import random
-
 class Effect:
 	name = "Generic Effect"
 	
@@ -25,7 +23,7 @@ class Haste(Effect):
 	
 	def on_expire(self, player):
 		g = player.g
-		player.gain_effect("Lethargy", random.randint(4, 10))
+		player.gain_effect("Lethargy", player.g.rng.randint(4, 10))
 		
 class Resistance(Effect):
 	name = "Resistance"
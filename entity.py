@@ -1,77 +1,40 @@
-import random
 from collections import deque
 from board import pathfind
 
+MAX_DETOUR = 6 #How many extra steps a monster will take to get around others in the way
+
 class Entity:
+	uid = None #Identifies this entity in saves and in the state hash; entities from older saves get one when first saved
 	
 	def __init__(self, g):
 		self.g = g
+		self.uid = g.next_uid
+		g.next_uid += 1
 		self.x = 0
 		self.y = 0
 		self.curr_target = None
 		self.curr_path = deque()
 		self.placed = False
 		self.energy = 0 #How many energy points this entity has. Used to control movement speed.
-		self.fov = set()
+		self.fov = frozenset()
+		
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state["fov"] #Recalculated when needed
+		return state
+		
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.fov = frozenset()
 		
 	def calc_fov(self):
 		"Calculates all tiles an entity can see from the current position"
-		board = self.g.board
-		fov = set()
-		fov.add((self.x, self.y))
-		#Raycasting step
-		for x in range(board.cols):
-			for point in board.line_between((self.x, self.y), (x, 0), skipfirst=True):
-				fov.add(point)
-				if board.blocks_sight(*point):
-					break			
-			for point in board.line_between((self.x, self.y), (x, board.rows - 1), skipfirst=True):
-				fov.add(point)
-				if board.blocks_sight(*point):
-					break
-		for y in range(1, board.rows - 1):
-			for point in board.line_between((self.x, self.y), (0, y), skipfirst=True):
-				fov.add(point)
-				if board.blocks_sight(*point):
-					break
-			for point in board.line_between((self.x, self.y), (board.cols - 1, y), skipfirst=True):
-				fov.add(point)
-				if board.blocks_sight(*point):
-					break
-					
-		#Post-processing step
-		seen = set()
-		for cell in fov.copy():
-			if board.blocks_sight(*cell):
-				continue
-			x, y = cell
-			dx = x - self.x
-			dy = y - self.y
-			neighbors = {(x-1, y), (x+1, y), (x, y-1), (x, y+1)}
-			neighbors -= seen
-			neighbors -= fov
-			for xp, yp in neighbors:
-				seen.add((xp, yp))
-				if not (0 <= xp < board.cols):
-					continue
-				if not (0 <= yp < board.cols):
-					continue
-				if board.blocks_sight(xp, yp):
-					visible = False
-					dxp = xp - x
-					dyp = yp - y
-					if dx <= 0 and dy <= 0:
-						visible = dxp <= 0 or dyp <= 0
-					if dx >= 0 and dy <= 0:
-						visible = dxp >= 0 or dyp <= 0
-					if dx <= 0 and dy >= 0:
-						visible = dxp <= 0 or dyp >= 0	
-					if dx >= 0 and dy >= 0:
-						visible = dxp >= 0 or dyp >= 0
-					if visible:
-						fov.add((xp, yp))
-						
-		return fov
+		with self.g.profiler.span("calc_fov"):
+			return self.g.board.get_fov(self.x, self.y)
+		
+	def rehash(self):
+		"Updates the state hash after this entity's HP or effects change"
+		self.g.board.update_entity(self)
 		
 	def can_see(self, x, y):
 		return (x, y) in self.fov
@@ -89,16 +52,31 @@ class Entity:
 	def clear_path(self):
 		self.curr_path.clear()
 		
-	def path_towards(self, x, y, maxlen=None):
+	def path_towards(self, x, y, maxlen=None, shared=False):
+		"""
+		Takes a step along the shortest path toward (x, y)
+		shared - Whether to use the board's shared distance map toward (x, y), for a position that several monsters may be heading
+		to (such as where the player was last seen). Paths toward the player always use it
+		"""
 		if self.curr_target == (x, y) and self.curr_path and self.move_to(*self.curr_path.popleft()):
 			if (self.x, self.y) == (x, y):
 				self.clear_path()
 			return
-		path = pathfind(self.g.board, (self.x, self.y), (x, y), rand=True)
+		board = self.g.board
+		player = self.g.player
+		if shared or (x, y) == (player.x, player.y):
+			#Everything chasing the player, or where it was last seen, shares one distance map instead of each doing its own search
+			d = board.get_distance_map(x, y)[self.y*board.cols + self.x]
+			if d <= 0 or (maxlen and d > maxlen): #Already there, or no path short enough
+				return
+			if self.step_downhill(x, y):
+				return
+			#Every step closer is blocked by other monsters; look for a way around them, but not a long detour
+			maxlen = min(maxlen or d + MAX_DETOUR, d + MAX_DETOUR)
+		with self.g.profiler.span("pathfind"):
+			path = pathfind(board, (self.x, self.y), (x, y), rand=True, maxlen=maxlen)
 		if len(path) < 2:
 			return
-		if maxlen and len(path) > maxlen+1:
-			return
 		currX, currY = self.x, self.y
 		self.curr_target = (x, y)
 		self.curr_path = deque(path[1:])
@@ -107,6 +85,31 @@ class Entity:
 		dy = newY - currY
 		self.move(dx, dy)
 		
+	def step_downhill(self, x, y):
+		"""
+		Takes a step toward (x, y) using the board's shared distance map for that position
+		Returns False if every step closer is blocked by a monster
+		"""
+		board = self.g.board
+		dist = board.get_distance_map(x, y)
+		cols = board.cols
+		curr = self.y*cols + self.x
+		d = dist[curr]
+		goal = y*cols + x
+		mons = board.mons_cache
+		steps = []
+		for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+			if not board.in_bounds(self.x + dx, self.y + dy):
+				continue
+			n = curr + dy*cols + dx
+			if dist[n] == d - 1 and (not mons[n] or n == goal and mons[n] is self.g.player):
+				steps.append((dx, dy))
+		if not steps:
+			return False
+		self.clear_path()
+		self.move(*self.g.rng.choice(steps))
+		return True
+		
 	def set_path(self, path):
 		self.curr_path = deque(path)
 		
@@ -125,17 +128,17 @@ class Entity:
 	def place_randomly(self):
 		board = self.g.board
 		for _ in range(200):
-			x = random.randint(1, board.cols - 2)
-			y = random.randint(1, board.rows - 2)
+			x = self.g.rng.randint(1, board.cols - 2)
+			y = self.g.rng.randint(1, board.rows - 2)
 			if self.can_place(x, y):
 				break
 		else: #We couldn't place the player randomly, so let's search all possible positions in a random order
 			row_ind = list(range(1, board.rows - 1))
-			random.shuffle(row_ind)
+			self.g.rng.shuffle(row_ind)
 			found = False
 			for ypos in row_ind:
 				col_ind = list(range(1, board.cols - 1))
-				random.shuffle(col_ind)
+				self.g.rng.shuffle(col_ind)
 				for xpos in col_ind:
 					if self.can_place(xpos, ypos):
 						x, y = xpos, ypos
@@ -162,6 +165,7 @@ class Entity:
 		tmp = (self.x, self.y)
 		self.x, self.y = other.x, other.y
 		other.x, other.y = tmp
+		self.g.board.swap_cache(tmp, (self.x, self.y))
 		
 	def can_move(self, x, y):
 		return self.g.board.is_passable(x, y)
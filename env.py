@@ -0,0 +1,242 @@
+#A step/reset environment around Game for training and evaluating bots, in the style of a Gym environment
+#Nothing here uses curses. Observations are written into buffers that are allocated once and updated in place each step,
+#only changing the cells that changed, so they're cheap to produce. Copy them if you need to keep an old observation.
+#The buffers support the buffer protocol, so e.g. numpy.frombuffer(env.grid, numpy.uint8).reshape(4, rows, cols) works.
+import os, tempfile
+from array import array
+from enum import IntEnum
+
+from gameobj import Game
+from board import REVEALED, STAIR
+from items import Scroll, Armor, Weapon, Wand
+
+class Action(IntEnum):
+	UP = 0
+	LEFT = 1
+	DOWN = 2
+	RIGHT = 3
+	WAIT = 4
+	ATTACK = 5 #Attacks an adjacent hostile monster
+	PICKUP = 6
+	DESCEND = 7
+	USE_ITEM = 8 #Uses the inventory item chosen by step()'s item argument, aimed at the monster chosen by its target argument
+
+MOVES = {
+	Action.UP: (0, -1),
+	Action.LEFT: (-1, 0),
+	Action.DOWN: (0, 1),
+	Action.RIGHT: (1, 0)
+}
+
+#The grid has four channels, each with one byte per cell, in row-major order:
+#0: terrain - 0 unexplored, 1 wall, 2 floor, 3 stairs
+#1: visible - 1 if the player can currently see the cell
+#2: entities - 1 the player, 2 a hostile monster, 3 a friendly monster (only monsters the player can see)
+#3: items - The kind of the top item on the cell (see item_kind), for explored cells
+TERRAIN, VISIBLE, ENTITIES, ITEMS = range(4)
+UNEXPLORED, WALL, FLOOR, STAIRS = range(4)
+
+STATS = ("HP", "max HP", "STR", "DEX", "level", "exp", "depth", "x", "y", "inventory", "poison", "ticks")
+
+def item_kind(item):
+	if isinstance(item, Weapon):
+		return 1
+	if isinstance(item, Armor):
+		return 2
+	if isinstance(item, Wand):
+		return 3
+	if isinstance(item, Scroll):
+		return 4
+	return 5 #Potions and anything else
+
+def respond(prompt):
+	"Answers the game's prompts for a bot"
+	if prompt and "(S)TR or (D)EX" in prompt:
+		return "S"
+	return "n" #Don't cancel or take anything off
+
+class DungeonEnv:
+	"""
+	reset() starts a new game and returns the observation; step() takes an action and returns (observation, reward, done, info)
+	The observation is the dict {"grid": grid, "stats": stats}, the same objects every time:
+	grid - A bytearray of the four channels described above
+	stats - An array of ints, in the order given by STATS
+	The reward is 1 for going down the stairs and -1 for dying, and 0 otherwise.
+	Items that need a target (such as wands) are aimed at one of the eligible monsters the player can see, counting from the
+	nearest: step()'s target argument picks which (0 for the nearest), wrapping around if it's more than there are.
+	"""
+	
+	def __init__(self, seed=None):
+		self.seed = seed
+		self.g = None
+		self.folder = tempfile.TemporaryDirectory() #Saves from finished activities go here, not into the working directory
+		self.grid = bytearray()
+		self.channels = []
+		self.stats = array("i", [0] * len(STATS))
+		self.observation = {"grid": self.grid, "stats": self.stats}
+		self.info = {"depth": 1, "turns": 0, "death_cause": None, "acted": False}
+		self.target = 0
+	
+	def reset(self, seed=None):
+		if seed is None:
+			seed = self.seed
+			if self.seed is not None:
+				self.seed += 1 #The next reset plays a different game
+		if self.g is not None:
+			self.g.flush_saves() #The last game's saves go in the same folder
+		g = Game.headless(responder=respond, seed=seed)
+		g.choose_target = self.pick_target
+		g.journal.path = os.path.join(self.folder.name, "save.dat")
+		g.journal.journal_path = os.path.join(self.folder.name, "save.journal")
+		g.generate_level()
+		g.refresh_cache()
+		g.player.recalc_passives()
+		g.draw_board()
+		self.g = g
+		size = g.board.cols * g.board.rows
+		if len(self.grid) != 4 * size:
+			for view in self.channels:
+				view.release() #The grid can't be resized while there are views into it
+			self.grid[:] = bytes(4 * size)
+			self.channels = [memoryview(self.grid)[c*size:(c+1)*size] for c in range(4)]
+			self.blank = bytes(size)
+		for view in self.channels:
+			view[:] = self.blank
+		self.board = None
+		self.version = None
+		self.num_revealed = 0
+		self.last_fov = frozenset()
+		self.marked = [] #Cells with something in the entities or items channel
+		self.info["turns"] = 0
+		self.refresh()
+		return self.observation
+	
+	def step(self, action, item=0, target=0):
+		g = self.g
+		player = g.player
+		depth = g.level
+		last = player.energy
+		self.target = target
+		self.act(Action(action), item)
+		acted = player.energy < last
+		if acted:
+			g.do_turn()
+			self.info["turns"] += 1
+		if player.resting or player.activity:
+			self.info["turns"] += g.fast_forward()
+		g.draw_board() #Reveals what the player can now see
+		reward = 0
+		if g.level > depth:
+			reward = 1
+		done = player.dead
+		if done:
+			reward = -1
+		self.info["acted"] = acted or g.level > depth
+		self.refresh()
+		return self.observation, reward, done, self.info
+	
+	def act(self, action, item):
+		g = self.g
+		player = g.player
+		board = g.board
+		if action in MOVES:
+			player.move(*MOVES[action])
+		elif action == Action.WAIT:
+			player.energy = 0
+		elif action == Action.ATTACK:
+			for dx, dy in MOVES.values():
+				m = g.get_monster(player.x + dx, player.y + dy)
+				if m is not None and not m.is_friendly():
+					player.attack(dx, dy)
+					break
+		elif action == Action.PICKUP:
+			if board.get_items(player.x, player.y):
+				player.add_item(board.pop_item(player.x, player.y))
+				player.energy -= player.get_speed()
+		elif action == Action.DESCEND:
+			if board.get(player.x, player.y).stair:
+				g.descend()
+		elif action == Action.USE_ITEM:
+			if 0 <= item < len(player.inventory):
+				player.use_item(player.inventory[item])
+	
+	def pick_target(self, monsters):
+		"Picks the target for an item, in place of the game asking the player"
+		player = self.g.player
+		monsters.sort(key=lambda m: (m.distance(player), m.y, m.x))
+		return monsters[self.target % len(monsters)]
+	
+	def refresh(self):
+		"Updates the observation buffers from the game"
+		g = self.g
+		board = g.board
+		player = g.player
+		cols = board.cols
+		terrain, visible, entities, items = self.channels
+		
+		#Terrain only changes as cells are revealed, unless the level or the terrain itself changes
+		revealed = g.revealed
+		if board is not self.board or board.version != self.version or len(revealed) < self.num_revealed:
+			terrain[:] = self.blank
+			self.board = board
+			self.version = board.version
+			self.num_revealed = 0
+		passable = board.passable
+		flags = board.flags
+		for i in range(self.num_revealed, len(revealed)):
+			x, y = revealed[i]
+			idx = y*cols + x
+			if not passable[idx]:
+				terrain[idx] = WALL
+			elif flags[idx] & STAIR:
+				terrain[idx] = STAIRS
+			else:
+				terrain[idx] = FLOOR
+		self.num_revealed = len(revealed)
+		
+		fov = player.fov
+		if fov is not self.last_fov:
+			for x, y in self.last_fov:
+				visible[y*cols + x] = 0
+			for x, y in fov:
+				visible[y*cols + x] = 1
+			self.last_fov = fov
+		
+		marked = self.marked
+		for idx in marked:
+			entities[idx] = 0
+			items[idx] = 0
+		marked.clear()
+		for idx, pile in board.items.items():
+			if pile and flags[idx] & REVEALED:
+				items[idx] = item_kind(pile[-1])
+				marked.append(idx)
+		idx = player.y*cols + player.x
+		entities[idx] = 1
+		marked.append(idx)
+		for m in board.monsters_in_fov(fov):
+			idx = m.y*cols + m.x
+			entities[idx] = 3 if m.is_friendly() else 2
+			marked.append(idx)
+		
+		stats = self.stats
+		stats[0] = player.HP
+		stats[1] = player.get_max_hp()
+		stats[2] = player.STR
+		stats[3] = player.DEX
+		stats[4] = player.level
+		stats[5] = player.exp
+		stats[6] = g.level
+		stats[7] = player.x
+		stats[8] = player.y
+		stats[9] = len(player.inventory)
+		stats[10] = player.poison
+		stats[11] = player.ticks
+		info = self.info
+		info["depth"] = g.level
+		info["death_cause"] = player.death_cause
+	
+	def close(self):
+		if self.g is not None:
+			self.g.flush_saves()
+		self.folder.cleanup()
@@ -0,0 +1,49 @@
+#Field of view using symmetric shadowcasting
+#The area around the origin is split into four quadrants. Each quadrant is scanned row by row outwards,
+#keeping track of the slopes of the parts of the row that aren't in shadow yet, so every cell is visited at most once.
+#Visibility is symmetric: if A can see B, then B can see A.
+#Slopes are stored as (numerator, denominator) pairs with a positive denominator, to keep all the math in integers.
+
+#How each quadrant maps (depth, col) to board offsets
+QUADRANTS = (
+	(0, 1, -1, 0), #North
+	(1, 0, 0, 1), #East
+	(0, 1, 1, 0), #South
+	(-1, 0, 0, 1) #West
+)
+
+def compute_fov(origin, cols, rows, blocks_sight):
+	"""
+	Returns the set of cells visible from origin on a board of the given size
+	blocks_sight - A function taking (x, y) and returning whether that cell blocks sight
+	The origin itself is always visible. Cells out of bounds are treated as blocking sight, but are never included.
+	"""
+	ox, oy = origin
+	fov = {origin}
+	add = fov.add
+	for dx_depth, dx_col, dy_depth, dy_col in QUADRANTS:
+		#Each row is (depth, start_num, start_den, end_num, end_den)
+		stack = [(1, -1, 1, 1, 1)]
+		while stack:
+			depth, sn, sd, en, ed = stack.pop()
+			min_col = (2*depth*sn + sd) // (2*sd) #Rounds ties up
+			max_col = -((ed - 2*depth*en) // (2*ed)) #Rounds ties down
+			prev_wall = None
+			for col in range(min_col, max_col + 1):
+				x = ox + depth*dx_depth + col*dx_col
+				y = oy + depth*dy_depth + col*dy_col
+				inside = 0 <= x < cols and 0 <= y < rows
+				wall = not inside or blocks_sight(x, y)
+				if inside and (wall or (col*sd >= depth*sn and col*ed <= depth*en)):
+					add((x, y))
+				if prev_wall and not wall:
+					#Coming out of a wall; the visible part of the row starts here
+					sn = 2*col - 1
+					sd = 2*depth
+				elif prev_wall is False and wall:
+					#Going into a wall; everything before it continues on the next row
+					stack.append((depth + 1, sn, sd, 2*col - 1, 2*depth))
+				prev_wall = wall
+			if prev_wall is False:
+				stack.append((depth + 1, sn, sd, en, ed))
+	return fov
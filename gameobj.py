@@ -1,24 +1,26 @@
-import random, curses, textwrap, time
-from os import get_terminal_size, path
+import random, textwrap, time
 from itertools import islice
 from collections import deque
 
 from utils import *
-from board import Board
+from board import Board, REVEALED
 from player import Player
 from effect import Effect
-from monster import Monster
+from monster import Monster, find_dup_symbols
 from items import *
-
-import pickle
+from display import CursesRenderer, NullRenderer, A_BOLD, A_REVERSE
+from scheduler import TurnScheduler
+from animation import AnimationQueue
+from saving import SaveJournal
+from profiler import Profiler
+from zobrist import key, player_key, LEVEL
 
 class GameTextMenu:
 	
 	def __init__(self, g):
-		self.screen = g.screen
+		self.renderer = g.renderer
 		self.g = g
-		size = get_terminal_size()
-		self.termwidth = size.columns
+		self.termwidth = self.renderer.get_size()[0]
 		self.msg = []
 		
 	def add_text(self, txt):
@@ -32,16 +34,17 @@ class GameTextMenu:
 		self.msg.clear()
 	
 	def display(self):
-		self.screen.clear()
+		renderer = self.renderer
+		renderer.clear()
 		for i in range(len(self.msg)):
-			self.screen.addstr(i, 0, self.msg[i])
-		self.screen.refresh()
+			renderer.addstr(i, 0, self.msg[i])
+		renderer.refresh()
 			
 	def close(self):
 		self.g.draw_board()
 		
 	def getch(self):
-		return self.screen.getch()
+		return self.g.input_source.getch()
 		
 	def getchar(self):
 		return chr(self.getch())
@@ -50,74 +53,101 @@ class GameTextMenu:
 		while self.getch() != 10: pass
 
 class Game:
-	_INST = None
-	
-	def __new__(cls):
-		if cls._INST:
-			return cls._INST
-		obj = object.__new__(cls)
-		cls._INST = obj
-		return obj
 	
-	def __init__(self):
-		self.screen = curses.initscr()
-		curses.start_color()
-		curses.init_pair(1, curses.COLOR_RED, 0)
-		curses.init_pair(2, curses.COLOR_GREEN, 0)
-		curses.init_pair(3, curses.COLOR_YELLOW, 0)
-		curses.init_pair(4, curses.COLOR_BLUE, 0)
-		curses.init_pair(5, curses.COLOR_MAGENTA, 0)
-		curses.init_pair(6, curses.COLOR_CYAN, 0)
-		
-		self.screen.clear()
-		curses.noecho()
+	def __init__(self, renderer=None, input_source=None, seed=None):
+		#With no renderer, the game runs in a curses terminal
+		#Pass a NullRenderer (and optionally a ScriptedInput) to run a headless game without a TTY
+		#Every roll in the game comes from self.rng, so two games with the same seed and inputs play out identically
+		if seed is None:
+			seed = random.randrange(2**32)
+		self.seed = seed
+		self.rng = Rng(seed)
+		if renderer is None:
+			renderer = CursesRenderer()
+		if input_source is None:
+			input_source = renderer.make_input()
+		self.renderer = renderer
+		self.input_source = input_source
+		self.next_uid = 0
 		self.board = Board(self, 40, 16)
 		self.player = Player(self)
 		self.monsters = []
+		self.scheduler = TurnScheduler(self)
 		self.msg_list = deque(maxlen=50)
 		self.msg_cursor = 0
 		self.blast = set()
-		self.projectile = None
+		self.projectiles = set()
+		self.animations = AnimationQueue(self)
 		self.select = None
 		self.level = 1
 		self.revealed = []
 		self.last_save = time.time()
+		self.journal = SaveJournal(self, "save.dat", "save.journal")
+		self.profiler = Profiler()
+		self.recorder = None #Records the input to a replay file; see replay.py
+		self.replay_length = None #Length of the replay file when the game was last saved
+		self.choose_target = None #If set, called with the eligible monsters to pick a target without asking the player (see env.py)
 		types = Effect.__subclasses__()
 		self.effect_types = {t.name:t for t in types}
 		self.mon_types = Monster.__subclasses__()
+		self.dup_warnings = find_dup_symbols(self.mon_types)
+		
+	@classmethod
+	def headless(cls, keys="", responder=None, columns=80, lines=24, seed=None):
+		"Creates a game that doesn't use the terminal at all"
+		from display import ScriptedInput
+		return cls(NullRenderer(columns, lines), ScriptedInput(keys, responder), seed)
 		
 	def __getstate__(self):
 		d = self.__dict__.copy()
-		del d["screen"]
+		del d["renderer"]
+		del d["input_source"]
+		del d["journal"]
+		del d["profiler"]
+		del d["recorder"]
+		del d["choose_target"]
 		return d
 	
 	def __setstate__(self, state):
 		self.__dict__.update(state)
-		self.screen = curses.initscr()
+		
+	def delay(self, secs):
+		self.renderer.delay(secs)
 		
 	def load_game(self):
+		self.flush_saves()
 		try:
-			obj = pickle.load(open("save.pickle", "rb"))
-			self.__dict__.update(obj.__dict__)
+			self.journal.load()
 		except:
 			self.print_msg("Unable to load saved game.", "yellow")
 			self.delete_saved_game()
 			
 	def save_game(self):
-		pickle.dump(self, open("save.pickle", "wb"))
+		#The state is snapshotted here; the files are written on the save thread
+		if self.recorder:
+			self.replay_length = self.recorder.mark()
+		with self.profiler.span("save_game"):
+			self.journal.save()
 		self.last_save = time.time()
 		
 	def autosave(self):
 		if time.time() - self.last_save > 1:
 			self.save_game()
 		
+	def flush_saves(self):
+		"Waits for any saves in progress to be written, and tells the player if one failed"
+		try:
+			self.journal.writer.flush()
+		except Exception as e:
+			self.print_msg(f"Unable to save the game: {e}", "yellow")
+	
 	def has_saved_game(self):
-		return path.exists("save.pickle")
+		self.flush_saves()
+		return self.journal.exists()
 	
 	def delete_saved_game(self):
-		if self.has_saved_game():
-			import os
-			os.remove("save.pickle")
+		self.flush_saves()
+		self.journal.delete()
 	
 	def help_menu(self):
 		menu = GameTextMenu(self)
@@ -131,6 +161,8 @@ class Game:
 		menu.add_text("? - brings up this menu again")
 		menu.add_text(". - wait a turn")
 		menu.add_text("+ - view equipped rings (and bonuses from them)")
+		menu.add_text("v - turn animations on or off")
+		menu.add_text("` - show or hide the profiling overlay")
 		menu.add_text("Q - quit the game")
 		menu.add_line()
 		menu.add_text("Press enter to continue")
@@ -184,24 +216,16 @@ class Game:
 		menu.display()
 		menu.wait_for_enter()
 			
-	def set_projectile_pos(self, x, y):
-		self.projectile = (x, y)
-	
-	def clear_projectile(self):
-		self.projectile = None
-		
 	def spawn_item(self, item, pos):
-		self.board.get(*pos).items.append(item)
+		self.board.add_item(*pos, item)
 		
 	def input(self, message=None):
 		if message:
 			self.print_msg(message)
 		self.draw_board()
-		curses.echo()
-		string = self.screen.getstr()
-		curses.noecho()
+		string = self.input_source.getstr(message)
 		self.draw_board()
-		return string.decode()
+		return string
 		
 	def yes_no(self, message):
 		while (choice := self.input(message + " (Y/N)").lower()) not in ["y", "n"]:
@@ -218,19 +242,21 @@ class Game:
 			if not monsters:
 				self.print_msg(error)
 				return None
+		if self.choose_target:
+			return self.choose_target(monsters)
 		self.print_msg("Target which monster?")
 		self.print_msg("Use the a and d keys to select")
 		monsters.sort(key=lambda m: m.y)
 		monsters.sort(key=lambda m: m.x)
-		index = random.randrange(len(monsters))
+		index = self.rng.randrange(len(monsters))
 		last = -1
 		while True:
 			self.select = monsters[index]
 			if last != index:
 				self.draw_board()
 				last = index
-			curses.flushinp()
-			num = self.screen.getch()
+			self.input_source.flushinp()
+			num = self.input_source.getch()
 			char = chr(num)
 			if char == "a":
 				index -= 1
@@ -247,25 +273,42 @@ class Game:
 		
 	def add_monster(self, m):
 		if m.place_randomly():
-			self.monsters.append(m)
+			self.track_monster(m)
 			
 	def add_monster_at(self, m, pos):
 		if m.place_randomly():
-			self.monsters.append(m)
+			self.track_monster(m)
 			
+	def descend(self):
+		"Takes the player down the stairs to a new level"
+		was_any_allies = any(m.summon_timer is not None for m in self.monsters)
+		self.generate_level()
+		self.level += 1
+		if was_any_allies:
+			self.print_msg("You descend deeper into the dungeon, leaving your summoned allies behind.")
+		else:
+			self.print_msg("You descend deeper into the dungeon.")	
+		player = self.player
+		for m in player.monsters_in_fov():
+			if self.rng.x_in_y(4, self.level):
+				continue
+			if self.rng.dice(1, 20) + self.rng.calc_mod(player.DEX) - 4 < m.passive_perc:
+				m.is_aware = True
+		
 	def place_monster(self, typ):
 		m = typ(self)
 		if m.place_randomly():
-			self.monsters.append(m)
+			self.track_monster(m)
 			return m
 		return None
 	
 	def generate_level(self):
 		self.monsters.clear()
+		self.scheduler.clear()
 		self.board.generate()
 		self.player.rand_place()
 		self.player.fov = self.player.calc_fov()
-		num = random.randint(3, 4) + random.randint(0, int(1.4*(self.level - 1)**0.65))
+		num = self.rng.randint(3, 4) + self.rng.randint(0, int(1.4*(self.level - 1)**0.65))
 		monsters = self.mon_types
 		pool = []
 		for t in monsters:
@@ -274,31 +317,36 @@ class Game:
 				pool.append(t)
 		assert len(pool) > 0
 		for _ in range(num):
-			typ = random.choice(pool)	
+			typ = self.rng.choice(pool)	
 			m = typ(self)
 			fuzz = max(1, m.MAX_HP//10)
-			delta = random.randint(0, fuzz) - random.randint(0, fuzz)
+			delta = self.rng.randint(0, fuzz) - self.rng.randint(0, fuzz)
 			new_HP = max(1, m.MAX_HP + delta)
 			m.HP = m.MAX_HP = new_HP
 			if m.place_randomly():
-				if one_in(2) and x_in_y(8, self.level):
+				if self.rng.one_in(2) and self.rng.x_in_y(8, self.level):
 					los_tries = 100
 					while los_tries > 0:
 						if not self.player.sees((m.x, m.y)):
 							break
 						m.place_randomly()
 						los_tries -= 1
-				self.monsters.append(m)
+				self.track_monster(m)
 		
-		def place_item(typ):
+		def place_item(typ, enchant=False):
 			for j in range(600):
-				x = random.randint(1, self.board.cols - 2)
-				y = random.randint(1, self.board.rows - 2)
-				if self.board.is_passable(x, y):
-					tile = self.board.get(x, y)
-					if not tile.items:
-						tile.items.append(item := typ())
-						return item
+				x = self.rng.randint(1, self.board.cols - 2)
+				y = self.rng.randint(1, self.board.rows - 2)
+				if self.board.is_passable(x, y) and not self.board.get_items(x, y):
+					item = typ()
+					item.randomize(self.rng)
+					if enchant and self.rng.one_in(20):
+						for _ in range(3):
+							item.enchant += 1
+							if not self.rng.one_in(3):
+								break
+					self.board.add_item(x, y, item) #Added once it's finished, since its key covers its enchantment and charges
+					return item
 			return None
 			
 		def apply_rand_enchant(item):
@@ -306,9 +354,9 @@ class Game:
 				enchants = ["speed", "life stealing"]
 				if item.dmg_type in ["pierce", "slash"]:
 					enchants.append("armor piercing")
-				item.ench_type = random.choice(enchants)
+				item.ench_type = self.rng.choice(enchants)
 				
-		if not one_in(8):	
+		if not self.rng.one_in(8):	
 			types = [
 				(HealthPotion, 55),
 				(ResistPotion, 20),
@@ -318,20 +366,20 @@ class Game:
 				(ClairPotion, 9)
 			]
 			for _ in range(4):
-				if x_in_y(45, 100):
-					typ = rand_weighted(*types)
+				if self.rng.x_in_y(45, 100):
+					typ = self.rng.rand_weighted(*types)
 					place_item(typ)	
-				elif x_in_y(60, 100):
-					if one_in(2):
+				elif self.rng.x_in_y(60, 100):
+					if self.rng.one_in(2):
 						place_item(HealthPotion)
 					break
 					
-			if one_in(5):
-				typ = random.choice([StrengthRing, ProtectionRing, DexterityRing])
+			if self.rng.one_in(5):
+				typ = self.rng.choice([StrengthRing, ProtectionRing, DexterityRing])
 				place_item(typ)
 				
-			if self.level > dice(1, 6) and x_in_y(3, 8):
-				typ = rand_weighted(
+			if self.level > self.rng.dice(1, 6) and self.rng.x_in_y(3, 8):
+				typ = self.rng.rand_weighted(
 					(MagicMissile, 10),
 					(PolymorphWand, 5),
 					(WandOfFear, 3),
@@ -339,8 +387,8 @@ class Game:
 				)
 				place_item(typ)
 			
-			if one_in(2):
-				typ = rand_weighted(
+			if self.rng.one_in(2):
+				typ = self.rng.rand_weighted(
 					(TeleportScroll, 3),
 					(SleepScroll, 2),
 					(ConfusionScroll, 3),
@@ -364,16 +412,11 @@ class Game:
 				(Greataxe, 7),
 			]
 			types = [t for t in types if t[1] >= int(65/self.level)]
-			num = binomial(random.randint(2, 3), 50)
+			num = self.rng.binomial(self.rng.randint(2, 3), 50)
 			for _ in range(num):
-				if (weapon := place_item(rand_weighted(*types))):
-					if one_in(20):
-						for _ in range(3):
-							weapon.enchant += 1
-							if not one_in(3):
-								break
+				place_item(self.rng.rand_weighted(*types), enchant=True)
 				
-			if self.level > 1 and x_in_y(min(55 + self.level, 80), 100):
+			if self.level > 1 and self.rng.x_in_y(min(55 + self.level, 80), 100):
 				types = [LeatherArmor]
 				if self.level > 2:
 					types.append(HideArmor)
@@ -388,12 +431,12 @@ class Game:
 				if self.level > 15:
 					types.append(PlateArmor)
 				num = 1
-				if self.level > random.randint(1, 3) and one_in(3):
+				if self.level > self.rng.randint(1, 3) and self.rng.one_in(3):
 					num += 1
-					if self.level > random.randint(1, 6) and one_in(3):
+					if self.level > self.rng.randint(1, 6) and self.rng.one_in(3):
 						num += 1
 				for _ in range(num):
-					place_item(random.choice(types))
+					place_item(self.rng.choice(types))
 						
 		
 		self.revealed.clear()
@@ -410,7 +453,13 @@ class Game:
 			return None
 		return self.board.get_mon_cache(x, y)
 		
+	def track_monster(self, m):
+		"Adds a monster that's already been placed on the board to the game"
+		self.monsters.append(m)
+		self.scheduler.add(m)
+		
 	def remove_monster(self, m):
+		self.scheduler.remove(m)
 		mons = self.monsters
 		try:
 			ind = mons.index(m)
@@ -433,28 +482,58 @@ class Game:
 			"yellow": 3
 		}
 		color = m.get(color, 0)
-		size = get_terminal_size()
-		termwidth = size.columns
+		termwidth = self.renderer.get_size()[0]
 		for line in str(msg).splitlines():
 			self.msg_list.extend(map(lambda s: (s, color), textwrap.wrap(line, termwidth)))
 		self.msg_cursor = max(0, len(self.msg_list) - self.get_max_lines())
 		
 	def get_max_lines(self):
-		return min(8, get_terminal_size().lines - (self.board.rows + 2))
+		return min(8, self.renderer.get_size()[1] - (self.board.rows + 2))
 		
 	def draw_board(self):
-		screen = self.screen
+		with self.profiler.span("draw_board"):
+			self._draw_board()
+			
+	def _draw_board(self):
 		board = self.board
+		fov = set(self.player.fov)
+		if self.player.has_effect("Clairvoyance"):
+			for point in self.board.get_in_circle((self.player.x, self.player.y), 8):
+				x, y = point
+				neighbors = [(x+1, y), (x-1, y), (x, y+1), (x, y-1), (x+1, y+1), (x+1, y-1), (x-1, y+1), (x-1, y-1)]
+				surrounded = True
+				for xp, yp in neighbors:
+					if not self.board.in_bounds(xp, yp):
+						continue
+					if not board.blocks_sight(xp, yp):
+						surrounded = False
+						break
+				if not surrounded:
+					fov.add(point)
+					
+		flags = board.flags
+		cols = board.cols
+		for point in fov:
+			x, y = point
+			i = y*cols + x
+			if not flags[i] & REVEALED:
+				flags[i] |= REVEALED
+				self.revealed.append(point)
+				
+		screen = self.renderer
+		if not screen.active: #Headless; revealing tiles is the only part that affects the game
+			return
+		color_pair = screen.color_pair
 		screen.clear()
 		
 		p = self.player
 		hp_str = f"HP {p.HP}/{p.get_max_hp()}"
 		c = 0
 		if p.HP <= p.get_max_hp()//8:
-			c = curses.color_pair(1) | curses.A_BOLD
+			c = color_pair(1) | A_BOLD
 		elif p.HP <= p.get_max_hp()//4:
-			c = curses.color_pair(3) 
-		width = get_terminal_size().columns
+			c = color_pair(3) 
+		width = screen.get_size()[0]
 		screen.addstr(0, 0, hp_str, c)
 		dr = ""
 		if p.hp_drain > 0:
@@ -481,122 +560,118 @@ class Game:
 			det_str = f"{stealth} stealth"
 			screen.addstr(4, wd - len(det_str), det_str)
 		
-		
-		fov = self.player.fov.copy()
-		if self.player.has_effect("Clairvoyance"):
-			for point in self.board.get_in_circle((self.player.x, self.player.y), 8):
-				x, y = point
-				neighbors = [(x+1, y), (x-1, y), (x, y+1), (x, y-1), (x+1, y+1), (x+1, y-1), (x-1, y+1), (x-1, y-1)]
-				surrounded = True
-				for xp, yp in neighbors:
-					if not self.board.in_bounds(xp, yp):
-						continue
-					if not board.blocks_sight(xp, yp):
-						surrounded = False
-						break
-				if not surrounded:
-					fov.add(point)
-					
-		for point in fov:
-			tile = board.get(*point)
-			if not tile.revealed:
-				tile.revealed = True
-				self.revealed.append(point)
 		offset = 1
 		marked = set()
 		for col, row in self.revealed:
-			tile = board.get(col, row)
-			s = tile.symbol
+			s = chr(board.symbols[row*board.cols + col])
+			items = board.get_items(col, row)
 			color = 0
 			if (col, row) == (self.player.x, self.player.y):
 				s = "P"
 				if not self.player.has_effect("Invisible"):
-					color = curses.A_REVERSE
+					color = A_REVERSE
 				else:
-					color = curses.color_pair(4)
-			elif tile.items:
-				item = tile.items[-1]
+					color = color_pair(4)
+			elif items:
+				item = items[-1]
 				s = item.symbol
-				color = curses.color_pair(2)
+				color = color_pair(2)
 				if isinstance(item, (Scroll, Armor)):
-					color = curses.color_pair(4) | curses.A_BOLD
+					color = color_pair(4) | A_BOLD
 				elif isinstance(item, Wand):
-					color = curses.color_pair(5) | curses.A_BOLD
+					color = color_pair(5) | A_BOLD
 				elif isinstance(item, Weapon):
-					color = curses.color_pair(5) | curses.A_REVERSE
-			elif tile.symbol == " ":
+					color = color_pair(5) | A_REVERSE
+			elif s == " ":
 				if (col, row) in fov:
 					s = "."
-				if self.projectile:
-					x, y = self.projectile
-					if (col, row) == (x, y):
-						s = "*"
+				if (col, row) in self.projectiles:
+					s = "*"
 			if (col, row) in self.blast:
-				color = curses.color_pair(2)
-				color |= curses.A_REVERSE
+				color = color_pair(2)
+				color |= A_REVERSE
 				marked.add((col, row))
-			try:
-				screen.addstr(row + offset, col, s, color)
-			except curses.error:
-				pass
+			screen.addstr(row + offset, col, s, color)
 		monpos = set()
 		for m in self.monsters:
 			x, y = m.x, m.y
 			if (x, y) in fov:
 				monpos.add((x, y))
-				color = curses.color_pair(3) if m.ranged else 0
+				color = color_pair(3) if m.ranged else 0
 				if m.has_effect("Confused"):
-					color = curses.color_pair(4)
+					color = color_pair(4)
 				elif m.has_effect("Stunned"):
-					color = curses.color_pair(5)
+					color = color_pair(5)
 				elif not m.is_aware:
 					if m.has_effect("Asleep"):
-						color = curses.color_pair(4)
-					color |= curses.A_REVERSE
+						color = color_pair(4)
+					color |= A_REVERSE
 				elif m.is_friendly():
-					color = curses.color_pair(6)
+					color = color_pair(6)
 				if m is self.select or (m.x, m.y) in self.blast:
-					color = curses.color_pair(2)
-					color |= curses.A_REVERSE
-				try:
-					screen.addstr(y+offset, x, m.symbol, color)
-				except curses.error:
-					pass
+					color = color_pair(2)
+					color |= A_REVERSE
+				screen.addstr(y+offset, x, m.symbol, color)
 		for x, y in (self.blast - monpos - marked):
 			if not self.board.in_bounds(x, y):
 				continue
-			try:
-				screen.addstr(y+offset, x, " ", curses.color_pair(2) | curses.A_REVERSE)
-			except curses.error:
-				pass
+			screen.addstr(y+offset, x, " ", color_pair(2) | A_REVERSE)
 		
 		max_lines = self.get_max_lines()
 		messages = list(islice(self.msg_list, self.msg_cursor, self.msg_cursor+self.get_max_lines()))
 		for i, msg in enumerate(messages):
 			message, color = msg
-			c = curses.color_pair(color)
+			c = color_pair(color)
 			if color == 1:
-				c |= curses.A_BOLD
+				c |= A_BOLD
 			if i == len(messages) - 1 and self.msg_cursor < max(0, len(self.msg_list) - self.get_max_lines()):
 				message += " (↓)"
-			try:
-				screen.addstr(board.rows + i + offset + 1, 0, message, c)
-			except:
-				pass
+			screen.addstr(board.rows + i + offset + 1, 0, message, c)
 		
-		try:
-			screen.move(board.rows + offset, 0)
-		except curses.error:
-			pass
+		if self.profiler.enabled:
+			self._draw_profiler(board.cols + 2, 5)
+		
+		screen.move(board.rows + offset, 0)
 		screen.refresh()
 		
+	def _draw_profiler(self, x, y):
+		"Draws the time per turn of each phase, and the board's cache hit rates"
+		screen = self.renderer
+		if screen.get_size()[0] - x < 32:
+			return
+		screen.addstr(y, x, f"{'ms/turn':<16}{'p50':>7}{'p95':>7}", A_BOLD)
+		for name, median, p95, _ in self.profiler.report():
+			y += 1
+			screen.addstr(y, x, f"{name[:16]:<16}{median:>7.2f}{p95:>7.2f}")
+		for name, (hits, misses) in self.board.cache_stats().items():
+			y += 1
+			rate = f"{hits/(hits + misses):.0%}" if hits + misses else "-"
+			screen.addstr(y, x, f"{name + ' cache':<24}{rate:>6}")
+		
 	def _stat_mod_color(self, mod):
 		if mod > 0:
-			return curses.color_pair(2)
+			return self.renderer.color_pair(2)
 		if mod < 0:
-			return curses.color_pair(1)
+			return self.renderer.color_pair(1)
 		return 0
 		
+	def state_hash(self):
+		"""
+		Returns a 64-bit fingerprint of the game state; games in the same state have the same hash
+		Most of it is kept up to date as the game changes (see zobrist.py). The player's own key is worked out here, since
+		so much of the player's code changes their HP, effects and stats.
+		"""
+		board = self.board
+		player = self.player
+		board.update_entity(player)
+		h = board.terrain_hash ^ board.items_hash ^ board.entities_hash ^ player.inventory_hash
+		return h ^ player_key(player) ^ key(LEVEL, self.level)
+		
+	def rehash(self):
+		"Recalculates the state hash from scratch. After this, state_hash() is what it would be if every change had been tracked"
+		self.board.rehash()
+		self.player.rehash_inventory()
+		
 	def refresh_cache(self):
 		"Refreshes the monster collision cache"
 		board = self.board
@@ -606,18 +681,69 @@ class Game:
 			board.set_cache(m.x, m.y, m)  
 		
 	def do_turn(self):
-		while self.player.energy <= 0:
-			if one_in(10): #In case anything goes wrong, refresh the monster collision cache every so often
-				self.refresh_cache()
-			self.player.do_turn()
-			order = self.monsters[:]
-			random.shuffle(order)
-			order.sort(key=lambda m: m.get_speed(), reverse=True)
-			self.player.energy += self.player.get_speed()		
-			for m in order:
-				if m.HP > 0:
-					m.do_turn()
-				else:
-					self.remove_monster(m)
+		self.profiler.end_turn() #A turn's drawing and saving happen after its do_turn, so each turn ends when the next one starts
+		self.animations.play() #Show what the player just did before the monsters act
+		with self.profiler.span("do_turn"):
+			while self.player.energy <= 0:
+				if self.rng.one_in(10): #In case anything goes wrong, refresh the monster collision cache every so often
+					self.refresh_cache()
+				self.player.do_turn()
+				self.player.energy += self.player.get_speed()		
+				self.scheduler.run_tick(self.player.ticks)
 				if self.player.dead:
-					return
\ No newline at end of file
+					break
+		self.animations.play()
+		
+	def fast_forward(self):
+		"""
+		Runs the player's rest or activity in a tight loop, without drawing or waiting between turns
+		Stops when HP is full or the activity is finished, or early if the player takes damage, a monster notices them, or a key is pressed.
+		Returns the number of turns that passed. The caller should redraw the board afterwards.
+		"""
+		player = self.player
+		inp = self.input_source
+		aware = {m for m in player.monsters_in_fov() if m.is_aware}
+		turns = 0
+		while not player.dead and (player.resting or player.activity):
+			#Only poll for keys here, so any prompts during the turn still wait for input
+			inp.nodelay(True)
+			char = inp.getch()
+			inp.nodelay(False)
+			if char != -1:
+				if player.resting:
+					if self.yes_no("Really cancel your rest?"):
+						self.print_msg("You stop resting.")
+						player.resting = False
+					else:
+						self.print_msg("You continue resting.")
+				else:
+					player.interrupt()
+				if not (player.resting or player.activity):
+					player.energy = self.rng.randint(1, player.get_speed())
+					self.save_game()
+					break
+			if player.resting and player.HP >= player.get_max_hp():
+				self.print_msg("HP restored.", "green")
+				player.resting = False
+				player.energy = self.rng.randint(1, player.get_speed())
+				self.save_game()
+				break
+			player.energy = 0
+			activity = player.activity
+			if activity and not player.resting:
+				activity.time -= 1
+				if activity.time <= 0:
+					activity.on_finished(player)
+					player.activity = None
+					player.energy = self.rng.randint(1, player.get_speed())
+					self.save_game()
+					break
+			self.do_turn() #Taking damage interrupts the rest or activity from inside here
+			turns += 1
+			for m in player.monsters_in_fov():
+				if m.is_aware and m not in aware:
+					aware.add(m)
+					if player.resting or player.activity:
+						self.print_msg(f"You notice a {m.name} approaching!", "yellow")
+						player.interrupt()
+		return turns
@@ -1,6 +1,6 @@
 
-import random, time
 from utils import *
+from zobrist import inventory_key
 
 class Item:
 	description = "This is a generic item that does nothing special. You shouldn't see this in-game."
@@ -29,6 +29,10 @@ class Item:
 	def can_enchant(self):
 		return False
 		
+	def randomize(self, rng):
+		"Rolls the random properties of a newly generated item"
+		pass
+		
 	def use(self, player):
 		g = player.g
 		g.print_msg("You use an item. Nothing interesting seems to happen")
@@ -43,6 +47,9 @@ class Enchantable(Item):
 	def can_enchant(self):
 		return self.enchant < 3
 		
+	def add_enchant(self):
+		self.enchant += 1
+		
 class Scroll(Item):
 	description = "This is a regular scroll that does nothing. If you see this, it's a bug."
 	
@@ -67,7 +74,7 @@ class HealthPotion(Item):
 			g.print_msg("Your HP is already full!")
 			return False
 		else:	
-			recover = 10 + dice(2, 40)
+			recover = 10 + g.rng.dice(2, 40)
 			g.print_msg("You recover some HP.")
 			player.HP = min(MAX_HP, player.HP + recover)
 			return True
@@ -84,7 +91,7 @@ class SpeedPotion(Item):
 		player.lose_effect("Lethargy", silent=True)
 		if player.has_effect("Haste"):
 			g.print_msg("Your speed begins to last even longer.")
-		player.gain_effect("Haste", random.randint(40, 60))
+		player.gain_effect("Haste", g.rng.randint(40, 60))
 		return True
 		
 class ResistPotion(Item):	
@@ -98,7 +105,7 @@ class ResistPotion(Item):
 		g.print_msg("You drink a resistance potion.")
 		if player.has_effect("Resistance"):
 			g.print_msg("Your resistance begins to last even longer.")
-		player.gain_effect("Resistance", random.randint(30, 45))
+		player.gain_effect("Resistance", g.rng.randint(30, 45))
 		return True
 		
 class InvisibilityPotion(Item):
@@ -112,7 +119,7 @@ class InvisibilityPotion(Item):
 		g.print_msg("You drink an invisibility potion.")
 		if player.has_effect("Invisible"):
 			g.print_msg("Your invisibility begins to last even longer.")
-		player.gain_effect("Invisible", random.randint(45, 70))
+		player.gain_effect("Invisible", g.rng.randint(45, 70))
 		return True
 		
 class RejuvPotion(Item):
@@ -127,7 +134,7 @@ class RejuvPotion(Item):
 		if player.has_effect("Rejuvenated"):
 			player.lose_effect("Rejuvenated", silent=True) #This doesn't stack
 		g.print_msg("You drink a potion of rejuvenation.")
-		player.gain_effect("Rejuvenated", random.randint(20, 25))
+		player.gain_effect("Rejuvenated", g.rng.randint(20, 25))
 		return True
 		
 class ClairPotion(Item):
@@ -141,7 +148,7 @@ class ClairPotion(Item):
 		g.print_msg("You drink a clairvoyance potion.")
 		if player.has_effect("Clairvoyance"):
 			g.print_msg("You feel even more clairvoyant.")
-		player.gain_effect("Clairvoyance", random.randint(45, 80))
+		player.gain_effect("Clairvoyance", g.rng.randint(45, 80))
 		return True
 
 class ConfusionScroll(Scroll):
@@ -156,11 +163,11 @@ class ConfusionScroll(Scroll):
 		for m in player.monsters_in_fov():
 			if m.is_eff_immune("Confused"):
 				g.print_msg(f"The {m.name} is unaffected.")
-			elif dice(1, 20) + calc_mod(m.WIS) >= 15:
+			elif g.rng.dice(1, 20) + g.rng.calc_mod(m.WIS) >= 15:
 				g.print_msg(f"The {m.name} resists.")
 			else:
 				g.print_msg(f"The {m.name} is confused!")
-				m.gain_effect("Confused", random.randint(30, 45))
+				m.gain_effect("Confused", g.rng.randint(30, 45))
 		return True
 		
 class SleepScroll(Scroll):
@@ -173,9 +180,9 @@ class SleepScroll(Scroll):
 		g = player.g
 		g.print_msg("You read a scroll of sleep. The scroll crumbles to dust.")
 		mons = list(player.monsters_in_fov())
-		random.shuffle(mons)
+		g.rng.shuffle(mons)
 		mons.sort(key=lambda m: m.HP)
-		power = dice(10, 8)
+		power = g.rng.dice(10, 8)
 		to_affect = []
 		for m in mons:
 			if m.has_effect("Asleep") or m.is_eff_immune("Asleep"):
@@ -185,10 +192,10 @@ class SleepScroll(Scroll):
 				break
 			to_affect.append(m)
 		if to_affect:
-			random.shuffle(to_affect)
+			g.rng.shuffle(to_affect)
 			for m in to_affect:
 				g.print_msg(f"The {m.name} falls asleep!")
-				m.gain_effect("Asleep", random.randint(30, 45))
+				m.gain_effect("Asleep", g.rng.randint(30, 45))
 				m.reset_check_timer()
 				m.is_aware = False
 		else:
@@ -218,16 +225,19 @@ class SummonScroll(Scroll):
 		g = player.g
 		g.print_msg("You read a scroll of summoning. The scroll crumbles to dust.")
 
-		points = list(player.fov)
-		points.remove((player.x, player.y))
-		types = list(filter(lambda t: t.diff <= 7 and g.level > t.min_level, g.mon_types))
-		num = random.randint(2, 3)
-		random.shuffle(points)
+		#Only free floor cells; the player's FOV includes the walls around it
+		points = [p for p in player.fov if p != (player.x, player.y) and g.board.is_passable(*p)]
+		types = list(filter(lambda t: t.diff <= 7 and g.level >= t.min_level, g.mon_types))
+		if not types:
+			g.print_msg("Nothing seems to happen.")
+			return True
+		num = g.rng.randint(2, 3)
+		g.rng.shuffle(points)
 		points.sort(key=lambda p: abs(p[0] - player.x) + abs(p[1] - player.y))
 		ind = 0
 		while ind < len(points) and num > 0:
-			typ = random.choice(types)
-			duration = random.randint(50, 80)
+			typ = g.rng.choice(types)
+			duration = g.rng.randint(50, 80)
 			pos = points[ind]
 			if g.monster_at(*pos):
 				ind += 1
@@ -236,8 +246,8 @@ class SummonScroll(Scroll):
 			m.ranged = False
 			m.place_at(*pos)
 			m.summon_timer = duration
-			g.monsters.append(m)
-			ind += random.randint(1, 2)
+			g.track_monster(m)
+			ind += g.rng.randint(1, 2)
 			num -= 1
 		return True
 		
@@ -364,20 +374,20 @@ class Weapon(Enchantable):
 		g = player.g
 		if self is player.weapon:
 			if g.yes_no(f"Put away your {self.name}?"):
-				player.weapon = UNARMED
+				player.weapon = player.unarmed
 				player.energy -= player.get_speed()
 			else:
 				return False
 		else:
-			if player.weapon is not UNARMED:
+			if not player.is_unarmed():
 				player.energy -= player.get_speed()
 				g.print_msg(f"You switch to your {self.name}.")
 			else:
 				g.print_msg(f"You wield a {self.name}.")
 			player.weapon = self
 			
-	def roll_dmg(self):
-		return self.dmg.roll()
+	def roll_dmg(self, rng):
+		return self.dmg.roll(rng)
 		
 	def on_hit(self, player, mon):
 		#TODO: Not yet implemented
@@ -420,11 +430,11 @@ class EnchantScroll(Scroll):
 			g.print_msg("You read a scroll of enchant. The scroll crumbles to dust.")
 			item = items[num-1]
 			g.print_msg(f"You enchant your {item.name}. It gains a +1 bonus.")
+			old = inventory_key(item)
 			item.add_enchant()
+			player.item_changed(item, old)
 		return True
 		
-UNARMED = NullWeapon()
-
 class Club(Weapon):
 	dmg_type = "bludgeon"
 	
@@ -506,10 +516,13 @@ class Greataxe(Weapon):
 class Wand(Item):
 	description = "This is a wand."
 	
-	def __init__(self, name, charges, efftype="blast"):
+	def __init__(self, name, efftype="blast"):
 		super().__init__(name, "Î")
-		self.charges = charges
+		self.charges = 0 #Rolled by randomize() when the wand is generated
 		self.efftype = efftype
+		
+	def randomize(self, rng):
+		self.charges = rng.randint(3, 7)
 	
 	def wand_effect(self, player, mon):
 		self.g.print_msg("Nothing special seems to happen.")
@@ -552,37 +565,32 @@ class Wand(Item):
 			for f in rounds:
 				if raycast(line, f):
 					break
-			g.blast.clear()
 			for x, y in line:
 				t = g.get_monster(x, y)
 				if t is not None:
 					if not target.despawn_summon():
 						self.wand_effect(player, t)
 						t.on_alerted()
-				g.blast.add((x, y))
-				g.draw_board()
-				time.sleep(0.001)
-			time.sleep(0.05)
-			g.blast.clear()
-			g.draw_board()
+			g.animations.add_blast(line, 0.05)
 		else:
+			path = []
 			for x, y in line:
-				g.set_projectile_pos(x, y)
-				g.draw_board()
-				time.sleep(0.03)
+				path.append((x, y))
 				if (t := g.get_monster(x, y)) is not None:
-					if t is not target and x_in_y(3, 5): #If a creature is in the way, we may hit it instead of our intended target.
+					if t is not target and g.rng.x_in_y(3, 5): #If a creature is in the way, we may hit it instead of our intended target.
 						g.print_msg(f"The {t.name} is in the way.")
 						target = t
 						break
-			g.clear_projectile()
+			g.animations.add_projectile(path)
 			if not target.despawn_summon():
 				self.wand_effect(player, target)
+		old = inventory_key(self)
 		self.charges -= 1
+		player.item_changed(self, old)
 		player.did_attack = True
 		alert = 2 + (self.efftype == "ray") #Ray effects that affect all monsters in a line are much more likely to alert monsters
 		for m in player.monsters_in_fov():
-			if x_in_y(alert, 4) or m is target: #Zapping a wand is very likely to alert nearby monsters to your position
+			if g.rng.x_in_y(alert, 4) or m is target: #Zapping a wand is very likely to alert nearby monsters to your position
 				m.on_alerted()
 		return (True if self.charges <= 0 else None)
 		
@@ -590,18 +598,19 @@ class MagicMissile(Wand):
 	description = "This wand can be used to fire magic missiles at creatures, which will always hit."
 	
 	def __init__(self):
-		super().__init__("wand of magic missiles", random.randint(3, 7))
+		super().__init__("wand of magic missiles")
 	
 	def wand_effect(self, player, target):
 		g = player.g
 		dam = 0
 		for _ in range(3):
-			dam += target.apply_armor(random.randint(2, 5))
+			dam += target.apply_armor(g.rng.randint(2, 5))
 		msg = f"The magic missiles hit the {target.name} "
 		if dam <= 0:
 			msg += "but do no damage."
 		else:
 			target.HP -= dam
+			target.rehash()
 			msg += f"for {dam} damage."
 			if target.HP > 0:
 				msg += f" Its HP: {target.HP}/{target.MAX_HP}"
@@ -613,7 +622,10 @@ class PolymorphWand(Wand):
 	description = "This wand can be used to polymorph nearby enemies into something weaker."
 	
 	def __init__(self):
-		super().__init__("polymorph wand", random.randint(random.randint(2, 7), 7))
+		super().__init__("polymorph wand")
+		
+	def randomize(self, rng):
+		self.charges = rng.randint(rng.randint(2, 7), 7)
 	
 	def wand_effect(self, player, target):
 		g = player.g
@@ -626,7 +638,7 @@ class WandOfFear(Wand):
 	description = "This wand can be used to make nearby enemies frightened of the player."
 	
 	def __init__(self):
-		super().__init__("wand of fear", random.randint(3, 7))
+		super().__init__("wand of fear")
 	
 	def wand_effect(self, player, target):
 		g = player.g
@@ -636,13 +648,13 @@ class WandOfFear(Wand):
 			g.print_msg(f"The {target.name} resists.")
 		else:
 			g.print_msg(f"The {target.name} is frightened!")
-			target.gain_effect("Frightened", random.randint(30, 60))
+			target.gain_effect("Frightened", g.rng.randint(30, 60))
 	
 class LightningWand(Wand):
 	description = "This wand can be used to cast lightning bolts, dealing damage to nearby enemies."
 	
 	def __init__(self):
-		super().__init__("wand of lightning", random.randint(3, 7), efftype="ray")
+		super().__init__("wand of lightning", efftype="ray")
 	
 	def wand_effect(self, player, target):
 		g = player.g
@@ -650,13 +662,14 @@ class LightningWand(Wand):
 		if not target.has_effect("Paralyzed") and target.saving_throw(target.DEX, 15):
 			numdice = 4
 			g.print_msg(f"The {target.name} partially resists.")
-		damage = target.apply_armor(dice(numdice, 6))
+		damage = target.apply_armor(g.rng.dice(numdice, 6))
 		msg = f"The bolt strikes the {target.name} "
 		if damage <= 0:
 			msg += "but does no damage."
 		else:
 			msg += f"for {damage} damage."
 			target.HP -= damage
+			target.rehash()
 		g.print_msg(msg)
 		if target.HP <= 0:
 			player.defeated_monster(target)
@@ -1,4 +1,3 @@
-import random, time
 from utils import *
 from entity import Entity
 from items import *
@@ -19,8 +18,17 @@ class Attack:
 	def on_hit(self, player, mon, dmg):
 		pass
 	
-symbols = {}
-dup_warnings = []
+def find_dup_symbols(types):
+	"Returns a warning message for each monster type that has the same symbol as an earlier one"
+	symbols = {}
+	warnings = []
+	for cls in types:
+		if cls.symbol in symbols:
+			other = symbols[cls.symbol] 
+			warnings.append(f"{cls.__name__} has same symbol as {other.__name__}")
+		else:
+			symbols[cls.symbol] = cls
+	return warnings
 								
 class Monster(Entity):
 	min_level = 1
@@ -43,10 +51,16 @@ class Monster(Entity):
 	#Monster traits
 	rubbery = False
 	
+	#Turn scheduling; see scheduler.py
+	synced_tick = None #The last tick this monster's per-tick updates were applied on, or None if it isn't scheduled
+	sched_token = None
+	due = float("inf") #The tick the scheduler will next wake this monster up on
+	sched_tie = 0
+	
 	def __init__(self, g, name="monster", HP=10, ranged=None, ranged_dam=(2, 3)):
 		super().__init__(g)
 		if ranged is None:
-			ranged = one_in(5)
+			ranged = self.g.rng.one_in(5)
 		if not isinstance(HP, int):
 			raise ValueError(f"HP must be an integer, got {repr(HP)} instead")
 		self.HP = HP
@@ -61,7 +75,7 @@ class Monster(Entity):
 		self.check_timer = 1
 		self.effects = {}
 		self.summon_timer = None
-		self.energy = -random.randrange(self.speed)
+		self.energy = -self.g.rng.randrange(self.speed)
 		self.target = None
 		
 	def is_friendly(self):
@@ -74,20 +88,33 @@ class Monster(Entity):
 		self.energy = -self.get_speed()
 		self.g.remove_monster(self)
 		
-	def __init_subclass__(cls):
-		if cls.symbol in symbols:
-			other = symbols[cls.symbol] 
-			dup_warnings.append(f"{cls.__name__} has same symbol as {other.__name__}")
-		else:
-			symbols[cls.symbol] = cls
-				
+	def sync(self):
+		"""
+		Applies the per-tick updates for the ticks the turn scheduler skipped while this monster had nothing to do
+		Anything that changes the monster's energy or timers from outside its own turn should call this first. has_effect(), gain_effect() and lose_effect() already do.
+		"""
+		if self.synced_tick is None:
+			return
+		tick = self.g.scheduler.sync_tick(self)
+		skipped = tick - self.synced_tick
+		if skipped <= 0:
+			return
+		self.synced_tick = tick
+		#Incapacitated monsters lose their turn each tick, so their energy doesn't go above 0
+		self.energy = min(0, self.energy + self.get_speed() * skipped)
+		if self.summon_timer is not None and self.summon_timer > 0:
+			self.summon_timer -= skipped
+		self.track_timer = max(0, self.track_timer - skipped)
+		for e in self.effects:
+			self.effects[e] -= skipped
+		
 	def get_speed(self):
 		speed = self.speed
 		#When effects modify speed, the effects will go here
 		return speed
 		
 	def reset_check_timer(self):
-		self.check_timer = random.randint(1, 4)
+		self.check_timer = self.g.rng.randint(1, 4)
 	
 	def move(self, dx, dy):
 		board = self.g.board
@@ -100,7 +127,7 @@ class Monster(Entity):
 		return eff in self.eff_immunities
 		
 	def get_ac(self, avg=False):
-		return 10 + calc_mod(self.DEX, avg)
+		return 10 + self.g.rng.calc_mod(self.DEX, avg)
 		
 	def choose_polymorph_type(self):
 		#Note: A bit of a hack using object polymorphing
@@ -110,23 +137,24 @@ class Monster(Entity):
 		tries = 100
 		while tries > 0:
 			tries -= 1
-			maxdiff = max(1, self.diff - one_in(2))
+			maxdiff = max(1, self.diff - self.g.rng.one_in(2))
 			newdiff = 1
-			for _ in range(random.randint(2, 3)):
-				newdiff = random.randint(newdiff, maxdiff)
+			for _ in range(self.g.rng.randint(2, 3)):
+				newdiff = self.g.rng.randint(newdiff, maxdiff)
 			choices = list(filter(lambda typ: newdiff == typ.diff, candidates))
 			if not choices:
 				continue 
-			chosen = random.choice(choices)
-			if one_in(6):
+			chosen = self.g.rng.choice(choices)
+			if self.g.rng.one_in(6):
 				return chosen
 			inst = chosen(self.g)
 			if inst.MAX_HP < self.MAX_HP:
-				if chosen.armor <= self.armor or one_in(2):
+				if chosen.armor <= self.armor or self.g.rng.one_in(2):
 					return chosen
-		return random.choice(candidates)		
+		return self.g.rng.choice(candidates)		
 		
 	def polymorph(self):
+		self.sync()
 		oldname = self.name
 		typ = self.choose_polymorph_type()
 		self.__class__ = typ
@@ -136,10 +164,14 @@ class Monster(Entity):
 		self.HP = inst.HP
 		self.MAX_HP = inst.MAX_HP
 		self.name = inst.name
+		self.rehash()
 		a_an = "an" if self.name[0] in "aeiou" else "a"
 		self.g.print_msg_if_sees((self.x, self.y), f"The {oldname} polymorphs into a {self.name}!")
+		self.g.scheduler.reschedule(self)
 					
 	def has_effect(self, name):
+		if self.synced_tick is not None:
+			self.sync()
 		return name in self.effects
 		
 	def lose_effect(self, name):
@@ -154,16 +186,22 @@ class Monster(Entity):
 		return False
 		
 	def gain_effect(self, name, duration):
+		self.sync()
 		if name not in self.effects:
 			self.effects[name] = 0
 		self.effects[name] += duration
+		self.rehash()
 		if self.incapacitated():
 			player = self.g.player
 			player.remove_grapple(self)
+		self.g.scheduler.reschedule(self)
 		
 	def lose_effect(self, name):
+		self.sync()
 		if name in self.effects:
 			del self.effects[name]
+			self.rehash()
+			self.g.scheduler.reschedule(self)
 			
 	def despawn_summon(self):
 		if self.summon_timer is None:
@@ -174,6 +212,7 @@ class Monster(Entity):
 		
 	def take_damage(self, dam, source=None):
 		self.HP -= dam
+		self.rehash()
 		if source is self.g.player and self.despawn_summon():
 			return
 		if self.HP <= 0:
@@ -188,7 +227,8 @@ class Monster(Entity):
 		self.energy += self.get_speed()
 		while self.energy > 0:
 			old = self.energy
-			self.actions()
+			with self.g.profiler.span("monster actions"):
+				self.actions()
 			if self.energy == old:
 				self.energy = min(self.energy, 0) 
 		self.tick_effects()
@@ -206,6 +246,7 @@ class Monster(Entity):
 			self.effects[e] -= 1
 			if self.effects[e] <= 0:
 				del self.effects[e]
+				self.rehash()
 				if e == "Confused":
 					self.g.print_msg_if_sees((self.x, self.y), f"The {self.name} is no longer confused.")
 				elif e == "Stunned":
@@ -222,7 +263,7 @@ class Monster(Entity):
 		player = self.g.player
 		if not self.has_line_of_fire():
 			return False
-		return x_in_y(2, 5)
+		return self.g.rng.x_in_y(2, 5)
 		
 	def modify_damage(self, target, damage):
 		player = self.g.player
@@ -233,13 +274,13 @@ class Monster(Entity):
 			protect = target.armor	
 		if protect > 0:
 			if target is player:
-				damage -= random.randint(0, protect*4) #Armor can reduce damage
+				damage -= self.g.rng.randint(0, protect*4) #Armor can reduce damage
 			else:
-				damage -= random.randint(0, protect*2)
+				damage -= self.g.rng.randint(0, protect*2)
 			if damage <= 0:
 				return 0
 		if target is player and player.has_effect("Resistance"):
-			damage = binomial(damage, 50)
+			damage = self.g.rng.binomial(damage, 50)
 		return max(damage, 0)
 		
 	def melee_attack(self, target=None, attack=None, force=False):
@@ -247,19 +288,19 @@ class Monster(Entity):
 			attacks = list(filter(lambda a: isinstance(a, list) or a.can_use(self, self.g.player), self.attacks))
 			if not attacks:
 				return
-			attack = random.choice(attacks)
+			attack = self.g.rng.choice(attacks)
 			if isinstance(attack, list):
 				c = list(filter(lambda a: a.can_use(self, self.g.player), attack))
-				attack = random.choice(c)
+				attack = self.g.rng.choice(c)
 		player = self.g.player
 		if target is None:
 			target = player
-		roll = dice(1, 20)
+		roll = self.g.rng.dice(1, 20)
 		disadv = 0
 		disadv += target.has_effect("Invisible")
 		disadv += self.has_effect("Frightened") and self.sees_player()
 		for _ in range(disadv):
-			roll = min(roll, dice(1, 20))
+			roll = min(roll, self.g.rng.dice(1, 20))
 		if target is player:
 			ac_mod = player.get_ac_bonus()
 			AC = 10 + ac_mod
@@ -283,7 +324,7 @@ class Monster(Entity):
 			else:
 				self.g.print_msg(f"You evade the {self.name}'s attack.")
 		else:
-			base = dice(*attack.dmg)
+			base = self.g.rng.dice(*attack.dmg)
 			if target is player:
 				base += attack.dmg_bonus(self, target)
 			damage = self.modify_damage(target, base)
@@ -307,12 +348,12 @@ class Monster(Entity):
 				attacks = list(filter(lambda a: a.can_use(self, self.g.player), att))
 				if not attacks:
 					continue
-				att = random.choice(attacks)
+				att = self.g.rng.choice(attacks)
 			if att.can_use(self, player):
 				self.melee_attack(player, att)
 				
 	def saving_throw(self, stat, DC):
-		return dice(1, 20) + calc_mod(stat) >= DC
+		return self.g.rng.dice(1, 20) + self.g.rng.calc_mod(stat) >= DC
 		
 	def do_ranged_attack(self, target=None):
 		if not self.ranged:
@@ -323,14 +364,10 @@ class Monster(Entity):
 			target = player
 		the_target = "you" if target is player else f"the {target.name}"
 		self.g.print_msg(f"The {self.name} makes a ranged attack at {the_target}.")
-		for point in board.line_between((self.x, self.y), (target.x, target.y), skipfirst=True, skiplast=True):
-			self.g.set_projectile_pos(*point)
-			self.g.draw_board()
-			time.sleep(0.06)
-		self.g.clear_projectile()
-		roll = dice(1, 20)
+		self.g.animations.add_projectile(board.line_between((self.x, self.y), (target.x, target.y), skipfirst=True, skiplast=True))
+		roll = self.g.rng.dice(1, 20)
 		if (target is player and player.has_effect("Invisible")) or self.has_effect("Frightened"): #The player is harder to hit when invisible
-			roll = min(roll, dice(1, 20))
+			roll = min(roll, self.g.rng.dice(1, 20))
 		bonus = self.to_hit
 		if target is player:
 			dodge_mod = player.get_ac_bonus()
@@ -350,7 +387,7 @@ class Monster(Entity):
 			else:
 				self.g.print_msg(f"The projectile misses {the_target}.")
 		else:
-			damage = self.modify_damage(target, dice(*self.ranged_dam))
+			damage = self.modify_damage(target, self.g.rng.dice(*self.ranged_dam))
 			if damage:
 				the_target_is = "You are" if target is player else "The {target.name} is"
 				self.g.print_msg(f"{the_target_is} hit for {damage} damage!", "red" if target is player else "white")
@@ -371,26 +408,26 @@ class Monster(Entity):
 		xdist = player.x - self.x
 		ydist = player.y - self.y
 		dist = abs(xdist) + abs(ydist)
-		if dist <= 1 and one_in(4): #If we are right next to the player, we are more likely to notice
+		if dist <= 1 and self.g.rng.one_in(4): #If we are right next to the player, we are more likely to notice
 			return True
-		if not one_in(6): #Only make the check every 6 turns on average
+		if not self.g.rng.one_in(6): #Only make the check every 6 turns on average
 			return False
 		pen = max(dist - 2, 0) #Distance penalty; it's harder to guess the position of an invisible player who's far away
 		if not player.last_moved:
 			pen += 5 #If the player doesn't move, it's harder to know where they are
-		return dice(1, 20) + div_rand(self.WIS - 10, 2) - pen >= dice(1, 20) + div_rand(player.DEX - 10, 2)
+		return self.g.rng.dice(1, 20) + self.g.rng.div_rand(self.WIS - 10, 2) - pen >= self.g.rng.dice(1, 20) + self.g.rng.div_rand(player.DEX - 10, 2)
 		
 	def guess_rand_invis(self):
 		board = self.g.board
 		tries = 100
 		while tries > 0:
-			dx = random.randint(-2, 2)
-			dy = random.randint(-2, 2)
+			dx = self.g.rng.randint(-2, 2)
+			dy = self.g.rng.randint(-2, 2)
 			if (dx, dy) == (0, 0):
 				continue
 			xp = self.x + dx
 			yp = self.y + dy
-			if (xp < 0 or xp >= board.cols) or (yp < 0 or yp >= board.cols):
+			if (xp < 0 or xp >= board.cols) or (yp < 0 or yp >= board.rows):
 				continue
 			if board.blocks_sight(xp, yp) or not board.line_of_sight((self.x, self.y), (xp, yp)):
 				tries -= 1
@@ -399,27 +436,29 @@ class Monster(Entity):
 				break
 				
 	def reset_track_timer(self):
-		self.track_timer = random.randint(25, 65)
+		self.sync()
+		self.track_timer = self.g.rng.randint(25, 65)
 	
 	def check_split(self, chance):
-		if self.HP < random.randint(10, 20):
+		if self.HP < self.g.rng.randint(10, 20):
 			return False #No splitting if we don't have enough HP
 		if "jelly" not in self.name.lower():
 			return False
-		denom = random.randint(self.HP, self.MAX_HP)
-		return x_in_y(chance, denom)
+		denom = self.g.rng.randint(self.HP, self.MAX_HP)
+		return self.g.rng.x_in_y(chance, denom)
 		
 	def maybe_split(self, dam, mult):
 		if dam <= 0:
 			return False
 		if not self.check_split(dam*mult):
 			return
-		self.HP += binomial(dam, 50)
+		self.HP += self.g.rng.binomial(dam, 50)
 		if self.HP > self.MAX_HP:
 			self.HP = self.MAX_HP
+		self.rehash()
 		x, y = self.x, self.y
 		neighbors = [(x+1, y), (x-1, y), (x, y+1), (x, y-1), (x+1, y+1), (x+1, y-1), (x-1, y+1), (x-1, y-1)]
-		random.shuffle(neighbors)
+		self.g.rng.shuffle(neighbors)
 		nx, ny = 0, 0
 		g = self.g
 		board = self.g.board
@@ -430,8 +469,8 @@ class Monster(Entity):
 		else:
 			return 
 		cx, cy = self.x, self.y
-		HP = random.randint(self.HP, self.MAX_HP)
-		hp1 = div_rand(HP, 2)
+		HP = self.g.rng.randint(self.HP, self.MAX_HP)
+		hp1 = self.g.rng.div_rand(HP, 2)
 		hp2 = HP - hp1
 		m1 = self.__class__(g)
 		m2 = self.__class__(g)
@@ -441,8 +480,8 @@ class Monster(Entity):
 		self.despawn()
 		m1.place_at(x, y)
 		m2.place_at(nx, ny)
-		g.monsters.append(m1)
-		g.monsters.append(m2)
+		g.track_monster(m1)
+		g.track_monster(m2)
 			
 	def on_alerted(self, target=None):
 		player = self.g.player
@@ -460,8 +499,8 @@ class Monster(Entity):
 		self.target = None
 		
 	def apply_armor(self, dam, armor_div=1):
-		prot = random.randint(0, 2*self.armor)
-		prot = div_rand(prot, armor_div)
+		prot = self.g.rng.randint(0, 2*self.armor)
+		prot = self.g.rng.div_rand(prot, armor_div)
 		return max(0, dam - prot)
 		
 	def has_line_of_fire(self):
@@ -480,10 +519,10 @@ class Monster(Entity):
 		
 	def try_use_spell(self, target):
 		candidates = self.spells[:]
-		random.shuffle(candidates)
+		self.g.rng.shuffle(candidates)
 		for spell in candidates:
 			if self.maybe_use_spell(spell, target):
-				self.energy -= mult_rand_frac(self.get_speed(), max(0, spell.time_cost), 100)
+				self.energy -= self.g.rng.mult_rand_frac(self.get_speed(), max(0, spell.time_cost), 100)
 				return True
 		return False
 		
@@ -501,21 +540,22 @@ class Monster(Entity):
 			self.is_aware = True
 		mon_typ = self.__class__.__name__
 		if mon_typ == "Troll" and self.HP < self.MAX_HP:
-			regen = 2 + one_in(3)
+			regen = 2 + self.g.rng.one_in(3)
 			self.HP = min(self.MAX_HP, self.HP + regen)
-			if x_in_y(3, 5) and one_in(self.distance(player)):
+			self.rehash()
+			if self.g.rng.x_in_y(3, 5) and self.g.rng.one_in(self.distance(player)):
 				self.g.print_msg_if_sees((self.x, self.y), f"The {self.name} slowly regenerates.")
 		board = self.g.board
 		
 		target = self.target
-		confused = self.has_effect("Confused") and not one_in(4)
+		confused = self.has_effect("Confused") and not self.g.rng.one_in(4)
 		guessplayer = False
 		if self.is_aware and player.has_effect("Invisible"):
 			guessplayer = self.can_guess_invis() #Even if the player is invisible, the monster may still be able to guess their position
 		if confused:
 			dirs = [(-1, 0), (1, 0), (0, 1), (0, -1)]
-			if not self.move(*random.choice(dirs)): #Only try twice
-				if not self.move(*(d := random.choice(dirs))):
+			if not self.move(*self.g.rng.choice(dirs)): #Only try twice
+				if not self.move(*(d := self.g.rng.choice(dirs))):
 					x, y = self.x + d[0], self.y + d[1]
 					obstacle = ""
 					if board.blocks_sight(x, y):
@@ -524,14 +564,14 @@ class Monster(Entity):
 						obstacle = m.name
 					if obstacle:
 						self.g.print_msg_if_sees((self.x, self.y), f"The {self.name} bumps into the {obstacle}.")
-					self.energy -= div_rand(self.get_speed(), 2) #We bumped into something while confused
+					self.energy -= self.g.rng.div_rand(self.get_speed(), 2) #We bumped into something while confused
 			self.energy = min(self.energy, 0)
 		elif not self.is_friendly() and self.has_effect("Frightened"):
 			if self.sees_player():
 				dirs = [(-1, 0), (1, 0), (0, 1), (0, -1)]
-				random.shuffle(dirs)
+				self.g.rng.shuffle(dirs)
 				dist = self.distance(player)
-				if dist <= 1 and one_in(4): #If we are already next to the player when frightened, there's a small chance we try to attack before running away
+				if dist <= 1 and self.g.rng.one_in(4): #If we are already next to the player when frightened, there's a small chance we try to attack before running away
 					self.energy -= self.get_speed()
 					self.do_melee_attack()
 				else:
@@ -542,35 +582,31 @@ class Monster(Entity):
 							self.move(dx, dy)
 							break
 					else:
-						if x_in_y(2, 5): #If we are frightened and nowhere to run, try attacking
+						if self.g.rng.x_in_y(2, 5): #If we are frightened and nowhere to run, try attacking
 							if dist <= 1:
 								self.energy -= self.get_speed()
 								self.do_melee_attack()
 							elif self.ranged and target is player and self.should_use_ranged():
 								self.do_ranged_attack()
-			elif one_in(2) and dice(1, 20) + calc_mod(self.WIS) >= 15:
+			elif self.g.rng.one_in(2) and self.g.rng.dice(1, 20) + self.g.rng.calc_mod(self.WIS) >= 15:
 				self.lose_effect("Frightened")
 		elif self.is_friendly():
 			can_see = (self.x, self.y) in player.fov
-			if can_see and (mons := list(player.monsters_in_fov())):
-				dist = 999
-				closest = None
-				for m in mons:
-					if not board.is_clear_path((self.x, self.y), (m.x, m.y)):
-						if not board.is_clear_path((m.x, m.y), (self.x, self.y)):
-							continue
-					if (d := self.distance(m)) < dist:
-						dist = d
-						closest = m
-				if dist <= 1:
-					self.melee_attack(m)
+			def can_target(m):
+				if m.is_friendly() or (m.x, m.y) not in player.fov:
+					return False
+				pos = (self.x, self.y)
+				return board.is_clear_path(pos, (m.x, m.y)) or board.is_clear_path((m.x, m.y), pos)
+			if can_see and (closest := board.nearest_monster(self.x, self.y, can_target)):
+				if self.distance(closest) <= 1:
+					self.melee_attack(closest)
 				else:
-					self.path_towards(m.x, m.y)	
+					self.path_towards(closest.x, closest.y)
 			if self.distance(player) > 4 or not can_see:
 				self.path_towards(player.x, player.y)
-			elif one_in(6):
+			elif self.g.rng.one_in(6):
 				dirs = [(-1, 0), (1, 0), (0, 1), (0, -1)]
-				random.shuffle(dirs)
+				self.g.rng.shuffle(dirs)
 				for d in dirs:
 					if self.move(*d):
 						self.dir = d
@@ -582,7 +618,7 @@ class Monster(Entity):
 			self.reset_track_timer()
 			if self.distance(target) <= 1:
 				used_spell = False
-				if self.spells and one_in(6) and target is player:
+				if self.spells and self.g.rng.one_in(6) and target is player:
 					used_spell = self.try_use_spell(target)
 				if not used_spell or self.energy > 0: #If we still have enough energy points to do so, make a melee attack
 					self.energy -= self.get_speed()
@@ -596,16 +632,16 @@ class Monster(Entity):
 				aydist = abs(ydist)
 				old = self.energy
 				used_spell = False
-				if self.spells and one_in(5) and target is player:
+				if self.spells and self.g.rng.one_in(5) and target is player:
 					used_spell = self.try_use_spell(target)
 				if not used_spell:
 					oldx, oldy = self.x, self.y
 					self.path_towards(target.x, target.y)
 					moved = (self.x, self.y) != (oldx, oldy)
-					if not moved and self.distance(target) <= 4 and one_in(5):
+					if not moved and self.distance(target) <= 4 and self.g.rng.one_in(5):
 						could_route_around = self.g.monster_at(self.x+dx, self.y) or self.g.monster_at(self.x, self.y+dy)
 						if could_route_around:
-							self.path_towards(*self.last_seen, maxlen=self.distance(target)+3)
+							self.path_towards(*self.last_seen, maxlen=self.distance(target)+3, shared=True)
 		else:
 			if self.target is not player: #We lost sight of a target; go back to targeting the player
 				self.target = player
@@ -615,25 +651,25 @@ class Monster(Entity):
 			if self.target is player and self.last_seen:
 				if self.track_timer > 0:
 					if player.has_effect("Invisible"):
-						check = dice(1, 20) + calc_mod(player.DEX) < 10 + calc_mod(self.WIS)
+						check = self.g.rng.dice(1, 20) + self.g.rng.calc_mod(player.DEX) < 10 + self.g.rng.calc_mod(self.WIS)
 					else:
 						check = True
-					self.path_towards(*self.last_seen)
+					self.path_towards(*self.last_seen, shared=True)
 					if (self.x, self.y) == self.last_seen and check:
 						sees_you = self.sees_player()
 						#If we reach the target position and still don't see the player, roll a stealth check to continue tracking the player
-						if sees_you or dice(1, 20) + calc_mod(player.DEX) + player.passives["stealth"] < 14 + calc_mod(self.WIS):
+						if sees_you or self.g.rng.dice(1, 20) + self.g.rng.calc_mod(player.DEX) + player.passives["stealth"] < 14 + self.g.rng.calc_mod(self.WIS):
 							self.last_seen = (player.x, player.y)
 						else:
 							self.stop_tracking()
 				else:
 					self.stop_tracking()
-			elif not one_in(5):
-				choose_new = self.dir is None or (one_in(3) or not self.move(*self.dir))
+			elif not self.g.rng.one_in(5):
+				choose_new = self.dir is None or (self.g.rng.one_in(3) or not self.move(*self.dir))
 				if choose_new:
 					if self.dir is None:
 						dirs = [(-1, 0), (1, 0), (0, 1), (0, -1)]
-						random.shuffle(dirs)
+						self.g.rng.shuffle(dirs)
 						for d in dirs:
 							if self.move(*d):
 								self.dir = d
@@ -643,7 +679,7 @@ class Monster(Entity):
 							dirs = [(0, 1), (0, -1)]
 						else:
 							dirs = [(-1, 0), (1, 0)]
-						random.shuffle(dirs)
+						self.g.rng.shuffle(dirs)
 						for d in dirs:
 							if self.move(*d):
 								self.dir = d
@@ -684,11 +720,7 @@ class Monster(Entity):
 					return False
 			if spell.msg:
 				g.print_msg(spell.msg.format(self.name))
-			for x, y in line:
-				 g.set_projectile_pos(x, y)
-				 g.draw_board()
-				 time.sleep(0.03)
-			g.clear_projectile()
+			g.animations.add_projectile(line)
 			spell.on_hit_effect(self, target)
 		elif spell.efftype == "cone":
 			x, y = self.x, self.y
@@ -703,20 +735,16 @@ class Monster(Entity):
 			for cx, cy in area:
 				if g.monster_at(cx, cy):
 					num += 1
-			if num > 0 and x_in_y(num, num+2):
+			if num > 0 and self.g.rng.x_in_y(num, num+2):
 				return False
 			if spell.msg:
 				g.print_msg(spell.msg.format(self.name))
 			for cx, cy in area:
-				g.blast.add((cx, cy))
 				if (m := g.get_monster(cx, cy)):
 					spell.on_hit_effect(m)
 				elif (player.x, player.y) == (cx, cy):
 					spell.on_hit_effect(self, player)
-			g.draw_board()
-			time.sleep(0.2)
-			g.blast.clear()
-			g.draw_board()
+			g.animations.add_blast(area, 0.2)
 			return True
 			
 class SpellAttack:
@@ -790,7 +818,7 @@ class ClawGrapple(Attack):
 		super().__init__(dmg, to_hit, "The {0} claws {1}")
 		
 	def on_hit(self, player, mon, dmg):
-		if not one_in(3) and player.add_grapple(mon):
+		if not mon.g.rng.one_in(3) and player.add_grapple(mon):
 			player.g.print_msg(f"The {mon.name} grapples you with its claw!", "red")
 
 class GiantRat(Monster):
@@ -836,9 +864,9 @@ class PoisonBite(Attack):
 	
 	def on_hit(self, player, mon, dmg):
 		g = player.g
-		poison = dice(4, 6) + dice(1, 3)
+		poison = mon.g.rng.dice(4, 6) + mon.g.rng.dice(1, 3)
 		if dmg < poison:
-			poison = random.randint(dmg, poison)
+			poison = mon.g.rng.randint(dmg, poison)
 		player.do_poison(poison)			
 
 class GiantPoisonousSnake(Monster):
@@ -896,7 +924,7 @@ class SnakeConstrict(Attack):
 
 	def dmg_bonus(self, mon, player):
 		if mon in player.grappled_by:
-			return dice(1, 8)
+			return mon.g.rng.dice(1, 8)
 		return 0
 				
 	def on_hit(self, player, mon, dmg):
@@ -908,7 +936,7 @@ class SnakeBite(Attack):
 		super().__init__((2, 6), 4, "The {0} bites {1}")
 
 	def can_use(self, mon, player):
-		return mon not in player.grappled_by or one_in(3) #If constricting, prefer to use that instead
+		return mon not in player.grappled_by or mon.g.rng.one_in(3) #If constricting, prefer to use that instead
 		
 class ConstrictorSnake(Monster):
 	diff = 3
@@ -981,7 +1009,7 @@ class ShadowStrDrain(Attack):
 		
 	def on_hit(self, player, mon, dmg):
 		g = player.g
-		if not one_in(3) and player.STR > dice(1, 9):
+		if not mon.g.rng.one_in(3) and player.STR > mon.g.rng.dice(1, 9):
 			player.str_drain += 1
 			g.print_msg("You feel weaker.", "red")
 
@@ -1044,7 +1072,7 @@ class SpecterDrain(Attack):
 		super().__init__((4, 6), 4)
 		
 	def on_hit(self, player, mon, dmg):
-		player.drain(random.randint(1, dmg))
+		player.drain(mon.g.rng.randint(1, dmg))
 
 class Specter(Monster):
 	diff = 5
@@ -1088,7 +1116,7 @@ class JellyAcidAttack(Attack):
 	def on_hit(self, player, mon, dmg):
 		g = player.g
 		g.print_msg("The acid burns!", "red")
-		player.take_damage(player.apply_resist(dice(1, 12)))
+		player.take_damage(player.apply_resist(mon.g.rng.dice(1, 12)))
 
 class OchreJelly(Monster):
 	diff = 6
@@ -1150,14 +1178,14 @@ class NothicRotGaze(SpellAttack):
 		super().__init__(None, 6, "The {0} gazes at you!", time_cost=40)
 	
 	def should_use(self, mon, target):
-		return one_in(2)
+		return mon.g.rng.one_in(2)
 	
 	def on_hit_effect(self, mon, target):
 		if isinstance(target, Monster):
 			return
 		g = target.g
 		g.print_msg("You feel your flesh rotting.", "red")
-		dam = target.apply_resist(dice(4, 6))
+		dam = target.apply_resist(mon.g.rng.dice(4, 6))
 		target.take_damage(dam)
 		target.drain(dam, silent=True) 
 
@@ -1260,9 +1288,9 @@ class ScorpionSting(Attack):
 	
 	def on_hit(self, player, mon, dmg):
 		g = player.g
-		poison = dice(4, 10)
+		poison = mon.g.rng.dice(4, 10)
 		if dmg < poison:
-			poison = random.randint(dmg, poison)
+			poison = mon.g.rng.randint(dmg, poison)
 		player.do_poison(poison)			
 		
 class GiantScorpion(Monster):
@@ -1292,7 +1320,7 @@ class AdhesiveSlimeAttack(Attack):
 	
 	def on_hit(self, player, mon, dmg):
 		g = player.g
-		if not one_in(7) and player.add_grapple(mon):
+		if not mon.g.rng.one_in(7) and player.add_grapple(mon):
 			g.print_msg(f"The {mon.name}'s pseudopod adheres to you, holding you in place!", "red")
 
 class GiantGreenSlime(Monster):
@@ -1357,7 +1385,7 @@ class FireElementalAttack(Attack):
 
 	def on_hit(self, player, mon, dmg):
 		g = player.g
-		if player.fire <= 0 or one_in(3):
+		if player.fire <= 0 or mon.g.rng.one_in(3):
 			player.fire += 1
 			g.print_msg("You're set on fire!", "red")
 		
@@ -1391,7 +1419,7 @@ class ElementalEngulf(SpellAttack):
 		if target.engulfed_by:
 			return
 		g = target.g
-		if not one_in(15) and dice(1,20) + calc_mod(target.STR) >= 15: # changed undefined roll to dice(1,20)
+		if not mon.g.rng.one_in(15) and mon.g.rng.dice(1,20) + mon.g.rng.calc_mod(target.STR) >= 15: # changed undefined roll to dice(1,20)
 			g.print_msg(f"The {mon.name} attempts to engulf you, but you resist!", "yellow")
 		elif target.add_grapple(mon):
 			g.print_msg(f"The {mon.name} engulfs you! You can't breathe!", "red")
@@ -1404,23 +1432,23 @@ class AirBlast(SpellAttack):
 		super().__init__(None, 1, "The {0} sends a huge blast of air at you!")
 	
 	def should_use(self, mon, target):
-		return one_in(2)
+		return mon.g.rng.one_in(2)
 				
 	def on_hit_effect(self, mon, target):
 		if isinstance(target, Monster):
 			return
 		g = target.g
-		saved = dice(1, 20) + calc_mod(target.STR) >= 13 and not one_in(target.STR+1)
+		saved = mon.g.rng.dice(1, 20) + mon.g.rng.calc_mod(target.STR) >= 13 and not mon.g.rng.one_in(target.STR+1)
 		num = 6
 		if saved:
 			num = 3
-		base = dice(num, 8)
+		base = mon.g.rng.dice(num, 8)
 		dam = target.apply_armor(base)
 		if dam > 0:
 			g.print_msg("You are hit by the blast!", "red")
 			target.take_damage(dam)
 			if not saved:
-				target.knockback_from(mon.x, mon.y, mult_rand_frac(4, dam, base))
+				target.knockback_from(mon.x, mon.y, mon.g.rng.mult_rand_frac(4, dam, base))
 		else:
 			g.print_msg("You are hit by the blast but take no damage.")
 		
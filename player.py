@@ -1,10 +1,10 @@
-import random, time, math
+import math
 from collections import defaultdict
 from utils import *
 
 from entity import Entity
 from items import *
-from os import get_terminal_size
+from zobrist import inventory_key, MASK
 
 class Player(Entity):
 	
@@ -14,10 +14,13 @@ class Player(Entity):
 		self.level = 1
 		self.HP = self.MAX_HP
 		self.dead = False
+		self.death_cause = None #The name of what killed the player
 		self.ticks = 0
 		self.resting = False
-		self.weapon = UNARMED
+		self.unarmed = NullWeapon() #Each player has their own, so games don't share any item objects
+		self.weapon = self.unarmed
 		self.inventory = []
+		self.inventory_hash = 0 #The inventory's part of the state hash
 		self.energy = 30
 		self.speed = 30
 		
@@ -81,7 +84,7 @@ class Player(Entity):
 			self.grappled_by.remove(mon)
 		
 	def get_ac_bonus(self, avg=False):
-		s = calc_mod(self.DEX, avg)
+		s = self.g.rng.calc_mod(self.DEX, avg)
 		if self.armor:
 			armor = self.armor
 			if armor.dex_mod_softcap is not None:
@@ -91,7 +94,7 @@ class Player(Entity):
 					if avg:
 						s = softcap + diff / 4
 					else:
-						s = softcap + div_rand(diff, 4)
+						s = softcap + self.g.rng.div_rand(diff, 4)
 		if self.has_effect("Haste"):
 			s += 2
 		s += self.passives["dodge"]
@@ -122,7 +125,7 @@ class Player(Entity):
 			avg = (self.base_str+self.base_dex)//2
 			past_softcap = avg >= 20
 			if self.level % (4+2*past_softcap) == 0:
-				if one_in(2):
+				if self.g.rng.one_in(2):
 					self.base_str += 1
 				else:
 					self.base_dex += 1
@@ -175,6 +178,7 @@ class Player(Entity):
 		if self.get_max_hp() <= 0:
 			self.g.print_msg("You have died!", "red")
 			self.dead = True	
+			self.death_cause = "drain"
 	
 	def do_poison(self, amount):
 		if amount <= 0:
@@ -204,6 +208,8 @@ class Player(Entity):
 			self.HP = 0
 			self.g.print_msg("You have died!", "red")
 			self.dead = True
+			m = self.g.scheduler.current #Damage taken during a monster's turn is from that monster
+			self.death_cause = m.name if m is not None else ("poison" if poison else "other")
 		elif self.HP <= self.get_max_hp() // 4:
 			self.g.print_msg("*** WARNING: Your HP is low! ***", "red")
 	
@@ -211,11 +217,29 @@ class Player(Entity):
 		if isinstance(item, Wand):
 			w = next((t for t in self.inventory if isinstance(t, Wand) and type(t) == type(item)), None)
 			if w is not None:
+				old = inventory_key(w)
 				w.charges += item.charges
+				self.item_changed(w, old)
 			else:
-				self.inventory.append(item)
+				self.append_item(item)
 		else:
-			self.inventory.append(item)
+			self.append_item(item)
+			
+	def append_item(self, item):
+		self.inventory.append(item)
+		self.inventory_hash = (self.inventory_hash + inventory_key(item)) & MASK
+		
+	def remove_item(self, item):
+		self.inventory.remove(item)
+		self.inventory_hash = (self.inventory_hash - inventory_key(item)) & MASK
+		
+	def item_changed(self, item, old):
+		"Updates the state hash for an inventory item whose enchantment or charges changed. old is its inventory_key() from before"
+		self.inventory_hash = (self.inventory_hash - old + inventory_key(item)) & MASK
+		
+	def rehash_inventory(self):
+		"Recalculates the inventory's part of the state hash from scratch"
+		self.inventory_hash = sum(map(inventory_key, self.inventory)) & MASK
 			
 	def rand_place(self):
 		self.x = 0
@@ -227,16 +251,16 @@ class Player(Entity):
 		board = self.g.board
 		oldloc = (self.x, self.y)
 		for _ in range(500):
-			x = random.randint(1, board.cols - 2)
-			y = random.randint(1, board.rows - 2)
+			x = self.g.rng.randint(1, board.cols - 2)
+			y = self.g.rng.randint(1, board.rows - 2)
 			if board.is_passable(x, y) and (x, y) != oldloc:
 				seeslastpos = board.line_of_sight((x, y), oldloc)
 				if not seeslastpos: #We teleported out of sight
 					for m in self.monsters_in_fov():
-						m.track_timer = min(m.track_timer, dice(1, 7)) #Allow them to still close in on where they last saw you, and not immediately realize you're gone
+						m.sync()
+						m.track_timer = min(m.track_timer, self.g.rng.dice(1, 7)) #Allow them to still close in on where they last saw you, and not immediately realize you're gone
 				self.g.print_msg("You teleport!")
-				self.x = x
-				self.y = y
+				self.place_at(x, y)
 				self.fov = self.calc_fov()
 				self.grappled_by.clear()
 				break
@@ -247,16 +271,17 @@ class Player(Entity):
 		if self.grappled_by:
 			stat = max(self.DEX, self.STR) #Let's use the higher of the two
 			for m in self.grappled_by[:]:
-				mod = calc_mod(stat)
+				mod = self.g.rng.calc_mod(stat)
 				if m.has_effect("Confused"):
 					mod += 4 #Give a bonus escaping a confused monster's grab
-				if dice(1, 20) + mod >= m.grapple_dc:
-					if self.STR > self.DEX or (self.STR == self.DEX and one_in(2)):
+				if self.g.rng.dice(1, 20) + mod >= m.grapple_dc:
+					if self.STR > self.DEX or (self.STR == self.DEX and self.g.rng.one_in(2)):
 						break_method = "force yourself"
 					else:
 						break_method = "wriggle"
 					self.g.print_msg(f"You {break_method} out of the {m.name}'s grapple.")
 					self.remove_grapple(m)
+					m.sync()
 					m.energy -= m.get_speed() #So they can't immediately re-grapple the player
 				else:
 					self.g.print_msg(f"You fail to escape the {m.name}'s grapple.", "yellow")	
@@ -269,11 +294,11 @@ class Player(Entity):
 			self.energy = 0
 			return False
 		board = self.g.board
-		if self.has_effect("Confused") and not one_in(4):
+		if self.has_effect("Confused") and not self.g.rng.one_in(4):
 			odx, ody = dx, dy
 			dirs = [(-1, 0), (1, 0), (0, 1), (0, -1)]
 			for _ in range(2):
-				dx, dy = random.choice(dirs)
+				dx, dy = self.g.rng.choice(dirs)
 				if board.is_passable(self.x+dx, self.y+dy):
 					break
 			if not board.is_passable(self.x+dx, self.y+dy):
@@ -287,7 +312,7 @@ class Player(Entity):
 					self.g.print_msg(f"You bump into the {obstacle}.")
 					self.energy -= self.get_speed()#We bumped into something while confused
 					return
-			if one_in(3) and (odx, ody) != (dx, dy):
+			if self.g.rng.one_in(3) and (odx, ody) != (dx, dy):
 				self.g.print_msg("You stumble around.")
 		adj = []
 		if (m := self.g.get_monster(self.x-1, self.y)):
@@ -305,6 +330,7 @@ class Player(Entity):
 					return
 				self.energy -= 30
 				self.swap_with(m)
+				m.sync()
 				m.energy = min(m.energy - 30, 0)
 				self.g.print_msg(f"You swap places with the {m.name}.")
 			else:
@@ -339,8 +365,8 @@ class Player(Entity):
 				continue
 			mon_speed = m.get_speed()
 			fuzz = speed//3
-			is_faster = mon_speed > speed + random.randint(-fuzz, fuzz)
-			if m.is_aware and m.sees_player() and dist >= 2 and is_faster and one_in(3):
+			is_faster = mon_speed > speed + self.g.rng.randint(-fuzz, fuzz)
+			if m.is_aware and m.sees_player() and dist >= 2 and is_faster and self.g.rng.one_in(3):
 				self.g.print_msg(f"As you move away from {m.name}, it makes an opportunity attack!", "yellow")
 				m.melee_attack(target=self)
 		self.energy -= 30
@@ -351,17 +377,17 @@ class Player(Entity):
 		if name in types:
 			typ = types[name]
 			if name in self.effects:
-				self.effects[name].duration += div_rand(duration, 2)
+				self.effects[name].duration += self.g.rng.div_rand(duration, 2)
 			else:
 				self.effects[name] = (eff := typ(duration))
 				self.g.print_msg(eff.add_msg)
 				
 	def lose_effect(self, name, silent=False):
 		if name in self.effects:
-			eff = self.effects[effect]
-			if silent:
+			eff = self.effects[name]
+			if not silent:
 				self.g.print_msg(eff.rem_msg)
-			del self.effects[effect]
+			del self.effects[name]
 			eff.on_expire(self)
 	
 	def has_effect(self, name):
@@ -381,17 +407,15 @@ class Player(Entity):
 			return False
 		
 	def monsters_in_fov(self, include_friendly=False, clairvoyance=False):
-		if clairvoyance:
-			clairvoyance = self.has_effect("Clairvoyance")
-		for m in self.g.monsters:
-			if not include_friendly and m.is_friendly():
-				continue
-			mx, my = m.x, m.y
-			dx = self.x - mx 
-			dy = self.y - my
-			dist = math.sqrt(dx**2 + dy**2)
-			if (mx, my) in self.fov or (clairvoyance and round(dist) <= 8):
+		board = self.g.board
+		fov = self.fov
+		for m in board.monsters_in_fov(fov):
+			if include_friendly or not m.is_friendly():
 				yield m
+		if clairvoyance and self.has_effect("Clairvoyance"):
+			for m in board.monsters_in_radius(self.x, self.y, 8):
+				if (m.x, m.y) not in fov and (include_friendly or not m.is_friendly()):
+					yield m
 			
 	def adjust_duration(self, effect, amount):
 		if effect in self.effects:
@@ -434,20 +458,23 @@ class Player(Entity):
 		oldpos = (self.x, self.y)
 		dist = 0
 		self.grappled_by.clear()
+		path = []
 		for x, y in board.line_between(oldpos, newpos, skipfirst=True):
 			if not board.is_passable(x, y):
+				self.g.animations.add_blast(path, 0.1)
 				if dist > 0:
 					if (m := self.g.get_monster(x, y)) is not None:
-						dam = dice(1, dist*3)
+						dam = self.g.rng.dice(1, dist*3)
 						self.g.print_msg(f"You take {dam} damage by the impact!", "red")
 						self.take_damage(dam)
-						amount = max(1, binomial(dam, 50))
+						amount = max(1, self.g.rng.binomial(dam, 50))
 						self.g.print_msg(f"The {m.name} takes {dam} damage from your impact!")
 						m.take_damage(dam, source=self)
 						self.energy -= 15
+						m.sync()
 						m.energy -= 15
 					else:
-						dam = dice(2, dist*3)
+						dam = self.g.rng.dice(2, dist*3)
 						self.g.print_msg(f"You take {dam} damage by the impact!", "red")
 						self.take_damage(dam)
 						self.energy -= 30
@@ -457,8 +484,8 @@ class Player(Entity):
 				self.interrupt(force=True)
 			dist += 1
 			self.move_to(x, y)
-			self.g.draw_board()
-			time.sleep(0.01)
+			path.append((x, y))
+		self.g.animations.add_blast(path, 0.1)
 		
 		
 	def throw_item(self, item):
@@ -497,7 +524,7 @@ class Player(Entity):
 		if num_tiles > short:
 			scale = 8
 			g.print_msg(f"Ranged accuracy is reduced beyond {short} tiles.", "yellow")
-			pen += mult_rand_frac(num_tiles - short, scale, long - short) 
+			pen += self.g.rng.mult_rand_frac(num_tiles - short, scale, long - short) 
 			avg_pen += scale*(num_tiles-short)/(long-short)
 		if item.heavy:
 			pen += 2
@@ -526,12 +553,8 @@ class Player(Entity):
 		else:
 			line = list(g.board.line_between((target.x, target.y), (self.x, self.y)))
 			line.reverse()
-		for x, y in line:
-			g.set_projectile_pos(x, y)
-			g.draw_board()
-			time.sleep(0.03)
-		g.clear_projectile()
-		roll = dice(1, 20)
+		g.animations.add_projectile(line)
+		roll = self.g.rng.dice(1, 20)
 		crit = False
 		if roll == 1:
 			hits = False
@@ -540,20 +563,20 @@ class Player(Entity):
 		else:
 			hits = roll + mod >= AC
 		if hits:
-			if x_in_y(item.crit_chance, 20):
+			if self.g.rng.x_in_y(item.crit_chance, 20):
 				crit = True
 			dmg = item.dmg
-			damage = dmg.roll()
-			damage += calc_mod(self.attack_stat())
+			damage = dmg.roll(self.g.rng)
+			damage += self.g.rng.calc_mod(self.attack_stat())
 			damage += item.enchant
 			if not item.thrown:
-				damage = random.randint(1, damage)
+				damage = self.g.rng.randint(1, damage)
 			if crit:
 				bonus = 0
 				for _ in range(item.crit_mult - 1):
-					bonus += dmg.roll()
+					bonus += dmg.roll(self.g.rng)
 				if not item.thrown:
-					bonus = random.randint(1, bonus)
+					bonus = self.g.rng.randint(1, bonus)
 				damage += bonus
 			damage = target.apply_armor(damage, 1+crit) #Crits give 50% armor penetration
 			if damage <= 0:
@@ -568,17 +591,17 @@ class Player(Entity):
 				target.take_damage(damage, self)
 		else:
 			g.print_msg(f"The {item.name} misses the {target.name}.")
-		g.spawn_item(item.__class__(), (target.x, target.y))	
+		g.spawn_item(item, (target.x, target.y)) #The same item lands, keeping its enchantment and anything else about it
 		if item is self.weapon:
-			self.weapon = UNARMED
+			self.weapon = self.unarmed
 		
-		self.inventory.remove(item)
+		self.remove_item(item)
 		self.did_attack = True
 		for m in self.monsters_in_fov():
 			if m is target:
 				if not m.despawn_summon():
 					m.on_alerted()
-			elif one_in(3):
+			elif self.g.rng.one_in(3):
 				m.on_alerted()
 		cost = 30
 		if not item.thrown:
@@ -586,14 +609,14 @@ class Player(Entity):
 		self.energy -= cost
 		
 	def is_unarmed(self):
-		return self.weapon is UNARMED
+		return self.weapon is self.unarmed
 			
 	def detectability(self):
 		d = []
 		mons = list(filter(lambda m: not m.is_aware, self.monsters_in_fov()))
 		if not mons:
 			return None 
-		mod = self.stealth_mod() + calc_mod(self.DEX, avg=True)
+		mod = self.stealth_mod() + self.g.rng.calc_mod(self.DEX, avg=True)
 		total_stealth = 1
 		for m in mons:
 			perc = m.passive_perc - 5*m.has_effect("Asleep")
@@ -632,9 +655,9 @@ class Player(Entity):
 			if not self.has_effect("Rejuvenated"): #Rejuvenation allows poison to tick down without doing any damage
 				self.take_damage(dmg, True)
 				if dmg > 3:
-					if one_in(2):
+					if self.g.rng.one_in(2):
 						self.g.print_msg("You feel very sick.", "red")
-				elif one_in(3):
+				elif self.g.rng.one_in(3):
 					self.g.print_msg("You feel sick.", "red")
 		if self.engulfed_by:
 			if self.engulfed_by in self.grappled_by:
@@ -646,15 +669,15 @@ class Player(Entity):
 				if self.turns_engulfed > 1:
 					self.g.print_msg("You can't breathe, as you are engulfed by the water!", "red")
 					amount = 3 + (self.turns_engulfed - 1)**0.7
-					self.take_damage(div_rand(int(100*amount), 100))
+					self.take_damage(self.g.rng.div_rand(int(100*amount), 100))
 			else:
 				self.turns_engulfed = 0
 				self.engulfed_by = None
 		if self.fire > 0:
 			self.g.print_msg("The fire burns you!", "red")
-			dmg = dice(1, 10)+2
+			dmg = self.g.rng.dice(1, 10)+2
 			self.take_damage(dmg, force_interrupt=True) #Always interrupt activities for this
-			if self.ticks % 2 == 0 and dice(1, 20) + calc_mod(self.DEX) >= 10:
+			if self.ticks % 2 == 0 and self.g.rng.dice(1, 20) + self.g.rng.calc_mod(self.DEX) >= 10:
 				self.fire -= 1
 				if self.fire <= 0:
 					self.g.print_msg("You manage to fully extinguish the fire.", "green")
@@ -664,34 +687,34 @@ class Player(Entity):
 		if self.has_effect("Rejuvenated"):
 			if self.hp_drain > 0:
 				self.hp_drain -= 1
-			self.HP += random.randint(4, 8)
+			self.HP += self.g.rng.randint(4, 8)
 			self.HP = min(self.HP, self.get_max_hp())
 			if self.ticks % 6 == 0:
 				self.g.print_msg("You feel extremely rejuvenated.", "green")
 		elif self.ticks % 6 == 0:
-			if self.hp_drain > 0 and one_in(4):
+			if self.hp_drain > 0 and self.g.rng.one_in(4):
 				self.hp_drain -= 1
 				if self.hp_drain == 0:
 					self.g.print_msg("You have fully recovered from drain.", "green")
 		recover = 3 if self.has_effect("Rejuvenated") else 20
 		if self.ticks % recover == 0:
-			if self.str_drain > 0 and one_in(recover):
+			if self.str_drain > 0 and self.g.rng.one_in(recover):
 				self.str_drain -= 1
-			if self.dex_drain > 0 and one_in(recover):
+			if self.dex_drain > 0 and self.g.rng.one_in(recover):
 				self.dex_drain -= 1
 		for e in list(self.effects.keys()):
 			self.adjust_duration(e, -1)
 		mod = self.stealth_mod()
 		for m in self.g.monsters:
 			m.check_timer -= 1
-			if m.check_timer <= 0 or self.did_attack or one_in(25): #Very occasionally make the check before the timer reaches zero
+			if m.check_timer <= 0 or self.did_attack or self.g.rng.one_in(25): #Very occasionally make the check before the timer reaches zero
 				m.reset_check_timer()
 				if not m.is_aware or self.did_attack: #If you attack while invisible, maybe alert the nearby monsters to your position
-					roll = dice(1, 20)
+					roll = self.g.rng.dice(1, 20)
 					perc = m.passive_perc
 					if m.has_effect("Asleep"):
 						perc -= 5
-					if (m.x, m.y) in self.fov and (one_in(30) or roll + div_rand(self.DEX - 10, 2) + mod < perc):
+					if (m.x, m.y) in self.fov and (self.g.rng.one_in(30) or roll + self.g.rng.div_rand(self.DEX - 10, 2) + mod < perc):
 						m.on_alerted()
 						m.lose_effect("Asleep")
 		self.did_attack = False
@@ -704,9 +727,9 @@ class Player(Entity):
 		
 	def attack_mod(self, throwing=False, avg=False):
 		stat = self.attack_stat()
-		mod = calc_mod(stat, avg=avg)
+		mod = self.g.rng.calc_mod(stat, avg=avg)
 		if not throwing:
-			if self.weapon is not UNARMED:
+			if not self.is_unarmed():
 				if self.weapon.heavy:
 					mod -= 2
 			else:
@@ -719,7 +742,7 @@ class Player(Entity):
 		
 	def apply_resist(self, dam):
 		if self.has_effect("Resistance"):
-			dam = binomial(dam, 50)
+			dam = self.g.rng.binomial(dam, 50)
 		return dam
 		
 	def get_protect(self):
@@ -728,8 +751,8 @@ class Player(Entity):
 		return protect
 		
 	def apply_armor(self, dam):
-		roll1 = random.randint(0, 4*self.get_protect())
-		roll2 = random.randint(0, 2*self.get_protect())
+		roll1 = self.g.rng.randint(0, 4*self.get_protect())
+		roll2 = self.g.rng.randint(0, 2*self.get_protect())
 		return max(0, dam - max(roll1, roll2)) 
 		
 	def attack(self, dx, dy):
@@ -742,21 +765,21 @@ class Player(Entity):
 		ench_type = self.weapon.ench_type
 		cost = min(self.get_speed(), 45)
 		if ench_type == "speed":
-			cost = div_rand(cost, 2)
+			cost = self.g.rng.div_rand(cost, 2)
 		self.energy -= cost
-		roll = dice(1, 20)
+		roll = self.g.rng.dice(1, 20)
 		adv = False
 		if not mon.is_aware or self.has_effect("Invisible"):
 			adv = True
 		finesse = self.weapon.finesse
-		unarmed = self.weapon is UNARMED
-		sneak_attack = adv and dice(1, 20) + calc_mod(self.DEX) + self.passives["stealth"] >= mon.passive_perc
+		unarmed = self.is_unarmed()
+		sneak_attack = adv and self.g.rng.dice(1, 20) + self.g.rng.calc_mod(self.DEX) + self.passives["stealth"] >= mon.passive_perc
 		chance = 3
 		if unarmed:
 			chance -= 1
 		elif finesse:
 			chance += 1
-		sneak_attack = sneak_attack and x_in_y(chance, 8)
+		sneak_attack = sneak_attack and self.g.rng.x_in_y(chance, 8)
 		if mon.has_effect("Asleep"):
 			sneak_attack = True
 		eff_ac = mon.get_ac()
@@ -764,7 +787,7 @@ class Player(Entity):
 			eff_ac = min(eff_ac, 5)
 			adv = True
 		if adv:
-			roll = max(roll, dice(1, 20))
+			roll = max(roll, self.g.rng.dice(1, 20))
 		crit = False
 		mod = self.attack_mod()
 		if roll == 1:
@@ -774,12 +797,13 @@ class Player(Entity):
 		else:
 			hits = roll + mod >= eff_ac
 		if sneak_attack:
-			if one_in(3):
+			if self.g.rng.one_in(3):
 				self.g.print_msg(f"The {mon.name} is caught off-guard by your sneak attack!")
 			else:
 				self.g.print_msg(f"You catch the {mon.name} completely unaware!")
 			hits = True
-			mon.energy -= random.randint(15, 30)
+			mon.sync()
+			mon.energy -= self.g.rng.randint(15, 30)
 		if mon.has_effect("Asleep"):
 			hits = True
 			mon.lose_effect("Asleep")
@@ -789,32 +813,32 @@ class Player(Entity):
 		if not hits:
 			self.g.print_msg(f"Your attack misses the {mon.name}.")
 		else:
-			if x_in_y(self.weapon.crit_chance, 20):
+			if self.g.rng.x_in_y(self.weapon.crit_chance, 20):
 				crit = True
 			stat = self.attack_stat()
 			dmgdice = self.base_damage_dice()
-			dam = dmgdice.roll()
+			dam = dmgdice.roll(self.g.rng)
 			mult = self.weapon.crit_mult
 			if crit:
 				for _ in range(mult - 1):
-					dam += dmgdice.roll()
+					dam += dmgdice.roll(self.g.rng)
 			if sneak_attack:
 				scale = 6
 				lev = self.level
 				if finesse:
-					lev = mult_rand_frac(lev, 4, 3)
-				val = random.randint(1, lev)
+					lev = self.g.rng.mult_rand_frac(lev, 4, 3)
+				val = self.g.rng.randint(1, lev)
 				scale_int = 1 + (val - 1) // scale
 				scale_mod = (val - 1) % scale
-				bonus = dice(scale_int, 6) + mult_rand_frac(dice(1, 6), scale_mod, scale)
+				bonus = self.g.rng.dice(scale_int, 6) + self.g.rng.mult_rand_frac(self.g.rng.dice(1, 6), scale_mod, scale)
 				if unarmed:
-					bonus = max(1, div_rand(bonus, 3))
+					bonus = max(1, self.g.rng.div_rand(bonus, 3))
 				softcap = dmgdice.avg()*mult
 				if bonus > softcap: #Adds a soft cap to sneak attack damage
 					diff = bonus - softcap
-					bonus = softcap + div_rand(diff, 3)
+					bonus = softcap + self.g.rng.div_rand(diff, 3)
 				dam += bonus
-			dam += div_rand(stat - 10, 2)
+			dam += self.g.rng.div_rand(stat - 10, 2)
 			dam += self.weapon.enchant
 			dam = max(dam, 1)
 			dam = mon.apply_armor(dam, 1+crit)
@@ -822,7 +846,7 @@ class Player(Entity):
 				dam2 = mon.apply_armor(dam, 1+crit)
 				if dam < dam2:
 					dam = dam2
-			min_dam = dice(1, 6) if sneak_attack else 0 #Sneak attacks are guaranteed to deal at least 1d6 damage
+			min_dam = self.g.rng.dice(1, 6) if sneak_attack else 0 #Sneak attacks are guaranteed to deal at least 1d6 damage
 			dam = max(dam, min_dam)
 			dmgtype = self.weapon.dmg_type
 			if dam > 0:
@@ -836,17 +860,17 @@ class Player(Entity):
 				self.g.print_msg(f"You hit the {mon.name} but do no damage.")
 			mon.take_damage(dam, self)
 			if dam > 0 and ench_type == "life stealing":
-				regain = min(self.MAX_HP - self.HP, div_rand(dam, 8))
+				regain = min(self.MAX_HP - self.HP, self.g.rng.div_rand(dam, 8))
 				self.HP += regain
 				if self.HP > self.MAX_HP:
 					self.HP = self.MAX_HP
 				if regain > 0:
 					self.g.print_msg(f"You regain {regain} HP.", "green")
-			self.adjust_duration("Invisible", -random.randint(0, 6))
+			self.adjust_duration("Invisible", -self.g.rng.randint(0, 6))
 			if not sneak_attack:
 				for m in self.monsters_in_fov():
 					d = m.distance(self, False)
-					if one_in(6) or one_in(d):
+					if self.g.rng.one_in(6) or self.g.rng.one_in(d):
 						m.on_alerted()
 			
 	def defeated_monster(self, mon):
@@ -864,11 +888,11 @@ class Player(Entity):
 		if mon.weapon:
 			if isinstance(mon.weapon, list):
 				for w in mon.weapon:
-					if one_in(4):
+					if self.g.rng.one_in(4):
 						weapon = w()
 						self.g.print_msg(f"The {mon.name} drops its {weapon.name}!", "green")
 						self.g.spawn_item(weapon, (mon.x, mon.y))
-			elif one_in(4):
+			elif self.g.rng.one_in(4):
 				weapon = mon.weapon()
 				self.g.print_msg(f"The {mon.name} drops its {weapon.name}!", "green")
 				self.g.spawn_item(weapon, (mon.x, mon.y))
@@ -878,8 +902,8 @@ class Player(Entity):
 			board = self.g.board
 			los_tries = 100
 			while True:
-				sx = random.randint(1, board.cols - 2)
-				sy = random.randint(1, board.rows - 2)
+				sx = self.g.rng.randint(1, board.cols - 2)
+				sy = self.g.rng.randint(1, board.rows - 2)
 				if not board.is_passable(sx, sy):
 					continue
 				if los_tries > 0 and board.line_of_sight((self.x, self.y), (sx, sy)):
@@ -894,10 +918,17 @@ class Player(Entity):
 				tile.stair = True
 				break
 	
+	def use_item(self, item):
+		result = item.use(self)
+		if result is not False: #False to not use time up a turn or the item
+			if result is not None: #None uses a turn without removing the item
+				self.remove_item(item)
+			self.energy -= self.get_speed()
+			
 	def inventory_menu(self):
 		from gameobj import GameTextMenu
 		menu = GameTextMenu(self.g)
-		max_lines = get_terminal_size().lines	
+		max_lines = self.g.renderer.get_size()[1]	
 		scroll = 0
 		items = self.inventory[:]
 		d = {}
@@ -931,7 +962,7 @@ class Player(Entity):
 			num_display = min(len(chars), max_lines - 4)
 			scroll_limit = max(0, len(strings) - num_display)
 			n = min(len(strings), num_display)
-			padsize = min(30, get_terminal_size().columns)
+			padsize = min(30, self.g.renderer.get_size()[0])
 			for i in range(n):
 				string = strings[i+scroll].ljust(padsize)
 				if i == 0 and scroll > 0:
@@ -994,11 +1025,7 @@ class Player(Entity):
 							break
 						elif chr(c) == "u":
 							menu.close()
-							result = item.use(self)
-							if result is not False: #False to not use time up a turn or the item
-								if result is not None: #None uses a turn without removing the item
-									self.inventory.remove(item)
-								self.energy -= self.get_speed()
+							self.use_item(item)
 							return
 						elif chr(c) == "t" and can_throw:
 							menu.close()
@@ -0,0 +1,85 @@
+#Lightweight timing of the phases of a turn
+#Code marks a phase with "with g.profiler.span(name):". Each phase's time is totaled over a turn, and the totals of
+#the last few turns are kept so that percentiles of the time per turn can be shown. Spans can be nested; a phase's
+#time includes the time of any phases inside it.
+#While the profiler is off, span() returns a shared object that does nothing, so leaving spans in costs almost nothing.
+
+import time, math
+from collections import deque
+
+class _NullSpan:
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, *exc):
+		return False
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+	__slots__ = ("totals", "name", "start")
+	
+	def __init__(self, totals, name):
+		self.totals = totals
+		self.name = name
+	
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+	
+	def __exit__(self, *exc):
+		elapsed = (time.perf_counter() - self.start) * 1000
+		totals = self.totals
+		totals[self.name] = totals.get(self.name, 0.0) + elapsed
+		return False
+
+class Profiler:
+	"""
+	window - How many of the most recent turns the percentiles are calculated over
+	"""
+	
+	def __init__(self, window=100):
+		self.enabled = False
+		self.window = window
+		self.totals = {} #Milliseconds spent in each phase so far this turn
+		self.history = {} #Maps each phase to its milliseconds per turn over the last few turns
+	
+	def span(self, name):
+		if not self.enabled:
+			return NULL_SPAN
+		return Span(self.totals, name)
+	
+	def toggle(self):
+		self.enabled = not self.enabled
+		self.totals.clear()
+		self.history.clear()
+	
+	def end_turn(self):
+		"Records this turn's totals and starts the next turn"
+		if not self.enabled:
+			return
+		totals = self.totals
+		history = self.history
+		for name in totals:
+			if name not in history:
+				history[name] = deque(maxlen=self.window)
+		for name, times in history.items():
+			times.append(totals.get(name, 0.0))
+		totals.clear()
+	
+	def percentile(self, name, pct):
+		"Returns the given percentile of the phase's milliseconds per turn, using the nearest rank"
+		times = sorted(self.history.get(name, ()))
+		if not times:
+			return 0.0
+		rank = max(math.ceil(pct / 100 * len(times)), 1)
+		return times[rank - 1]
+	
+	def report(self):
+		"Returns (name, median, 95th percentile, turns recorded) for each phase, slowest first"
+		rows = []
+		for name, times in self.history.items():
+			rows.append((name, self.percentile(name, 50), self.percentile(name, 95), len(times)))
+		rows.sort(key=lambda row: row[2], reverse=True)
+		return rows
@@ -0,0 +1,341 @@
+#Recording games to replay files, and playing them back
+#A replay file holds the game's seed followed by everything the player typed, so playing the input back into a game with the
+#same seed plays out exactly the same game. Runs of key polls that found nothing (while resting) are stored as a count.
+#The game's state hash is recorded too, at the first input after each save and at least every HASH_INTERVAL turns, and
+#playback checks that the replayed game matches it. Saves happen on a timer, so those checks fall wherever the player happened
+#to be; the turn interval makes sure a long game is still checked regularly.
+#Usage: python3 replay.py FILE [--headless] [--speed KEYS_PER_SECOND] [--stop-turn N] [--profile]
+import os, time, argparse, tempfile
+
+from gameobj import Game
+from display import NullRenderer, OutOfInput
+
+REPLAY_FILE = "game.replay"
+REPLAY_MAGIC = b"VDRP"
+REPLAY_VERSION = 2
+HASH_INTERVAL = 100 #Turns between recorded state hashes, on top of the one after each save
+
+#Event tags
+KEY = 0 #A key code
+IDLE = 1 #A number of polls that returned no key
+TEXT = 2 #A string typed at a prompt
+RESUME = 3 #The game was saved here, and loaded again in a new session
+HASH = 4 #The game's state hash when the next key was asked for
+
+class SessionResumed(Exception):
+	"Raised by ReplayInput when the recorded game was continued from its save in a new session"
+
+def encode_uint(n):
+	out = bytearray()
+	while n > 0x7f:
+		out.append((n & 0x7f) | 0x80)
+		n >>= 7
+	out.append(n)
+	return bytes(out)
+
+def decode_uint(data, pos):
+	"Returns the number starting at pos, and the position after it. Raises IndexError if it's cut off"
+	n = 0
+	shift = 0
+	while True:
+		b = data[pos]
+		pos += 1
+		n |= (b & 0x7f) << shift
+		if b < 0x80:
+			return n, pos
+		shift += 7
+
+def encode_header(seed):
+	return REPLAY_MAGIC + bytes([REPLAY_VERSION]) + encode_uint(seed)
+
+def decode_header(data):
+	"Returns the seed, and the position of the first event"
+	if not data.startswith(REPLAY_MAGIC):
+		raise ValueError("not a replay file")
+	version = data[len(REPLAY_MAGIC)]
+	if version > REPLAY_VERSION:
+		raise ValueError(f"the replay is from a newer version (format {version})")
+	return decode_uint(data, len(REPLAY_MAGIC) + 1)
+
+def load_replay(path):
+	"Returns the seed and the list of (tag, value) events in the replay file. An event cut off by a crash is ignored"
+	with open(path, "rb") as f:
+		data = f.read()
+	seed, pos = decode_header(data)
+	events = []
+	try:
+		while pos < len(data):
+			tag = data[pos]
+			pos += 1
+			if tag == RESUME:
+				events.append((RESUME, None))
+				continue
+			if tag == HASH:
+				if pos + 8 > len(data):
+					break
+				events.append((HASH, int.from_bytes(data[pos:pos+8], "little")))
+				pos += 8
+				continue
+			n, pos = decode_uint(data, pos)
+			if tag == TEXT:
+				if pos + n > len(data):
+					break
+				events.append((TEXT, data[pos:pos+n].decode("utf-8")))
+				pos += n
+			elif tag in (KEY, IDLE):
+				events.append((tag, n))
+			else:
+				raise ValueError(f"unknown replay event {tag}")
+	except IndexError:
+		pass
+	return seed, events
+
+class ReplayRecorder:
+	"""
+	Wraps the game's input source, passing everything through and recording what it returns to a replay file
+	Each event is written as soon as it happens, so a crash loses at most the polls since the last key.
+	"""
+
+	def __init__(self, g, source, f):
+		self.g = g
+		self.source = source
+		self.file = f
+		self.idle = 0 #Polls that returned no key, not written yet
+		self.check = False #Whether to record the state hash at the next key
+		self.next_check = g.player.ticks - g.player.ticks % HASH_INTERVAL + HASH_INTERVAL #The turn to record the state hash at
+
+	def write(self, data):
+		if self.idle:
+			data = bytes([IDLE]) + encode_uint(self.idle) + data
+			self.idle = 0
+		self.file.write(data)
+		self.file.flush()
+
+	def record_hash(self):
+		#The hash is taken when the game next asks for input, rather than in the middle of saving, since that's a point
+		#the replayed game is sure to reach in the same state
+		ticks = self.g.player.ticks
+		if self.check or ticks >= self.next_check:
+			self.check = False
+			self.next_check = ticks - ticks % HASH_INTERVAL + HASH_INTERVAL
+			self.write(bytes([HASH]) + self.g.state_hash().to_bytes(8, "little"))
+
+	def getch(self):
+		self.record_hash()
+		key = self.source.getch()
+		if key == -1:
+			self.idle += 1
+		else:
+			self.write(bytes([KEY]) + encode_uint(key))
+		return key
+
+	def getstr(self, prompt=None):
+		self.record_hash()
+		string = self.source.getstr(prompt)
+		data = string.encode("utf-8")
+		self.write(bytes([TEXT]) + encode_uint(len(data)) + data)
+		return string
+
+	def nodelay(self, flag):
+		self.source.nodelay(flag)
+
+	def flushinp(self):
+		self.source.flushinp()
+
+	def mark(self):
+		"Writes out everything recorded so far, and returns the length of the file, to be saved with the game"
+		self.write(b"")
+		self.check = True
+		return self.file.tell()
+
+	def close(self):
+		self.write(b"")
+		self.file.close()
+
+def start_recording(g, resumed, path=REPLAY_FILE):
+	"""
+	Starts recording the game's input. Call it once the game has been generated or loaded
+	A new game starts a new replay file. A loaded game continues its file from where the save was made, cutting off anything
+	recorded after that; if that isn't possible (the file is missing, or belongs to another game), the game isn't recorded.
+	Returns the recorder, or None if the game isn't being recorded.
+	"""
+	try:
+		if resumed:
+			length = g.replay_length
+			g.replay_length = None
+			if length is None:
+				return None
+			f = open(path, "r+b")
+			try:
+				data = f.read(length)
+				if len(data) < length or decode_header(data)[0] != g.seed:
+					f.close()
+					return None
+			except (ValueError, IndexError):
+				f.close()
+				return None
+			f.seek(length)
+			f.truncate()
+			f.write(bytes([RESUME]))
+		else:
+			f = open(path, "wb")
+			f.write(encode_header(g.seed))
+		f.flush()
+	except OSError:
+		return None
+	recorder = ReplayRecorder(g, g.input_source, f)
+	g.recorder = recorder
+	g.input_source = recorder
+	return recorder
+
+class ReplayInput:
+	"""
+	An input source that plays back the events of a replay file
+	renderer, speed - If both are given, waits 1/speed seconds before each key, so that the playback can be watched
+	Raises SessionResumed where the game was continued in a new session, and OutOfInput once the events run out.
+	Set g to the game being replayed to check its state against the hashes in the recording.
+	"""
+
+	def __init__(self, events, renderer=None, speed=None):
+		self.g = None
+		self.events = events
+		self.pos = 0
+		self.idle = 0 #Polls left in the current run of polls with no key
+		self.renderer = renderer
+		self.speed = speed
+		self.keys = 0 #Keys and strings played back so far
+		self._nodelay = False
+
+	def check_hashes(self):
+		"Checks the game against any state hashes recorded at this point"
+		events = self.events
+		while self.pos < len(events) and events[self.pos][0] == HASH:
+			if self.g is not None and self.g.state_hash() != events[self.pos][1]:
+				raise ValueError(f"the replay is out of sync: the game's state differs from the recording on turn {self.g.player.ticks}")
+			self.pos += 1
+
+	def next_event(self):
+		self.check_hashes()
+		if self.pos >= len(self.events):
+			raise OutOfInput("The replay has ended")
+		event = self.events[self.pos]
+		self.pos += 1
+		if event[0] == RESUME:
+			raise SessionResumed()
+		return event
+
+	def wait(self):
+		self.keys += 1
+		if self.renderer is not None and self.speed:
+			self.renderer.delay(1 / self.speed)
+
+	def getch(self):
+		if self.idle:
+			self.idle -= 1
+			return -1
+		self.check_hashes()
+		if self._nodelay and self.pos >= len(self.events):
+			return -1
+		tag, value = self.next_event()
+		if tag == IDLE:
+			self.idle = value - 1
+			return -1
+		if tag != KEY:
+			raise ValueError(f"the replay is out of sync: expected a key, but the recording has {value!r}")
+		self.wait()
+		return value
+
+	def getstr(self, prompt=None):
+		tag, value = self.next_event()
+		if tag != TEXT:
+			raise ValueError(f"the replay is out of sync: expected a string, but the recording has {value!r}")
+		self.wait()
+		return value
+
+	def nodelay(self, flag):
+		self._nodelay = flag
+
+	def flushinp(self):
+		pass
+
+def setup(g):
+	"What roguelike.py does once a game has been generated or loaded"
+	g.draw_board()
+	g.refresh_cache()
+	g.player.recalc_passives()
+
+def replay(path, renderer=None, speed=None, stop_turn=None, profile=False):
+	"""
+	Plays back the replay file at path, and returns the game as it was when the replay ended
+	renderer - The renderer to draw the game with. With None, the game runs headless as fast as possible
+	speed - Keys per second, when drawing the game
+	stop_turn - If given, stops once the player has taken this many turns
+	profile - Turns on the profiler from the start
+	"""
+	from roguelike import play #Imported here, since roguelike imports this module
+	seed, events = load_replay(path)
+	if renderer is None:
+		renderer = NullRenderer()
+		speed = None
+	inp = ReplayInput(events, renderer, speed)
+	g = Game(renderer, inp, seed)
+	inp.g = g
+	if profile:
+		g.profiler.toggle()
+	with tempfile.TemporaryDirectory() as folder:
+		#The replayed game saves as it goes, like the original did; this keeps it from overwriting the real save
+		g.journal.path = os.path.join(folder, "save.dat")
+		g.journal.journal_path = os.path.join(folder, "save.journal")
+		g.generate_level()
+		setup(g)
+		while True:
+			try:
+				if not play(g, stop_turn):
+					break
+			except SessionResumed:
+				#Load the game the same way the new session did, so that the replay continues from exactly the same state
+				g.save_game()
+				g.journal.load()
+				setup(g)
+			except OutOfInput:
+				break
+		g.journal.writer.flush()
+	return g
+
+def main():
+	parser = argparse.ArgumentParser(description="Plays back a recorded game")
+	parser.add_argument("file", nargs="?", default=REPLAY_FILE, help=f"The replay file (default: {REPLAY_FILE})")
+	parser.add_argument("--headless", action="store_true", help="Don't draw anything; play back as fast as possible and print a summary")
+	parser.add_argument("--speed", type=float, default=10, help="Keys per second when drawing the game (0 for no waiting)")
+	parser.add_argument("--stop-turn", type=int, default=None, help="Stop once the player has taken this many turns")
+	parser.add_argument("--profile", action="store_true", help="Time the phases of each turn, and print them at the end")
+	args = parser.parse_args()
+	renderer = None
+	if not args.headless:
+		from display import CursesRenderer
+		renderer = CursesRenderer()
+	start = time.perf_counter()
+	try:
+		g = replay(args.file, renderer, args.speed, args.stop_turn, args.profile)
+		if renderer is not None:
+			g.print_msg("The replay has ended. Press any key to exit.")
+			g.draw_board()
+			renderer.make_input().getch()
+	finally:
+		if renderer is not None:
+			renderer.close()
+	elapsed = time.perf_counter() - start
+	player = g.player
+	print(f"Seed: {g.seed}")
+	print(f"Keys played: {g.input_source.keys}")
+	print(f"Turns: {player.ticks}")
+	print(f"Dungeon level: {g.level}")
+	print(f"HP: {player.HP}/{player.get_max_hp()}" + (f" (killed by {player.death_cause})" if player.dead else ""))
+	print(f"Time: {elapsed:.2f}s ({player.ticks / elapsed:.0f} turns per second)")
+	if args.profile:
+		print(f"{'phase':<20} {'median':>9} {'95th':>9} {'turns':>6}")
+		for name, median, p95, num in g.profiler.report():
+			print(f"{name:<20} {median:>7.3f}ms {p95:>7.3f}ms {num:>6}")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,373 @@
+#Versioned binary encoding for saved games
+#This isn't faster than pickle, which is written in C: see bench/bench_save.py. Uncompressed it's only a little smaller, but
+#saves are zlib-compressed to about half the size of a pickle. What it's for: saves carry a format version, loading only
+#makes objects of the game's own classes (see below), items are rebuilt from a new item of their type (so they pick up fields
+#added since the save), and references to the game and to entities are stored as placeholders, which lets the journal
+#save each entity on its own.
+#Each value is written as a one-byte tag followed by its data. Ints are variable-length, and bytes and bytearrays (such as
+#the board's flat arrays) are written as they are. Objects are written as their class's name followed by their fields.
+#Items only store the fields that differ from a new item of the same type, which is usually just enchantments and charges.
+#Class and field names are written once per encoded value and referred to by number after that. An object that's reached
+#more than once (such as a monster that's in the monster list and is also another monster's target) is only stored once.
+#Loading only looks up classes in the game's own modules (GAME_MODULES) and a few built-in types, and checks each class against
+#the kind of value it's stored as before making an object of it, so a save file can't name an arbitrary class to create or
+#import an arbitrary module. It can still put any values in a game object's fields, so only load saves you trust.
+
+import struct, importlib
+from array import array
+from collections import deque, defaultdict
+from random import Random
+
+from items import Item
+
+FORMAT_VERSION = 1
+
+(NONE, TRUE, FALSE, INT, FLOAT, STR, BYTES, BYTEARRAY, LIST, TUPLE, SET, FROZENSET, DICT, DEFAULTDICT, DEQUE,
+	CLASS, GAME, REF, MEMO, OBJECT, ITEM, RNG) = range(22)
+
+#The modules whose classes can be loaded
+GAME_MODULES = frozenset(("animation", "board", "effect", "entity", "items", "monster", "player", "scheduler", "spatial", "utils"))
+
+_classes = {f"builtins.{t.__name__}": t for t in (int, float, bool, str, list, tuple, set, dict)} #Class name -> class
+_classes["random.Random"] = Random
+_prototypes = {} #Item class -> the fields of a new item of that class, or None if it can't be made without arguments
+_no_state = getattr(object, "__getstate__", None)
+
+def class_name(cls):
+	return f"{cls.__module__}.{cls.__qualname__}"
+
+def find_class(name, base=None):
+	"""
+	Returns the class with this name. Raises ValueError if it isn't one of the classes that can be loaded
+	base - If given, the class must be a subclass of this
+	"""
+	cls = _classes.get(name)
+	if cls is None:
+		module, _, qualname = name.rpartition(".")
+		if module not in GAME_MODULES:
+			raise ValueError(f"{name} is not one of the game's classes")
+		cls = importlib.import_module(module)
+		for part in qualname.split("."):
+			cls = getattr(cls, part, None)
+		if not isinstance(cls, type) or cls.__module__ != module:
+			raise ValueError(f"{name} is not one of the game's classes")
+		_classes[name] = cls
+	if base is not None and not issubclass(cls, base):
+		raise ValueError(f"{name} is not a subclass of {base.__name__}")
+	return cls
+
+def get_state(obj):
+	getstate = getattr(type(obj), "__getstate__", None)
+	if getstate is not None and getstate is not _no_state:
+		return obj.__getstate__()
+	return obj.__dict__
+
+def item_prototype(cls):
+	if cls not in _prototypes:
+		try:
+			_prototypes[cls] = cls().__dict__
+		except TypeError:
+			_prototypes[cls] = None
+	return _prototypes[cls]
+
+class Encoder:
+	"""
+	g - The game; references to it are stored as a placeholder
+	refs - If given, maps id(entity) to uid for entities that should be stored as references rather than by value
+	"""
+
+	def __init__(self, g=None, refs=None):
+		self.g = g
+		self.refs = refs
+		self.out = bytearray()
+		self.names = {}
+		self.memo = {}
+
+	def write_uint(self, n):
+		out = self.out
+		while n > 0x7f:
+			out.append((n & 0x7f) | 0x80)
+			n >>= 7
+		out.append(n)
+
+	def write_name(self, name):
+		index = self.names.get(name)
+		if index is None:
+			self.names[name] = len(self.names)
+			self.write_uint(0)
+			self.write_str(name)
+		else:
+			self.write_uint(index + 1)
+
+	def write_str(self, s):
+		data = s.encode("utf-8")
+		self.write_uint(len(data))
+		self.out += data
+
+	def write_items(self, values):
+		self.write_uint(len(values))
+		write = self.write
+		for v in values:
+			write(v)
+
+	def write(self, v):
+		writer = _writers.get(type(v))
+		if writer is not None:
+			writer(self, v)
+		else:
+			self.write_object(v)
+
+	def write_object(self, v):
+		out = self.out
+		if v is self.g:
+			out.append(GAME)
+			return
+		if isinstance(v, type):
+			out.append(CLASS)
+			self.write_name(class_name(v))
+			return
+		if self.refs is not None:
+			uid = self.refs.get(id(v))
+			if uid is not None:
+				out.append(REF)
+				self.write(uid)
+				return
+		index = self.memo.get(id(v))
+		if index is not None:
+			out.append(MEMO)
+			self.write_uint(index)
+			return
+		self.memo[id(v)] = len(self.memo)
+		cls = type(v)
+		if isinstance(v, Random):
+			version, internal, gauss_next = v.getstate()
+			out.append(RNG)
+			self.write_name(class_name(cls))
+			self.write(version)
+			self.write(array("I", internal).tobytes())
+			self.write(gauss_next)
+			return
+		if not hasattr(v, "__dict__"):
+			raise TypeError(f"can't save {cls.__name__} objects")
+		state = get_state(v)
+		proto = item_prototype(cls) if isinstance(v, Item) else None
+		if proto is not None:
+			missing = object()
+			state = {key: value for key, value in state.items() if proto.get(key, missing) != value}
+			out.append(ITEM)
+		else:
+			out.append(OBJECT)
+		self.write_name(class_name(cls))
+		self.write_uint(len(state))
+		for key, value in state.items():
+			self.write_name(key)
+			self.write(value)
+
+def _write_int(enc, v):
+	enc.out.append(INT)
+	enc.write_uint(v << 1 if v >= 0 else ((-v) << 1) - 1)
+
+def _write_float(enc, v):
+	enc.out.append(FLOAT)
+	enc.out += struct.pack("<d", v)
+
+def _write_str(enc, v):
+	enc.out.append(STR)
+	enc.write_str(v)
+
+def _write_bytes(enc, v):
+	enc.out.append(BYTES if type(v) is bytes else BYTEARRAY)
+	enc.write_uint(len(v))
+	enc.out += v
+
+def _write_pairs(enc, v):
+	enc.write_uint(len(v))
+	write = enc.write
+	for key, value in v.items():
+		write(key)
+		write(value)
+
+def _write_dict(enc, v):
+	enc.out.append(DICT)
+	_write_pairs(enc, v)
+
+def _write_defaultdict(enc, v):
+	enc.out.append(DEFAULTDICT)
+	enc.write(v.default_factory)
+	_write_pairs(enc, v)
+
+def _write_deque(enc, v):
+	enc.out.append(DEQUE)
+	enc.write(v.maxlen)
+	enc.write_items(v)
+
+def _container_writer(tag):
+	def write(enc, v):
+		enc.out.append(tag)
+		enc.write_items(v)
+	return write
+
+_writers = {
+	type(None): lambda enc, v: enc.out.append(NONE),
+	bool: lambda enc, v: enc.out.append(TRUE if v else FALSE),
+	int: _write_int,
+	float: _write_float,
+	str: _write_str,
+	bytes: _write_bytes,
+	bytearray: _write_bytes,
+	list: _container_writer(LIST),
+	tuple: _container_writer(TUPLE),
+	set: _container_writer(SET),
+	frozenset: _container_writer(FROZENSET),
+	dict: _write_dict,
+	defaultdict: _write_defaultdict,
+	deque: _write_deque
+}
+
+class Decoder:
+	"""
+	g - The game to bind references to the game to
+	refs - If given, maps uid to entity for entities that were stored as references
+	"""
+
+	def __init__(self, data, g=None, refs=None):
+		self.data = data
+		self.pos = 0
+		self.g = g
+		self.refs = refs
+		self.names = []
+		self.memo = []
+
+	def read_uint(self):
+		data = self.data
+		pos = self.pos
+		n = 0
+		shift = 0
+		while True:
+			b = data[pos]
+			pos += 1
+			n |= (b & 0x7f) << shift
+			if b < 0x80:
+				break
+			shift += 7
+		self.pos = pos
+		return n
+
+	def read_raw(self, size):
+		start = self.pos
+		self.pos += size
+		if self.pos > len(self.data):
+			raise ValueError("save data is cut off")
+		return self.data[start:self.pos]
+
+	def read_str(self):
+		return bytes(self.read_raw(self.read_uint())).decode("utf-8")
+
+	def read_name(self):
+		index = self.read_uint()
+		if index == 0:
+			name = self.read_str()
+			self.names.append(name)
+			return name
+		return self.names[index - 1]
+
+	def read_items(self):
+		read = self.read
+		return [read() for _ in range(self.read_uint())]
+
+	def read(self):
+		tag = self.data[self.pos]
+		self.pos += 1
+		return _readers[tag](self)
+
+	def read_dict(self):
+		read = self.read
+		d = {}
+		for _ in range(self.read_uint()):
+			key = read()
+			d[key] = read()
+		return d
+
+	def read_object(self, tag):
+		name = self.read_name()
+		cls = find_class(name, Item if tag == ITEM else None)
+		if cls.__module__ not in GAME_MODULES:
+			raise ValueError(f"{name} is not one of the game's classes")
+		obj = cls() if tag == ITEM else cls.__new__(cls)
+		self.memo.append(obj)
+		state = {}
+		for _ in range(self.read_uint()):
+			key = self.read_name()
+			state[key] = self.read()
+		setstate = getattr(cls, "__setstate__", None)
+		if tag == OBJECT and setstate is not None:
+			obj.__setstate__(state)
+		else:
+			obj.__dict__.update(state)
+		return obj
+
+	def read_rng(self):
+		cls = find_class(self.read_name(), Random)
+		rng = cls.__new__(cls)
+		self.memo.append(rng)
+		version = self.read()
+		internal = tuple(array("I", self.read()))
+		rng.setstate((version, internal, self.read()))
+		return rng
+
+	def read_ref(self):
+		uid = self.read()
+		if self.refs is None or uid not in self.refs:
+			raise ValueError(f"unknown entity {uid!r}")
+		return self.refs[uid]
+
+def _read_int(dec):
+	n = dec.read_uint()
+	return -((n + 1) >> 1) if n & 1 else n >> 1
+
+def _read_deque(dec):
+	maxlen = dec.read()
+	return deque(dec.read_items(), maxlen)
+
+def _read_defaultdict(dec):
+	factory = dec.read()
+	d = defaultdict(factory)
+	d.update(dec.read_dict())
+	return d
+
+_readers = {
+	NONE: lambda dec: None,
+	TRUE: lambda dec: True,
+	FALSE: lambda dec: False,
+	INT: _read_int,
+	FLOAT: lambda dec: struct.unpack("<d", dec.read_raw(8))[0],
+	STR: lambda dec: dec.read_str(),
+	BYTES: lambda dec: bytes(dec.read_raw(dec.read_uint())),
+	BYTEARRAY: lambda dec: bytearray(dec.read_raw(dec.read_uint())),
+	LIST: lambda dec: dec.read_items(),
+	TUPLE: lambda dec: tuple(dec.read_items()),
+	SET: lambda dec: set(dec.read_items()),
+	FROZENSET: lambda dec: frozenset(dec.read_items()),
+	DICT: lambda dec: dec.read_dict(),
+	DEFAULTDICT: _read_defaultdict,
+	DEQUE: _read_deque,
+	CLASS: lambda dec: find_class(dec.read_name()),
+	GAME: lambda dec: dec.g,
+	REF: lambda dec: dec.read_ref(),
+	MEMO: lambda dec: dec.memo[dec.read_uint()],
+	OBJECT: lambda dec: dec.read_object(OBJECT),
+	ITEM: lambda dec: dec.read_object(ITEM),
+	RNG: lambda dec: dec.read_rng()
+}
+
+def dumps(obj, g=None, refs=None):
+	enc = Encoder(g, refs)
+	enc.write(obj)
+	return bytes(enc.out)
+
+def loads(data, g=None, refs=None):
+	dec = Decoder(data, g, refs)
+	obj = dec.read()
+	if dec.pos != len(data):
+		raise ValueError("unexpected data after the end of the save")
+	return obj
@@ -0,0 +1,366 @@
+import os, struct, threading
+try:
+	import zlib
+except ImportError: #Saves just aren't compressed
+	zlib = None
+
+import savecodec
+
+CHECKPOINT_MAGIC = b"VDRS"
+COMPRESSED = 1 #Checkpoint header flag
+JOURNAL_MAGIC = b"VDJ2"
+COMPACT_RECORDS = 100 #Start a new checkpoint after this many journal records...
+COMPACT_RATIO = 8 #...or once the journal is this many times bigger than the checkpoint
+FLAG_CHUNK = 64 #Tile flags are compared and saved in chunks of this many cells
+
+#The game object itself is never written to the save file; every reference to it (such as each entity's "g")
+#is saved as a placeholder and bound to whichever game loads the file. This keeps each game independent.
+#Entities can be saved as references too, by passing refs, so that each one can be stored in its own journal entry.
+def dump_game_obj(obj, g, refs=None):
+	return savecodec.dumps(obj, g, refs)
+	
+def load_game_obj(data, g, refs=None):
+	return savecodec.loads(data, g, refs)
+	
+def pack_checkpoint(snapshot):
+	"Adds the header to an encoded checkpoint, compressing it if zlib is available"
+	flags = 0
+	if zlib is not None:
+		snapshot = zlib.compress(snapshot, 6)
+		flags |= COMPRESSED
+	return CHECKPOINT_MAGIC + struct.pack("<HB", savecodec.FORMAT_VERSION, flags) + snapshot
+	
+def unpack_checkpoint(data):
+	if not data.startswith(CHECKPOINT_MAGIC):
+		raise ValueError("not a saved game")
+	version, flags = struct.unpack_from("<HB", data, len(CHECKPOINT_MAGIC))
+	if version > savecodec.FORMAT_VERSION:
+		raise ValueError(f"the save is from a newer version (format {version})")
+	body = data[len(CHECKPOINT_MAGIC) + 3:]
+	if flags & COMPRESSED:
+		if zlib is None:
+			raise ValueError("the save is compressed, but zlib isn't available")
+		body = zlib.decompress(body)
+	return body
+	
+def write_atomic(path, data):
+	"Writes data to a temporary file, then renames it over path, so a crash never leaves a half-written file behind"
+	tmp = path + ".tmp"
+	with open(tmp, "wb") as f:
+		f.write(data)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(tmp, path)
+
+def append_synced(path, data):
+	with open(path, "ab") as f:
+		f.write(data)
+		f.flush()
+		os.fsync(f.fileno())
+
+class SaveWriter:
+	"""
+	Writes save files on a background thread, so saving doesn't hold up the game
+	The game hands over a snapshot of its state, and optionally a function that turns it into bytes, which is called on the worker.
+	Writes happen one at a time, in the order they were submitted. Replacing a file cancels any writes to it that haven't
+	started yet, and appends that pile up while the worker is busy go out together. The worker thread stops when
+	there's nothing left to write; it isn't a daemon thread, so the program won't exit in the middle of a save.
+	"""
+	
+	def __init__(self):
+		self.cond = threading.Condition()
+		self.pending = [] #(path, append, snapshot, encode)
+		self.error = None
+		self.thread = None
+	
+	def replace(self, *files):
+		"Replaces each file, given as (path, snapshot, encode), atomically and in order"
+		paths = {path for path, _, _ in files}
+		with self.cond:
+			self.pending = [job for job in self.pending if job[0] not in paths]
+			self.pending.extend((path, False, snapshot, encode) for path, snapshot, encode in files)
+			self._start()
+	
+	def append(self, path, snapshot, encode=None):
+		"Appends to the file at path"
+		with self.cond:
+			self.pending.append((path, True, snapshot, encode))
+			self._start()
+	
+	def _start(self):
+		if self.thread is None:
+			self.thread = threading.Thread(target=self._run, name="save-writer")
+			self.thread.start()
+	
+	def discard(self):
+		"Drops any writes that haven't started yet, and waits for the one in progress"
+		with self.cond:
+			self.pending = []
+		self.flush()
+	
+	def flush(self):
+		"Waits until every submitted write has finished. Raises the error if the last batch failed"
+		with self.cond:
+			while self.thread is not None:
+				self.cond.wait()
+			error = self.error
+			self.error = None
+		if error is not None:
+			raise error
+	
+	def _run(self):
+		while True:
+			with self.cond:
+				if not self.pending:
+					self.thread = None
+					self.cond.notify_all()
+					return
+				jobs = self.pending
+				self.pending = []
+			try:
+				i = 0
+				while i < len(jobs):
+					path, append, snapshot, encode = jobs[i]
+					data = encode(snapshot) if encode else snapshot
+					i += 1
+					if append:
+						#Batch up appends to the same file into one write
+						chunks = [data]
+						while i < len(jobs) and jobs[i][0] == path and jobs[i][1]:
+							_, _, snapshot, encode = jobs[i]
+							chunks.append(encode(snapshot) if encode else snapshot)
+							i += 1
+						append_synced(path, b"".join(chunks))
+					else:
+						write_atomic(path, data)
+				error = None
+			except Exception as e:
+				error = e
+			with self.cond:
+				self.error = error
+
+def encode_record(record):
+	data = savecodec.dumps(record)
+	return struct.pack("<I", len(data)) + data
+
+def read_journal(path, journal_id):
+	"""
+	Returns the records in the journal, or None if it doesn't belong to the checkpoint
+	A record cut off by a crash is ignored, and cut off the end of the file so that new records can follow the last good one
+	"""
+	try:
+		with open(path, "rb") as f:
+			data = f.read()
+	except FileNotFoundError:
+		return None
+	header = JOURNAL_MAGIC + journal_id
+	if not data.startswith(header):
+		return None
+	records = []
+	pos = len(header)
+	while pos + 4 <= len(data):
+		size, = struct.unpack_from("<I", data, pos)
+		end = pos + 4 + size
+		if end > len(data):
+			break
+		records.append(savecodec.loads(data[pos+4:end]))
+		pos = end
+	if pos < len(data):
+		os.truncate(path, pos)
+	return records
+
+class SaveJournal:
+	"""
+	Saves the game as a full checkpoint, followed by a journal of what changed on each save since then
+	Each journal record holds the entities whose state changed (moves, HP, effects, inventory), the tile flags that changed
+	(reveals), the item piles that changed (pickups and drops), new terrain if it changed, and the rest of the game's small state.
+	Loading replays the records onto the checkpoint. A new checkpoint is written on a new level, after COMPACT_RECORDS
+	records, or once the journal has grown much bigger than the checkpoint.
+	Entities are given a uid the first time they're saved, so that references between them survive being saved separately.
+	"""
+	
+	def __init__(self, g, path, journal_path):
+		self.g = g
+		self.path = path
+		self.journal_path = journal_path
+		self.writer = SaveWriter()
+		self.board = None #The board the baseline below was taken from; None if there's no checkpoint yet
+	
+	def exists(self):
+		self.writer.flush()
+		return os.path.exists(self.path)
+	
+	def delete(self):
+		self.writer.discard()
+		for p in (self.path, self.journal_path):
+			if os.path.exists(p):
+				os.remove(p)
+		self.board = None
+	
+	def save(self):
+		g = self.g
+		new_level = self.board is not g.board or self.level != g.level or len(g.revealed) < self.num_revealed
+		if new_level or self.records >= COMPACT_RECORDS or self.journal_size > COMPACT_RATIO * self.checkpoint_size:
+			self.checkpoint()
+		else:
+			self.append()
+	
+	def entity_refs(self):
+		"Returns the player and monsters, and a dict mapping id(entity) to uid for them. Gives a uid to any entity that needs one"
+		g = self.g
+		entities = [g.player] + g.monsters
+		refs = {}
+		for e in entities:
+			if e.uid is None:
+				e.uid = g.next_uid
+				g.next_uid += 1
+			refs[id(e)] = e.uid
+		return entities, refs
+	
+	def dump_entity(self, e, refs):
+		return dump_game_obj(e.__getstate__(), self.g, refs)
+	
+	def dump_misc(self, refs):
+		"Returns the rest of the game's attributes, each encoded separately so that only the ones that changed are saved"
+		state = self.g.__getstate__()
+		for key in ("board", "player", "monsters", "scheduler", "revealed"):
+			del state[key]
+		return {key: dump_game_obj(value, self.g, refs) for key, value in state.items()}
+	
+	def checkpoint(self):
+		g = self.g
+		entities, refs = self.entity_refs()
+		self.journal_id = os.urandom(8)
+		data = dump_game_obj((self.journal_id, g.__getstate__()), g)
+		self.writer.replace((self.path, data, pack_checkpoint), (self.journal_path, JOURNAL_MAGIC + self.journal_id, None))
+		self.checkpoint_size = len(data)
+		self.set_baseline(entities, refs, 0)
+	
+	def set_baseline(self, entities, refs, records):
+		"Remembers the current state, so the next save only has to record what changed from it"
+		g = self.g
+		board = g.board
+		self.board = board
+		self.level = g.level
+		self.records = records
+		self.journal_size = 0
+		self.entities = {e.uid: self.dump_entity(e, refs) for e in entities}
+		self.order = [e.uid for e in g.monsters]
+		self.misc = self.dump_misc(refs)
+		self.version = board.version
+		self.flags = bytes(board.flags)
+		self.piles = {i: tuple(pile) for i, pile in board.items.items()}
+		self.num_revealed = len(g.revealed)
+	
+	def append(self):
+		g = self.g
+		board = g.board
+		entities, refs = self.entity_refs()
+		record = {}
+	
+		changed = {}
+		blobs = {}
+		for e in entities:
+			blob = self.dump_entity(e, refs)
+			blobs[e.uid] = blob
+			if self.entities.get(e.uid) != blob:
+				changed[e.uid] = (type(e), blob)
+		self.entities = blobs
+		record["entities"] = changed
+		order = [e.uid for e in g.monsters]
+		if order != self.order:
+			record["monsters"] = self.order = order
+		misc = self.dump_misc(refs)
+		record["misc"] = {key: blob for key, blob in misc.items() if self.misc.get(key) != blob}
+		self.misc = misc
+		record["scheduler"] = (g.scheduler.counter, g.scheduler.tick)
+	
+		if board.version != self.version:
+			record["terrain"] = (board.version, bytes(board.passable), bytes(board.symbols))
+			self.version = board.version
+		flags = board.flags
+		if flags != self.flags:
+			last = self.flags
+			chunks = []
+			for i in range(0, len(flags), FLAG_CHUNK):
+				chunk = flags[i:i+FLAG_CHUNK]
+				if chunk != last[i:i+FLAG_CHUNK]:
+					chunks.append((i, bytes(chunk)))
+			record["flags"] = chunks
+			self.flags = bytes(flags)
+		piles = {i: tuple(pile) for i, pile in board.items.items()}
+		if piles != self.piles:
+			items = {}
+			for i, pile in piles.items():
+				if self.piles.get(i) != pile:
+					items[i] = dump_game_obj(list(pile), g, refs)
+			for i in self.piles:
+				if i not in piles:
+					items[i] = None
+			record["items"] = items
+			self.piles = piles
+		if len(g.revealed) != self.num_revealed:
+			record["revealed"] = (self.num_revealed, g.revealed[self.num_revealed:])
+			self.num_revealed = len(g.revealed)
+	
+		self.writer.append(self.journal_path, record, encode_record)
+		self.records += 1
+		self.journal_size += sum(len(blob) for _, blob in changed.values()) + sum(map(len, record["misc"].values()))
+	
+	def load(self):
+		g = self.g
+		self.writer.flush()
+		with open(self.path, "rb") as f:
+			data = unpack_checkpoint(f.read())
+		journal_id, state = load_game_obj(data, g)
+		g.__setstate__(state)
+		records = read_journal(self.journal_path, journal_id)
+		if records is None:
+			#Start a fresh journal, since new records can't be added to one that belongs to another checkpoint
+			records = []
+			self.writer.replace((self.journal_path, JOURNAL_MAGIC + journal_id, None))
+		refs = {e.uid: e for e in [g.player] + g.monsters if e.uid is not None}
+		for record in records:
+			self.apply(record, refs)
+		g.player.fov = g.player.calc_fov()
+		g.scheduler.rebuild()
+		g.refresh_cache()
+		self.journal_id = journal_id
+		self.checkpoint_size = len(data)
+		entities, refs = self.entity_refs()
+		self.set_baseline(entities, refs, len(records))
+		g.rehash() #The records changed the board without going through the methods that keep the hash up to date
+	
+	def apply(self, record, refs):
+		g = self.g
+		board = g.board
+		entities = record["entities"]
+		for uid, (cls, blob) in entities.items():
+			if uid not in refs: #Entities that are new in this record are created first, in case others refer to them
+				refs[uid] = cls.__new__(cls)
+		for uid, (cls, blob) in entities.items():
+			e = refs[uid]
+			state = load_game_obj(blob, g, refs)
+			e.__class__ = cls
+			e.__dict__.clear()
+			e.__setstate__(state)
+		if "monsters" in record:
+			g.monsters[:] = [refs[uid] for uid in record["monsters"]]
+		for key, blob in record["misc"].items():
+			setattr(g, key, load_game_obj(blob, g, refs))
+		g.scheduler.counter, g.scheduler.tick = record["scheduler"]
+		if "terrain" in record:
+			board.version, passable, symbols = record["terrain"]
+			board.passable[:] = passable
+			board.symbols[:] = symbols
+		for i, chunk in record.get("flags", ()):
+			board.flags[i:i+len(chunk)] = chunk
+		for i, blob in record.get("items", {}).items():
+			if blob is None:
+				board.items.pop(i, None)
+			else:
+				board.items[i] = load_game_obj(blob, g, refs)
+		if "revealed" in record:
+			start, tail = record["revealed"]
+			del g.revealed[start:]
+			g.revealed.extend(tail)
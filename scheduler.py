@@ -0,0 +1,130 @@
+from heapq import heappush, heappop
+
+class TurnScheduler:
+	"""
+	Decides which monsters take a turn on each game tick
+	Monsters are bucketed by the tick they next need to wake up on: when they have enough energy to act, or when one of
+	their effects or timers runs out. A heap keeps the ticks that have buckets in order. Ticks in between are skipped,
+	and Monster.sync() applies them in bulk. Monsters waking on the same tick go fastest first, with ties broken randomly.
+	"""
+	
+	def __init__(self, g):
+		self.g = g
+		self.ticks = [] #Heap of ticks that have a bucket
+		self.buckets = {} #Maps a tick to the list of (-speed, tie, token, monster) entries waking up on it
+		self.counter = 0
+		self.tick = g.player.ticks #The last tick monsters have taken (or are taking) their turns on
+		self.current = None #The monster currently taking its turn
+		
+	def __getstate__(self):
+		#The queue is rebuilt from the monsters after loading
+		state = self.__dict__.copy()
+		del state["ticks"], state["buckets"], state["current"]
+		return state
+		
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.ticks = []
+		self.buckets = {}
+		self.current = None
+		
+	def clear(self):
+		self.ticks.clear()
+		self.buckets.clear()
+		self.current = None
+		
+	def add(self, m):
+		self.schedule(m, self.tick)
+		
+	def rebuild(self):
+		"Recreates the queue from the monsters' own scheduling fields, such as after loading them from a save"
+		self.clear()
+		for m in self.g.monsters:
+			if m.sched_token is None or m.due == float("inf"):
+				continue
+			bucket = self.buckets.get(m.due)
+			if bucket is None:
+				self.buckets[m.due] = bucket = []
+				heappush(self.ticks, m.due)
+			bucket.append((-m.get_speed(), m.sched_tie, m.sched_token, m))
+			
+	def remove(self, m):
+		#Entries are invalidated rather than removed; they're skipped when their tick comes
+		m.sched_token = None
+		m.synced_tick = None
+		
+	def sync_tick(self, m):
+		"Returns the tick a monster's state should be up to date with right now"
+		tick = self.tick
+		if m.due <= tick: #Its turn on this tick hasn't happened yet
+			return tick - 1
+		cur = self.current
+		if cur is not None and (-m.get_speed(), m.sched_tie) > (-cur.get_speed(), cur.sched_tie):
+			return tick - 1 #Monsters later in this tick's order haven't been updated for it yet
+		return tick
+		
+	def reschedule(self, m):
+		"Recalculates when the monster should wake up. Should be called after anything changes that could make it wake up earlier"
+		if m.sched_token is not None and m is not self.current:
+			self.schedule(m, m.synced_tick)
+			
+	def schedule(self, m, synced_tick):
+		#Works out how many ticks after its last update the monster needs to wake up
+		speed = m.get_speed()
+		energy = m.energy
+		wake = 1 if energy > 0 else -energy // speed + 1 #When it has enough energy to act
+		effects = m.effects
+		if effects or m.summon_timer:
+			m.synced_tick = None #It's already up to date, so don't let incapacitated() try to sync it
+			if effects and m.incapacitated():
+				wake = None
+			for duration in effects.values():
+				if wake is None or duration < wake:
+					wake = max(duration, 1)
+			if m.summon_timer and (wake is None or m.summon_timer < wake):
+				wake = m.summon_timer
+		self.counter += 1
+		m.sched_token = token = self.counter
+		m.synced_tick = synced_tick
+		if wake is None: #Nothing will happen until something else changes it
+			m.due = float("inf")
+			return
+		m.due = due = synced_tick + wake
+		m.sched_tie = tie = self.g.rng.random()
+		bucket = self.buckets.get(due)
+		if bucket is None:
+			self.buckets[due] = bucket = []
+			heappush(self.ticks, due)
+		bucket.append((-speed, tie, token, m))
+		
+	def run_tick(self, tick):
+		"Runs the turns of all monsters that need to wake up on this tick"
+		g = self.g
+		ticks = self.ticks
+		self.tick = tick
+		while ticks and ticks[0] <= tick:
+			bucket = self.buckets.pop(heappop(ticks))
+			bucket.sort()
+			for i, (_, _, token, m) in enumerate(bucket):
+				if token != m.sched_token:
+					continue
+				if m.HP <= 0:
+					g.remove_monster(m)
+					continue
+				if m.synced_tick != tick - 1:
+					m.sync()
+				m.synced_tick = None #It stays up to date during its own turn, so there's nothing to sync until it's over
+				self.current = m
+				m.do_turn()
+				self.current = None
+				if m.sched_token == token: #It wasn't removed during its turn
+					self.schedule(m, tick)
+				if g.player.dead:
+					#Keep the rest of the turns in case the game goes on
+					rest = bucket[i+1:]
+					if rest:
+						if tick not in self.buckets:
+							self.buckets[tick] = []
+							heappush(ticks, tick)
+						self.buckets[tick].extend(rest)
+					return
@@ -0,0 +1,178 @@
+#Plays many headless games with a simple scripted policy, spread over a process pool, and sums up how they went
+#This gives balance data for the spawn tables (how deep games get, what kills the player, how often each monster type is
+#killed) and a benchmark of the whole engine (turns per second).
+#Usage: python3 simulate.py [--games N] [--processes N] [--first-seed N] [--max-turns N] [--json FILE]
+import os, sys, time, json, random, argparse, tempfile
+from collections import Counter
+from multiprocessing import Pool
+
+from gameobj import Game
+from board import pathfind, STAIR
+from env import respond
+
+MAX_TURNS = 5000
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+def find_stairs(board):
+	flags = board.flags
+	cols = board.cols
+	for i in range(len(flags)):
+		if flags[i] & STAIR:
+			return i % cols, i // cols
+	return None
+
+def choose_action(g, r):
+	"""
+	The scripted policy. Makes the player take one action, and returns False if it couldn't think of anything to do
+	Fights anything aware of it, rests when hurt and nothing is chasing it, picks up items, and otherwise heads for the stairs.
+	"""
+	player = g.player
+	board = g.board
+	aware = [m for m in player.monsters_in_fov() if m.is_aware]
+	if aware:
+		target = min(aware, key=player.distance)
+		dx, dy = target.x - player.x, target.y - player.y
+		if abs(dx) + abs(dy) == 1:
+			player.attack(dx, dy)
+			return True
+		path = pathfind(board, (player.x, player.y), (target.x, target.y))
+		if len(path) > 1:
+			nx, ny = path[1]
+			return player.move(nx - player.x, ny - player.y)
+	elif player.HP < player.get_max_hp() // 2:
+		player.resting = True
+		return True
+	if board.get_items(player.x, player.y):
+		player.add_item(board.pop_item(player.x, player.y))
+		player.energy -= player.get_speed()
+		return True
+	if board.get(player.x, player.y).stair:
+		g.descend()
+		return True
+	stairs = find_stairs(board)
+	if stairs:
+		path = pathfind(board, (player.x, player.y), stairs, rand=True)
+		if len(path) > 1:
+			nx, ny = path[1]
+			if player.move(nx - player.x, ny - player.y):
+				return True
+	return player.move(*r.choice(DIRECTIONS))
+
+def play_game(args):
+	"Plays one game from the given seed, and returns a summary of it"
+	seed, max_turns = args
+	g = Game.headless(responder=respond, seed=seed)
+	r = random.Random(seed)
+	with tempfile.TemporaryDirectory() as folder:
+		#Each game saves to its own folder, so games running at the same time don't overwrite each other's saves
+		g.journal.path = os.path.join(folder, "save.dat")
+		g.journal.journal_path = os.path.join(folder, "save.journal")
+		start = time.perf_counter()
+		g.generate_level()
+		g.refresh_cache()
+		player = g.player
+		player.recalc_passives()
+		spawned = Counter()
+		killed = Counter()
+		seen = set()
+		level = None
+		turns = 0
+		stuck = 0
+		while not player.dead and turns < max_turns:
+			if g.level != level:
+				level = g.level
+				seen.clear()
+			for m in g.monsters:
+				if m not in seen and m.summon_timer is None:
+					seen.add(m)
+					spawned[m.name] += 1
+			before = list(g.monsters)
+			if player.resting:
+				turns += g.fast_forward()
+			else:
+				last = player.energy
+				choose_action(g, r)
+				if player.energy < last:
+					g.do_turn()
+					turns += 1
+					stuck = 0
+				else:
+					stuck += 1
+					if stuck > 100: #The policy has nothing it can do
+						break
+			for m in before:
+				if m.HP <= 0 and m.summon_timer is None:
+					killed[m.name] += 1
+		elapsed = time.perf_counter() - start
+		g.journal.writer.flush()
+	return {
+		"seed": seed,
+		"depth": g.level,
+		"turns": turns,
+		"dead": player.dead,
+		"cause": player.death_cause if player.dead else ("turn limit" if turns >= max_turns else "stuck"),
+		"spawned": dict(spawned),
+		"killed": dict(killed),
+		"seconds": elapsed
+	}
+
+def summarize(games, wall_time):
+	depths = Counter(game["depth"] for game in games)
+	causes = Counter(game["cause"] for game in games)
+	spawned = Counter()
+	killed = Counter()
+	for game in games:
+		spawned.update(game["spawned"])
+		killed.update(game["killed"])
+	turns = sum(game["turns"] for game in games)
+	cpu_time = sum(game["seconds"] for game in games)
+	return {
+		"games": len(games),
+		"mean_depth": sum(game["depth"] for game in games) / len(games),
+		"depths": dict(sorted(depths.items())),
+		"mean_turns": turns / len(games),
+		"causes": dict(causes.most_common()),
+		"kill_rates": {name: (killed[name] / spawned[name], killed[name], spawned[name]) for name in sorted(spawned)},
+		"turns_per_second": turns / cpu_time if cpu_time else 0.0,
+		"total_turns_per_second": turns / wall_time if wall_time else 0.0
+	}
+
+def print_summary(summary):
+	print(f"Games: {summary['games']}")
+	print(f"Mean depth reached: {summary['mean_depth']:.2f}")
+	print("Depth reached: " + ", ".join(f"{depth}: {num}" for depth, num in summary["depths"].items()))
+	print(f"Mean turns survived: {summary['mean_turns']:.1f}")
+	print("Causes of death:")
+	for cause, num in summary["causes"].items():
+		print(f"  {cause:<24} {num:>6} ({num / summary['games']:.1%})")
+	print("Kill rates (killed/spawned):")
+	for name, (rate, num_killed, num_spawned) in summary["kill_rates"].items():
+		print(f"  {name:<24} {rate:>6.1%} ({num_killed}/{num_spawned})")
+	print(f"Turns per second: {summary['turns_per_second']:.0f} per process, {summary['total_turns_per_second']:.0f} in total")
+
+def main():
+	parser = argparse.ArgumentParser(description="Plays many seeded headless games and sums up the results")
+	parser.add_argument("--games", type=int, default=1000)
+	parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: one per CPU)")
+	parser.add_argument("--first-seed", type=int, default=0, help="Games use consecutive seeds starting from this one")
+	parser.add_argument("--max-turns", type=int, default=MAX_TURNS, help="Stop each game after this many turns")
+	parser.add_argument("--json", help="Also save the summary and every game's results to this file")
+	args = parser.parse_args()
+	jobs = [(seed, args.max_turns) for seed in range(args.first_seed, args.first_seed + args.games)]
+	start = time.perf_counter()
+	games = []
+	with Pool(args.processes) as pool:
+		for i, game in enumerate(pool.imap_unordered(play_game, jobs, chunksize=8), 1):
+			games.append(game)
+			if i % 100 == 0:
+				print(f"{i}/{len(jobs)} games", file=sys.stderr)
+	wall_time = time.perf_counter() - start
+	games.sort(key=lambda game: game["seed"])
+	summary = summarize(games, wall_time)
+	print_summary(summary)
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump({"summary": summary, "games": games}, f, indent=2)
+
+if __name__ == "__main__":
+	main()
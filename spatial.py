@@ -0,0 +1,91 @@
+#Spatial hash for finding the entities near a position without checking every one of them
+#The board is divided into square buckets of BUCKET_SIZE cells on each side, and each bucket keeps the entities inside it.
+#Buckets are dicts used as ordered sets, so entities always come out in the same order for the same game.
+
+BUCKET_SIZE = 4
+
+class SpatialHash:
+	"""
+	Entities are added and moved with their positions passed in explicitly, so the hash can be updated after an entity's
+	x and y have already changed. Queries read the entities' current x and y.
+	"""
+	
+	def __init__(self, cols, rows):
+		self.cols = -(-cols // BUCKET_SIZE)
+		self.rows = -(-rows // BUCKET_SIZE)
+		self.buckets = [{} for _ in range(self.cols * self.rows)]
+	
+	def bucket(self, x, y):
+		return self.buckets[(y // BUCKET_SIZE)*self.cols + x // BUCKET_SIZE]
+	
+	def add(self, obj, x, y):
+		self.bucket(x, y)[obj] = None
+	
+	def remove(self, obj, x, y):
+		self.bucket(x, y).pop(obj, None)
+	
+	def move(self, obj, old, new):
+		b1 = self.bucket(*old)
+		b2 = self.bucket(*new)
+		if b1 is not b2:
+			b1.pop(obj, None)
+			b2[obj] = None
+	
+	def clear(self):
+		for b in self.buckets:
+			b.clear()
+	
+	def in_rect(self, x1, y1, x2, y2):
+		"Yields the entities with x1 <= x <= x2 and y1 <= y <= y2"
+		buckets = self.buckets
+		cols = self.cols
+		bx1 = max(x1 // BUCKET_SIZE, 0)
+		bx2 = min(x2 // BUCKET_SIZE, cols - 1)
+		for by in range(max(y1 // BUCKET_SIZE, 0), min(y2 // BUCKET_SIZE, self.rows - 1) + 1):
+			row = by * cols
+			for bx in range(bx1, bx2 + 1):
+				for obj in buckets[row + bx]:
+					if x1 <= obj.x <= x2 and y1 <= obj.y <= y2:
+						yield obj
+	
+	def in_radius(self, x, y, radius):
+		"Yields the entities whose distance from (x, y), rounded to the nearest integer, is at most radius"
+		#round(sqrt(d)) <= r exactly when d <= r*r + r, for integer d and r
+		limit = radius*radius + radius
+		for obj in self.in_rect(x - radius, y - radius, x + radius, y + radius):
+			dx = obj.x - x
+			dy = obj.y - y
+			if dx*dx + dy*dy <= limit:
+				yield obj
+	
+	def nearest(self, x, y, pred=None, maxdist=None):
+		"""
+		Returns the entity closest to (x, y) by Manhattan distance that satisfies pred, or None if there isn't one
+		Searches outwards in rings of buckets, stopping once no bucket further out could have anything closer.
+		"""
+		buckets = self.buckets
+		cols = self.cols
+		rows = self.rows
+		cx = x // BUCKET_SIZE
+		cy = y // BUCKET_SIZE
+		best = None
+		best_dist = float("inf") if maxdist is None else maxdist + 1
+		max_ring = max(cx, cols - 1 - cx, cy, rows - 1 - cy)
+		for ring in range(max_ring + 1):
+			#Every cell in this ring is at least this far away
+			if ring > 0 and (ring - 1)*BUCKET_SIZE + 1 >= best_dist:
+				break
+			for by in range(cy - ring, cy + ring + 1):
+				if not 0 <= by < rows:
+					continue
+				edge = by == cy - ring or by == cy + ring
+				step = 1 if edge else 2*ring
+				for bx in range(cx - ring, cx + ring + 1, step or 1):
+					if not 0 <= bx < cols:
+						continue
+					for obj in buckets[by*cols + bx]:
+						d = abs(obj.x - x) + abs(obj.y - y)
+						if d < best_dist and (pred is None or pred(obj)):
+							best = obj
+							best_dist = d
+		return best
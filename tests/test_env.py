@@ -0,0 +1,184 @@
+#Tests for the bot environment in env.py
+import os, sys, random, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from env import DungeonEnv, Action, item_kind, TERRAIN, VISIBLE, ENTITIES, ITEMS, WALL, FLOOR, STAIRS
+from board import REVEALED, STAIR
+from items import Item, MagicMissile
+
+def item_types(cls=Item):
+	for t in cls.__subclasses__():
+		yield t
+		yield from item_types(t)
+
+def fill_inventory(g):
+	"Gives the player one of every item that can be made without arguments"
+	for t in item_types():
+		try:
+			item = t()
+		except TypeError:
+			continue
+		item.randomize(g.rng)
+		g.player.add_item(item)
+
+class EnvTestCase(unittest.TestCase):
+	
+	def setUp(self):
+		self.env = DungeonEnv(seed=1)
+		self.obs = self.env.reset()
+	
+	def tearDown(self):
+		self.env.close()
+	
+	def check_observation(self, obs):
+		"Checks that obs is the env's own buffers, and that they match the game"
+		env = self.env
+		g = env.g
+		board = g.board
+		player = g.player
+		self.assertIs(obs, self.obs)
+		self.assertIs(obs["grid"], env.grid)
+		self.assertIs(obs["stats"], env.stats)
+		cols = board.cols
+		size = cols * board.rows
+		self.assertEqual(len(env.grid), 4 * size)
+		channels = [env.grid[c*size:(c+1)*size] for c in range(4)]
+	
+		visible = channels[VISIBLE]
+		self.assertEqual({(i % cols, i // cols) for i in range(size) if visible[i]}, set(player.fov))
+	
+		terrain = channels[TERRAIN]
+		revealed = set(g.revealed)
+		self.assertEqual(sum(1 for v in terrain if v), len(revealed))
+		for x, y in revealed:
+			idx = y*cols + x
+			if not board.passable[idx]:
+				expected = WALL
+			elif board.flags[idx] & STAIR:
+				expected = STAIRS
+			else:
+				expected = FLOOR
+			self.assertEqual(terrain[idx], expected)
+	
+		entities = channels[ENTITIES]
+		expected = {player.y*cols + player.x: 1}
+		for m in board.monsters_in_fov(player.fov):
+			expected[m.y*cols + m.x] = 3 if m.is_friendly() else 2
+		self.assertEqual({i: entities[i] for i in range(size) if entities[i]}, expected)
+	
+		items = channels[ITEMS]
+		expected = {idx: item_kind(pile[-1]) for idx, pile in board.items.items() if pile and board.flags[idx] & REVEALED}
+		self.assertEqual({i: items[i] for i in range(size) if items[i]}, expected)
+	
+		self.assertEqual(list(env.stats), [player.HP, player.get_max_hp(), player.STR, player.DEX, player.level, player.exp,
+			g.level, player.x, player.y, len(player.inventory), player.poison, player.ticks])
+
+class TestObservation(EnvTestCase):
+	
+	def test_reset(self):
+		self.check_observation(self.obs)
+	
+	def test_step_reuses_buffers(self):
+		channels = self.env.channels
+		for action in (Action.RIGHT, Action.DOWN, Action.LEFT, Action.UP, Action.WAIT):
+			obs, reward, done, info = self.env.step(action)
+			self.check_observation(obs)
+			self.assertIs(self.env.channels, channels)
+	
+	def test_reset_reuses_buffers(self):
+		grid = self.env.grid
+		obs = self.env.reset(seed=2)
+		self.assertIs(obs, self.obs)
+		self.assertIs(obs["grid"], grid)
+		self.check_observation(obs)
+	
+	def test_random_actions_with_full_inventory(self):
+		for seed in (105, 156):
+			self.env.reset(seed=seed)
+			fill_inventory(self.env.g)
+			rng = random.Random(seed)
+			for _ in range(300):
+				player = self.env.g.player
+				action = rng.randrange(len(Action))
+				obs, reward, done, info = self.env.step(action, item=rng.randrange(max(1, len(player.inventory))), target=rng.randrange(3))
+				self.check_observation(obs)
+				self.assertIn(reward, (-1, 0, 1))
+				if done:
+					self.assertTrue(player.dead)
+					break
+
+class TestWandTargeting(EnvTestCase):
+	
+	def give_wand(self):
+		player = self.env.g.player
+		wand = MagicMissile()
+		wand.charges = 5
+		player.add_item(wand)
+		return wand, player.inventory.index(wand)
+	
+	def place_monsters_near_player(self, num):
+		"Moves num monsters onto free cells the player can see, each farther away than the last, and returns them"
+		g = self.env.g
+		player = g.player
+		cells = sorted((p for p in player.fov if g.board.is_passable(*p)), key=lambda p: (player.distance_pos(p), p))
+		chosen = []
+		for p in cells:
+			if not chosen or player.distance_pos(p) > player.distance_pos(chosen[-1]):
+				chosen.append(p)
+		if len(chosen) < num or len(g.monsters) < num:
+			self.skipTest("not enough room near the player")
+		placed = g.monsters[:num]
+		for m, (x, y) in zip(placed, chosen):
+			m.place_at(x, y)
+		player.fov = player.calc_fov()
+		return placed
+	
+	def record_targets(self):
+		g = self.env.g
+		picked = []
+		choose = g.choose_target
+		def record(monsters):
+			target = choose(monsters)
+			picked.append(target)
+			return target
+		g.choose_target = record
+		return picked
+	
+	def test_use_wand_on_visible_monster(self):
+		wand, index = self.give_wand()
+		near, = self.place_monsters_near_player(1)
+		picked = self.record_targets()
+		obs, reward, done, info = self.env.step(Action.USE_ITEM, item=index)
+		self.assertEqual(wand.charges, 4)
+		self.assertEqual(picked, [near])
+		self.assertTrue(info["acted"])
+		self.check_observation(obs)
+	
+	def test_use_wand_with_no_monsters(self):
+		g = self.env.g
+		for m in list(g.monsters):
+			g.remove_monster(m)
+		wand, index = self.give_wand()
+		obs, reward, done, info = self.env.step(Action.USE_ITEM, item=index)
+		self.assertEqual(wand.charges, 5)
+		self.check_observation(obs)
+	
+	def test_target_argument(self):
+		wand, index = self.give_wand()
+		near, far = self.place_monsters_near_player(2)
+		picked = self.record_targets()
+		self.env.step(Action.USE_ITEM, item=index, target=1)
+		self.assertEqual(picked, [far])
+	
+	def test_target_argument_wraps_around(self):
+		wand, index = self.give_wand()
+		near, far = self.place_monsters_near_player(2)
+		visible = len(list(self.env.g.player.monsters_in_fov()))
+		picked = self.record_targets()
+		self.env.step(Action.USE_ITEM, item=index, target=visible)
+		self.assertEqual(picked, [near])
+		self.assertEqual(wand.charges, 4)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,25 +1,60 @@
 import random, math
+from array import array
+from collections import OrderedDict
 
-def dice(num, sides):
-	"Rolls a given number of dice with a given number of dice and takes the sum"
-	return sum(random.randint(1, sides) for _ in range(num))
-
-def div_rand(x, y):
-	"Computes x/y then randomly rounds the result up or down depending on the remainder"
-	sign = 1
-	if (x > 0) ^ (y > 0):
-		sign = -1
-	x = abs(x)
-	y = abs(y)
-	mod = x % y
-	return sign * (x//y + (random.randint(1, y) <= mod))
-
-def mult_rand_frac(num, x, y):
-	return div_rand(num*x, y)
+class Rng(random.Random):
+	"""
+	Random number generator used for every roll in a game
+	Each game owns one, seeded from a recorded seed, so that a given seed always plays out the same way
+	"""
+	
+	#The generator's state is pickled as packed bytes rather than a tuple of 625 ints, which is about a third smaller
+	def __reduce__(self):
+		version, internal, gauss_next = self.getstate()
+		return self.__class__, (), (version, array("I", internal).tobytes(), gauss_next)
+		
+	def __setstate__(self, state):
+		version, internal, gauss_next = state
+		if isinstance(internal, bytes):
+			internal = tuple(array("I", internal))
+		self.setstate((version, internal, gauss_next))
+	
+	def dice(self, num, sides):
+		"Rolls a given number of dice with a given number of dice and takes the sum"
+		return sum(self.randint(1, sides) for _ in range(num))
+	
+	def div_rand(self, x, y):
+		"Computes x/y then randomly rounds the result up or down depending on the remainder"
+		sign = 1
+		if (x > 0) ^ (y > 0):
+			sign = -1
+		x = abs(x)
+		y = abs(y)
+		mod = x % y
+		return sign * (x//y + (self.randint(1, y) <= mod))
+	
+	def mult_rand_frac(self, num, x, y):
+		return self.div_rand(num*x, y)
+	
+	def rand_weighted(self, *pairs):
+		names, weights = list(zip(*pairs))
+		return self.choices(names, weights=weights)[0]
+	
+	def calc_mod(self, stat, avg=False):
+		m = stat - 10
+		if avg:
+			return m / 2
+		else:
+			return self.div_rand(m, 2)
+	
+	def one_in(self, x):
+		return x <= 1 or self.randint(1, x) == 1
 	
-def rand_weighted(*pairs):
-	names, weights = list(zip(*pairs))
-	return random.choices(names, weights=weights)[0]
+	def x_in_y(self, x, y):
+		return self.randint(1, y) <= x
+	
+	def binomial(self, num, x, y=100):
+		return sum(1 for _ in range(num) if self.x_in_y(x, y))
 
 def d20_prob(DC, mod, nat1=False, nat20=False):
 	num_over = 21 - DC + mod
@@ -45,22 +80,6 @@ def to_hit_prob(AC, hit_mod=0, adv=False, disadv=False):
 		res = res**2
 	return round(res, 3)
 	
-def calc_mod(stat, avg=False):
-	m = stat - 10
-	if avg:
-		return m / 2
-	else:
-		return div_rand(m, 2)
-	
-def one_in(x):
-	return x <= 1 or random.randint(1, x) == 1
-
-def x_in_y(x, y):
-	return random.randint(1, y) <= x	
-	
-def binomial(num, x, y=100):
-	return sum(1 for _ in range(num) if x_in_y(x, y))
-			
 def display_prob(perc):
 	if perc <= 0:
 		return "0%"
@@ -85,8 +104,39 @@ class Dice:
 	def avg(self):
 		return self.num * (self.sides + 1) // 2
 		
-	def roll(self):
-		return dice(self.num, self.sides)
+	def roll(self, rng):
+		return rng.dice(self.num, self.sides)
 		
 	def max(self):
-		return self.num*self.sides
\ No newline at end of file
+		return self.num*self.sides
+	
+class LRUCache:
+	"A dictionary with a bounded number of entries, that discards the least recently used entry when full"
+	
+	def __init__(self, maxsize=256):
+		self.maxsize = maxsize
+		self.entries = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		
+	def get(self, key):
+		"Returns the value for the given key, or None if it isn't cached"
+		value = self.entries.get(key)
+		if value is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.entries.move_to_end(key)
+		return value
+		
+	def put(self, key, value):
+		self.entries[key] = value
+		self.entries.move_to_end(key)
+		if len(self.entries) > self.maxsize:
+			self.entries.popitem(last=False)
+			
+	def clear(self):
+		self.entries.clear()
+		
+	def __len__(self):
+		return len(self.entries)
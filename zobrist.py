@@ -0,0 +1,82 @@
+#Zobrist hashing, for a cheap fingerprint of the whole game state
+#The state hash is the XOR of a 64-bit key for every feature of the state: each floor tile and staircase, each entity with its
+#position, HP and effects, and each item on the floor or in the inventory with its enchantment and charges. When a feature
+#changes, its old key is XORed out and its new key XORed in, so keeping the hash up to date costs about as much as the change
+#itself. The inventory's keys are added up instead, since it can hold several identical items, whose keys would cancel out.
+#Keys are worked out from the features rather than drawn from the game's RNG, so the same state has the same hash in every
+#process, and hashing never changes any rolls.
+import hashlib
+
+MASK = (1 << 64) - 1
+
+#Kinds of feature, so that e.g. a floor tile and an item never share a key
+FLOOR, STAIRS, ENTITY, ITEM, INVENTORY, EFFECT, PLAYER, LEVEL, ENCHANT, EQUIPPED = range(10)
+
+def mix64(z):
+	"Scrambles an integer into a 64-bit key (the splitmix64 finalizer)"
+	z = (z + 0x9E3779B97F4A7C15) & MASK
+	z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+	z = (z ^ (z >> 27)) * 0x94D049BB133111EB & MASK
+	return z ^ (z >> 31)
+
+def key(kind, n):
+	return mix64(n << 3 | kind)
+
+_name_keys = {}
+
+def name_key(kind, name):
+	"Returns the key for a name, the same in every process (unlike hash(), which is salted per process)"
+	k = _name_keys.get((kind, name))
+	if k is None:
+		data = f"{kind}:{name}".encode("utf-8")
+		k = _name_keys[(kind, name)] = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+	return k
+
+_floor_keys = []
+
+def floor_keys(size):
+	"Returns a list of the keys for a floor tile on each of the first size cells"
+	while len(_floor_keys) < size:
+		_floor_keys.append(key(FLOOR, len(_floor_keys)))
+	return _floor_keys[:size]
+
+_type_keys = {}
+
+def entity_key(e, idx):
+	"Returns the key for an entity standing on cell idx, covering its HP and which effects it has"
+	#This runs on every move, so everything about the entity is folded into one number and mixed once
+	cls = type(e)
+	z = _type_keys.get(cls)
+	if z is None:
+		z = _type_keys[cls] = name_key(ENTITY, cls.__name__)
+	uid = e.uid or 0 #Entities from older saves get their uid when the game is next saved
+	z ^= (uid << 32) | (idx << 16) | (e.HP & 0xFFFF)
+	for name in e.effects:
+		z ^= name_key(EFFECT, name)
+	return mix64(z)
+
+def item_state_key(item):
+	"Returns the key for an item's type and everything about it that can change: its enchantment and any charges"
+	z = name_key(ITEM, type(item).__name__) ^ (item.enchant & 0xFF) ^ (getattr(item, "charges", 0) & 0xFFFF) << 8
+	ench_type = getattr(item, "ench_type", None)
+	if ench_type:
+		z ^= name_key(ENCHANT, ench_type)
+	return z
+
+def item_key(item, idx, pos):
+	"Returns the key for an item at position pos (from the bottom) in the pile on cell idx"
+	return mix64(key(ITEM, (idx << 16) | pos) ^ item_state_key(item))
+
+def inventory_key(item):
+	"Returns the key for having this item in the inventory. These are added up rather than XORed (see above)"
+	return mix64(INVENTORY ^ item_state_key(item))
+
+def player_key(p):
+	"Returns the key for the player's stats and what they have equipped. Their position, HP and effects are covered by their entity key"
+	z = PLAYER
+	for v in (p.ticks, p.energy, p.level, p.exp, p.base_str, p.base_dex, p.mod_str, p.mod_dex,
+			p.str_drain, p.dex_drain, p.hp_drain, p.poison, p.fire, p.dead):
+		z = mix64(z ^ hash(v)) #Energy can be a float; numbers hash the same in every process
+	for item in [p.weapon, p.armor] + p.worn_rings:
+		z = mix64(z ^ (inventory_key(item) if item is not None else EQUIPPED))
+	return z